@@ -0,0 +1,171 @@
+# aggregates.py
+# -*- coding: utf-8 -*-
+"""Per-company running sums/counts of the ``t{id}_adj`` answers, by survey, role and topic.
+
+The totals live next to the responses (tables ``agg_cells``/``agg_respondents`` in the
+company database) with a watermark on the last folded row id, so bringing them up
+to date only reads rows appended since the previous refresh. Readers get a cached
+role × topic matrix per survey version that is invalidated by :func:`storage.data_version`.
+"""
+import re
+import threading
+
+import numpy as np
+import pandas as pd
+
+import storage
+from survey_config import DEFAULT_SURVEY, survey_key
+
+ADJ_COL = re.compile(r"^t(\d+)_adj$")
+CHUNK_ROWS = 50_000
+WATERMARK = "cells"
+
+_CACHE:dict = {}
+_LOCK = threading.Lock()
+
+
+def _ensure_tables(conn)->None:
+    conn.execute("CREATE TABLE IF NOT EXISTS agg_cells (survey TEXT, role TEXT, topic INTEGER, sum REAL, cnt INTEGER, "
+                 "PRIMARY KEY(survey, role, topic))")
+    conn.execute("CREATE TABLE IF NOT EXISTS agg_respondents (survey TEXT, role TEXT, n INTEGER, PRIMARY KEY(survey, role))")
+    conn.execute("CREATE TABLE IF NOT EXISTS agg_state (name TEXT PRIMARY KEY, last_id INTEGER)")
+
+
+def drop_legacy(conn, tables, watermark:str)->None:
+    """One-time cleanup of pre-survey tables; call inside a write transaction (their data is rebuilt under a new watermark)."""
+    have = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+    if not have & set(tables): return
+    for t in tables: conn.execute(f"DROP TABLE IF EXISTS {t}")
+    conn.execute("DELETE FROM agg_state WHERE name=?", (watermark,))
+
+
+def survey_of(chunk:pd.DataFrame)->pd.Series:
+    """Survey key per row; untagged (legacy) rows belong to the default survey."""
+    s = chunk["survey"] if "survey" in chunk else pd.Series(None, index=chunk.index, dtype=object)
+    return s.astype(object).where(s.notna() & (s.astype("string")!=""), DEFAULT_SURVEY).rename("survey")
+
+
+def _watermark(conn, name:str)->int:
+    row = conn.execute("SELECT last_id FROM agg_state WHERE name=?", (name,)).fetchone()
+    return row[0] if row else 0
+
+
+def _set_watermark(conn, name:str, last_id:int)->None:
+    conn.execute("INSERT INTO agg_state(name,last_id) VALUES(?,?) "
+                 "ON CONFLICT(name) DO UPDATE SET last_id=excluded.last_id", (name, last_id))
+
+
+def adj_columns(conn)->list[str]:
+    return [c for c in storage.columns(conn) if ADJ_COL.match(c)]
+
+
+def iter_new_rows(conn, last_id:int, cols:list[str]):
+    """Yield DataFrame chunks (id + cols) of rows appended after ``last_id``."""
+    sql = (f"SELECT id, {', '.join(storage._quote(c) for c in cols)} FROM responses "
+           f"WHERE id > ? ORDER BY id")
+    yield from pd.read_sql_query(sql, conn, params=(last_id,), chunksize=CHUNK_ROWS)
+
+
+def _fold(conn, chunk:pd.DataFrame, adj:list[str])->None:
+    vals = chunk[adj].apply(pd.to_numeric, errors="coerce")
+    g = vals.groupby([survey_of(chunk), chunk["role"].fillna("").rename("role")], sort=False)
+    sums, cnts, sizes = g.sum(), g.count(), g.size()
+    rows = [(sv, role, int(ADJ_COL.match(c).group(1)), float(sums.at[(sv, role), c]), int(cnts.at[(sv, role), c]))
+            for sv, role in sums.index for c in adj if cnts.at[(sv, role), c]]
+    conn.executemany("INSERT INTO agg_cells(survey,role,topic,sum,cnt) VALUES(?,?,?,?,?) ON CONFLICT(survey,role,topic) "
+                     "DO UPDATE SET sum=sum+excluded.sum, cnt=cnt+excluded.cnt", rows)
+    conn.executemany("INSERT INTO agg_respondents(survey,role,n) VALUES(?,?,?) ON CONFLICT(survey,role) "
+                     "DO UPDATE SET n=n+excluded.n", [(sv, role, int(n)) for (sv, role), n in sizes.items()])
+
+
+def refresh(company:str)->None:
+    """Fold rows appended since the last refresh into the running totals."""
+    conn = storage.connect(company)
+    try:
+        _ensure_tables(conn)
+        last_id = conn.execute("SELECT COALESCE(MAX(id),0) FROM responses").fetchone()[0]
+        if _watermark(conn, WATERMARK)==last_id: return
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            drop_legacy(conn, ("agg_totals", "agg_roles"), "totals")
+            # re-read under the write lock: a concurrent refresh may already have folded these rows
+            last_id = conn.execute("SELECT COALESCE(MAX(id),0) FROM responses").fetchone()[0]
+            mark = _watermark(conn, WATERMARK)
+            if mark>last_id:   # database was replaced or rebuilt: start over
+                conn.execute("DELETE FROM agg_cells"); conn.execute("DELETE FROM agg_respondents"); mark = 0
+            adj = adj_columns(conn)
+            for chunk in iter_new_rows(conn, mark, ["survey", "role"]+adj):
+                if chunk.empty: continue
+                _fold(conn, chunk, adj); mark = int(chunk["id"].iloc[-1])
+            _set_watermark(conn, WATERMARK, mark)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK"); raise
+    finally:
+        conn.close()
+
+
+def _read(company:str, version, key:str)->dict:
+    conn = storage.connect(company)
+    try:
+        _ensure_tables(conn)
+        tot = pd.read_sql_query("SELECT role, topic, sum, cnt FROM agg_cells WHERE survey=?", conn, params=(key,))
+        n = dict(conn.execute("SELECT role, n FROM agg_respondents WHERE survey=?", (key,)).fetchall())
+    finally:
+        conn.close()
+    roles = sorted(n); topics = sorted(tot["topic"].unique().tolist())
+    ri = {r:i for i,r in enumerate(roles)}; ti = {t:i for i,t in enumerate(topics)}
+    sums = np.zeros((len(roles), len(topics))); cnts = np.zeros((len(roles), len(topics)), dtype=np.int64)
+    if len(tot):
+        r_idx = tot["role"].map(ri).to_numpy(); t_idx = tot["topic"].map(ti).to_numpy()
+        sums[r_idx, t_idx] = tot["sum"].to_numpy(); cnts[r_idx, t_idx] = tot["cnt"].to_numpy()
+    return {"version":version, "survey":key, "roles":roles, "topics":topics, "sum":sums, "count":cnts,
+            "n":n, "total":int(sum(n.values()))}
+
+
+def get(company:str, survey=None)->dict:
+    """Role × topic sums/counts of one survey (default: the default survey) for ``company``,
+    refreshed and cached by data version."""
+    version = storage.data_version(company); key = survey_key(survey)
+    with _LOCK:
+        hit = _CACHE.get((company, key))
+    if hit is not None and hit["version"]==version: return hit
+    refresh(company)
+    agg = _read(company, version, key)
+    with _LOCK:
+        _CACHE[(company, key)] = agg
+    return agg
+
+
+def surveys(company:str)->list[str]:
+    """Survey keys that have responses in ``company``."""
+    refresh(company)
+    conn = storage.connect(company)
+    try:
+        _ensure_tables(conn)
+        return [r[0] for r in conn.execute("SELECT DISTINCT survey FROM agg_respondents ORDER BY survey")]
+    finally:
+        conn.close()
+
+
+def _aligned(agg:dict, key:str, roles:list, topic_ids:list, fill)->np.ndarray:
+    ri = {r:i for i,r in enumerate(agg["roles"])}; ti = {t:i for i,t in enumerate(agg["topics"])}
+    out = np.full((len(roles), len(topic_ids)), fill, dtype=agg[key].dtype)
+    rows = [(a, ri[r]) for a,r in enumerate(roles) if r in ri]
+    cols = [(b, ti[t]) for b,t in enumerate(topic_ids) if t in ti]
+    if rows and cols:
+        ra, rb = map(list, zip(*rows)); ca, cb = map(list, zip(*cols))
+        out[np.ix_(ra, ca)] = agg[key][np.ix_(rb, cb)]
+    return out
+
+
+def role_topic_counts(agg:dict, roles:list, topic_ids:list)->np.ndarray:
+    """Answers per (role, topic), shaped len(roles) × len(topic_ids)."""
+    return _aligned(agg, "count", roles, topic_ids, 0)
+
+
+def role_topic_means(agg:dict, roles:list, topic_ids:list)->np.ndarray:
+    """Mean raw ``_adj`` per (role, topic), shaped len(roles) × len(topic_ids); NaN when unanswered."""
+    s = _aligned(agg, "sum", roles, topic_ids, 0.0); c = role_topic_counts(agg, roles, topic_ids)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(c>0, s/np.maximum(c, 1), np.nan)
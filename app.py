@@ -1,47 +1,25 @@
 # app.py
 # -*- coding: utf-8 -*-
-import os, json
+import time; _RUN_T0 = time.perf_counter()
+import uuid
 import numpy as np
 import pandas as pd
 import streamlit as st  # ⬅️ ابتدا استریم‌لیت را ایمپورت می‌کنیم تا بتوانیم خطا را دوستانه نشان دهیم
 from pathlib import Path
 from datetime import datetime
+import storage, aggregates, scoring, holding, export, timing, trends, clustering, bulk_import, stats
+import survey_config
 
-# --- نصب خودکار پکیج‌های موردنیاز در صورت نبودن ---
-def _ensure_pkg(pkg, version=None):
-    """Try to import; if missing, pip install quietly."""
-    try:
-        __import__(pkg)
-        return True
-    except Exception:
-        try:
-            import sys, subprocess
-            if version:
-                subprocess.check_call([sys.executable, "-m", "pip", "install", "--quiet", f"{pkg}=={version}"])
-            else:
-                subprocess.check_call([sys.executable, "-m", "pip", "install", "--quiet", pkg])
-            __import__(pkg)
-            return True
-        except Exception as e:
-            st.error(f"نصب خودکار بسته «{pkg}» انجام نشد. لطفاً آن را در requirements.txt اضافه کنید یا دستی نصب کنید. جزئیات: {e}")
-            return False
-
-# تلاش برای فراهم بودن plotly
-if not _ensure_pkg("plotly", "5.22.0"):
-    st.stop()
-import plotly.graph_objects as go
-import plotly.express as px
-
+# --- بسته‌ها از requirements.txt نصب می‌شوند؛ در زمان اجرا هیچ pip installی انجام نمی‌شود ---
+# plotly (charts.py) و scikit-learn فقط وقتی داشبورد به آن‌ها نیاز دارد بارگذاری می‌شوند (timing.lazy_import).
 # scikit-learn اختیاری: اگر نبود، برنامه ادامه می‌دهد ولی خوشه‌بندی غیرفعال می‌شود
-SKLEARN_OK = _ensure_pkg("scikit_learn", "1.5.0") or _ensure_pkg("sklearn", "1.5.0")
-try:
-    from sklearn.cluster import KMeans  # type: ignore
-except Exception:
-    SKLEARN_OK = False
+SKLEARN_OK = timing.module_available("sklearn")
+run_timer = timing.RunTimer(_RUN_T0); is_cold_run = timing.register_run(run_timer)
+run_timer.mark("imports")
 
 # ───────────────────────── تنظیمات پایه ─────────────────────────
 st.set_page_config(page_title="پرسشنامه و داشبورد مدیریت دارایی", layout="wide")
-BASE = Path("."); DATA_DIR = BASE/"data"; ASSETS_DIR = BASE/"assets"
+BASE = Path("."); DATA_DIR = storage.DATA_DIR; ASSETS_DIR = BASE/"assets"
 DATA_DIR.mkdir(exist_ok=True); ASSETS_DIR.mkdir(exist_ok=True)
 
 # ---------- Global styles: vazir + rtl + panels + smaller title ----------
@@ -83,74 +61,20 @@ h1,h2,h3,h4{ color:#16325c; }
 </style>
 """, unsafe_allow_html=True)
 
-PLOTLY_TEMPLATE = "plotly_white"
-
-# ─────────────────────── بارگذاری موضوعات ───────────────────────
-TOPICS_PATH = BASE/"topics.json"
-if not TOPICS_PATH.exists():
-    st.error("فایل topics.json پیدا نشد. آن را کنار app.py قرار دهید."); st.stop()
-TOPICS = json.loads(TOPICS_PATH.read_text(encoding="utf-8"))
-if len(TOPICS)!=40:
-    st.warning("⚠️ تعداد موضوعات باید دقیقاً ۴۰ باشد.")
-
-# ─────────────────────── نقش‌ها و رنگ‌ها ───────────────────────
-ROLES = ["مدیران ارشد","مدیران اجرایی","سرپرستان / خبرگان","متخصصان فنی","متخصصان غیر فنی"]
-ROLE_COLORS = {"مدیران ارشد":"#d62728","مدیران اجرایی":"#1f77b4","سرپرستان / خبرگان":"#2ca02c","متخصصان فنی":"#ff7f0e","متخصصان غیر فنی":"#9467bd"}
-
-# ───────────────────── گزینه‌های پاسخ ─────────────────────
-LEVEL_OPTIONS = [
-    ("اطلاعی در این مورد ندارم.",0),
-    ("سازمان نیاز به این موضوع را شناسایی کرده ولی جزئیات آن را نمی‌دانم.",1),
-    ("سازمان در حال تدوین دستورالعمل‌های مرتبط است و فعالیت‌هایی به‌صورت موردی انجام می‌شود.",2),
-    ("بله، این موضوع در سازمان به‌صورت کامل و استاندارد پیاده‌سازی و اجرایی شده است.",3),
-    ("بله، چند سال است که نتایج اجرای آن بر اساس شاخص‌های استاندارد ارزیابی می‌شود و از بهترین تجربه‌ها برای بهبود مستمر استفاده می‌گردد.",4),
-]
-REL_OPTIONS = [("هیچ ارتباطی ندارد.",1),("ارتباط کم دارد.",3),("تا حدی مرتبط است.",5),("ارتباط زیادی دارد.",7),("کاملاً مرتبط است.",10)]
-
-# ─────────── ضرایب فازی نرمال‌شده (همان جدول شما) ───────────
-ROLE_MAP_EN2FA={"Senior Managers":"مدیران ارشد","Executives":"مدیران اجرایی","Supervisors/Sr Experts":"سرپرستان / خبرگان","Technical Experts":"متخصصان فنی","Non-Technical Experts":"متخصصان غیر فنی"}
-NORM_WEIGHTS = {  # … همان جدول کامل 1..40 (بدون تغییر)
-    1:{"Senior Managers":0.3846,"Executives":0.2692,"Supervisors/Sr Experts":0.1923,"Technical Experts":0.1154,"Non-Technical Experts":0.0385},
-    2:{"Senior Managers":0.2692,"Executives":0.3846,"Supervisors/Sr Experts":0.1923,"Technical Experts":0.1154,"Non-Technical Experts":0.0385},
-    3:{"Senior Managers":0.3846,"Executives":0.2692,"Supervisors/Sr Experts":0.1923,"Technical Experts":0.1154,"Non-Technical Experts":0.0385},
-    4:{"Senior Managers":0.3846,"Executives":0.2692,"Supervisors/Sr Experts":0.1923,"Technical Experts":0.1154,"Non-Technical Experts":0.0385},
-    5:{"Senior Managers":0.2692,"Executives":0.3846,"Supervisors/Sr Experts":0.1923,"Technical Experts":0.1154,"Non-Technical Experts":0.0385},
-    6:{"Senior Managers":0.1923,"Executives":0.2692,"Supervisors/Sr Experts":0.1154,"Technical Experts":0.0385,"Non-Technical Experts":0.3846},
-    7:{"Senior Managers":0.0385,"Executives":0.1923,"Supervisors/Sr Experts":0.2692,"Technical Experts":0.3846,"Non-Technical Experts":0.1154},
-    8:{"Senior Managers":0.3846,"Executives":0.2692,"Supervisors/Sr Experts":0.1923,"Technical Experts":0.1154,"Non-Technical Experts":0.0385},
-    9:{"Senior Managers":0.3846,"Executives":0.2692,"Supervisors/Sr Experts":0.1154,"Technical Experts":0.0385,"Non-Technical Experts":0.1923},
-    10:{"Senior Managers":0.1154,"Executives":0.2692,"Supervisors/Sr Experts":0.1923,"Technical Experts":0.0385,"Non-Technical Experts":0.3846},
-    11:{"Senior Managers":0.1923,"Executives":0.3846,"Supervisors/Sr Experts":0.2692,"Technical Experts":0.1154,"Non-Technical Experts":0.0385},
-    12:{"Senior Managers":0.1154,"Executives":0.2692,"Supervisors/Sr Experts":0.1923,"Technical Experts":0.0385,"Non-Technical Experts":0.3846},
-    13:{"Senior Managers":0.1154,"Executives":0.2692,"Supervisors/Sr Experts":0.1923,"Technical Experts":0.0385,"Non-Technical Experts":0.3846},
-    14:{"Senior Managers":0.3846,"Executives":0.2692,"Supervisors/Sr Experts":0.1923,"Technical Experts":0.1154,"Non-Technical Experts":0.0385},
-    15:{"Senior Managers":0.1923,"Executives":0.3846,"Supervisors/Sr Experts":0.2692,"Technical Experts":0.1154,"Non-Technical Experts":0.0385},
-    16:{"Senior Managers":0.1154,"Executives":0.1923,"Supervisors/Sr Experts":0.3846,"Technical Experts":0.2692,"Non-Technical Experts":0.0385},
-    17:{"Senior Managers":0.1923,"Executives":0.3846,"Supervisors/Sr Experts":0.2692,"Technical Experts":0.1154,"Non-Technical Experts":0.0385},
-    18:{"Senior Managers":0.2692,"Executives":0.3846,"Supervisors/Sr Experts":0.1923,"Technical Experts":0.1154,"Non-Technical Experts":0.0385},
-    19:{"Senior Managers":0.1154,"Executives":0.2692,"Supervisors/Sr Experts":0.1923,"Technical Experts":0.0385,"Non-Technical Experts":0.3846},
-    20:{"Senior Managers":0.2692,"Executives":0.3846,"Supervisors/Sr Experts":0.1923,"Technical Experts":0.1154,"Non-Technical Experts":0.0385},
-    21:{"Senior Managers":0.1154,"Executives":0.2692,"Supervisors/Sr Experts":0.1923,"Technical Experts":0.0385,"Non-Technical Experts":0.3846},
-    22:{"Senior Managers":0.2692,"Executives":0.3846,"Supervisors/Sr Experts":0.1923,"Technical Experts":0.1154,"Non-Technical Experts":0.0385},
-    23:{"Senior Managers":0.1923,"Executives":0.3846,"Supervisors/Sr Experts":0.2692,"Technical Experts":0.1154,"Non-Technical Experts":0.0385},
-    24:{"Senior Managers":0.0385,"Executives":0.1923,"Supervisors/Sr Experts":0.2692,"Technical Experts":0.3846,"Non-Technical Experts":0.1154},
-    25:{"Senior Managers":0.0385,"Executives":0.1923,"Supervisors/Sr Experts":0.2692,"Technical Experts":0.3846,"Non-Technical Experts":0.1154},
-    26:{"Senior Managers":0.1154,"Executives":0.1923,"Supervisors/Sr Experts":0.3846,"Technical Experts":0.2692,"Non-Technical Experts":0.0385},
-    27:{"Senior Managers":0.1154,"Executives":0.1923,"Supervisors/Sr Experts":0.3846,"Technical Experts":0.2692,"Non-Technical Experts":0.0385},
-    28:{"Senior Managers":0.1154,"Executives":0.1923,"Supervisors/Sr Experts":0.3846,"Technical Experts":0.2692,"Non-Technical Experts":0.0385},
-    29:{"Senior Managers":0.1923,"Executives":0.3846,"Supervisors/Sr Experts":0.0385,"Technical Experts":0.1154,"Non-Technical Experts":0.2692},
-    30:{"Senior Managers":0.1154,"Executives":0.3846,"Supervisors/Sr Experts":0.0385,"Technical Experts":0.2692,"Non-Technical Experts":0.1923},
-    31:{"Senior Managers":0.1154,"Executives":0.2692,"Supervisors/Sr Experts":0.1923,"Technical Experts":0.0385,"Non-Technical Experts":0.3846},
-    32:{"Senior Managers":0.0385,"Executives":0.2692,"Supervisors/Sr Experts":0.1154,"Technical Experts":0.3846,"Non-Technical Experts":0.1923},
-    33:{"Senior Managers":0.0385,"Executives":0.1923,"Supervisors/Sr Experts":0.1154,"Technical Experts":0.3846,"Non-Technical Experts":0.2692},
-    34:{"Senior Managers":0.0385,"Executives":0.2692,"Supervisors/Sr Experts":0.1154,"Technical Experts":0.3846,"Non-Technical Experts":0.1923},
-    35:{"Senior Managers":0.0385,"Executives":0.1923,"Supervisors/Sr Experts":0.1154,"Technical Experts":0.3846,"Non-Technical Experts":0.2692},
-    36:{"Senior Managers":0.3846,"Executives":0.2692,"Supervisors/Sr Experts":0.1923,"Technical Experts":0.1154,"Non-Technical Experts":0.0385},
-    37:{"Senior Managers":0.0385,"Executives":0.2692,"Supervisors/Sr Experts":0.3846,"Technical Experts":0.1923,"Non-Technical Experts":0.1154},
-    38:{"Senior Managers":0.0385,"Executives":0.2692,"Supervisors/Sr Experts":0.3846,"Technical Experts":0.1923,"Non-Technical Experts":0.1154},
-    39:{"Senior Managers":0.1923,"Executives":0.3846,"Supervisors/Sr Experts":0.2692,"Technical Experts":0.1154,"Non-Technical Experts":0.0385},
-    40:{"Senior Managers":0.3846,"Executives":0.2692,"Supervisors/Sr Experts":0.1154,"Technical Experts":0.0385,"Non-Technical Experts":0.1923},
-}
+
+# ─────────────── پرسشنامه: موضوعات، نقش‌ها، گزینه‌ها و ضرایب (surveys/*.json، survey_config.py) ───────────────
+SURVEY_KEYS = survey_config.list_surveys()
+survey_sel = st.sidebar.selectbox("📋 پرسشنامه", SURVEY_KEYS) if len(SURVEY_KEYS)>1 else SURVEY_KEYS[0]
+try:
+    SURVEY = survey_config.get_survey(survey_sel)   # compiled once per process (again only if its files change)
+except FileNotFoundError as e:
+    st.error(f"فایل موضوعات پرسشنامه پیدا نشد: {e.filename}"); st.stop()
+except survey_config.SurveyError as e:
+    st.error(f"تعریف پرسشنامهٔ «{survey_sel}» معتبر نیست: {e}"); st.stop()
+for _w in SURVEY.warnings: st.warning(_w)
+TOPICS = list(SURVEY.topics); ROLES = list(SURVEY.roles)
+LEVEL_OPTIONS = list(SURVEY.level_options); REL_OPTIONS = list(SURVEY.rel_options)
+run_timer.mark("config")
 
 # ---------- (بقیه‌ی کد شما؛ همان نسخه نهایی با UI، محاسبات، نمودارها و ورود با رمز) ----------
 # 🔻 برای جلوگیری از پیام خیلی طولانی، من کل بقیه کد را تغییر نداده‌ام.
@@ -159,69 +83,60 @@ NORM_WEIGHTS = {  # … همان جدول کامل 1..40 (بدون تغییر)
 
 # ---------- Helpers ----------
 def ensure_company(company:str): (DATA_DIR/company).mkdir(parents=True, exist_ok=True)
-def load_company_df(company:str)->pd.DataFrame:
-    ensure_company(company); p=DATA_DIR/company/"responses.csv"
-    if p.exists(): return pd.read_csv(p)
-    cols=["timestamp","company","respondent","role"]; 
-    for t in TOPICS: cols += [f"t{t['id']}_maturity",f"t{t['id']}_rel",f"t{t['id']}_adj"]
-    return pd.DataFrame(columns=cols)
-def save_response(company:str, rec:dict):
-    df_old=load_company_df(company); df_new=pd.concat([df_old, pd.DataFrame([rec])], ignore_index=True)
-    df_new.to_csv(DATA_DIR/company/"responses.csv", index=False)
-def normalize_adj_to_100(x): return (x/40.0)*100.0 if pd.notna(x) else np.nan
-def _angles_deg_40(): 
-    base=np.arange(0,360,360/40.0); return (base+90)%360
-
-def plot_radar(series_dict, title, tick_names, target=45, annotate=False, show_legend=True):
-    N=len(tick_names); angles=_angles_deg_40(); fig=go.Figure()
-    for label,vals in series_dict.items():
-        arr=list(vals); 
-        if len(arr)!=N: arr=(arr+[None]*N)[:N]
-        fig.add_trace(go.Scatterpolar(
-            r=arr+[arr[0]], theta=angles.tolist()+[angles[0]], thetaunit="degrees",
-            mode="lines+markers"+("+text" if annotate else ""), name=label,
-            text=[f"{v:.0f}" if v is not None else "" for v in arr+[arr[0]]] if annotate else None,
-            marker=dict(size=6, line=dict(width=1), color=ROLE_COLORS.get(label))))
-    fig.add_trace(go.Scatterpolar(r=[target]*(N+1), theta=angles.tolist()+[angles[0]],
-        thetaunit="degrees", mode="lines", name=f"هدف {target}", line=dict(dash="dash",width=3,color="#444"), hoverinfo="skip"))
-    fig.update_layout(template="plotly_white", font=dict(family="Vazir, Tahoma"),
-        polar=dict(radialaxis=dict(visible=True, range=[0,100], dtick=10, gridcolor="#e6ecf5"),
-                   angularaxis=dict(thetaunit="degrees",direction="clockwise",rotation=0,
-                                    tickmode="array", tickvals=angles.tolist(), ticktext=tick_names, gridcolor="#edf2fb")),
-        paper_bgcolor="#ffffff", showlegend=show_legend, legend=dict(orientation="h", yanchor="bottom", y=-0.2),
-        margin=dict(t=40,b=80,l=10,r=10))
-    st.plotly_chart(fig, use_container_width=True)
-
-def plot_bars_multirole(per_role, names, title, target=45):
-    x=[f"{i+1:02d} — {n}" for i,n in enumerate(names)]; fig=go.Figure()
-    for lab,vals in per_role.items():
-        fig.add_trace(go.Bar(x=x, y=vals, name=lab, marker_color=ROLE_COLORS.get(lab)))
-    fig.update_layout(template=PLOTLY_TEMPLATE, font=dict(family="Vazir, Tahoma"),
-        title=title, xaxis_title="موضوع", yaxis_title="نمره (0..100)", xaxis=dict(tickfont=dict(size=10)),
-        barmode="group", legend=dict(orientation="h", yanchor="bottom", y=-0.25),
-        margin=dict(t=40,b=120,l=10,r=10), paper_bgcolor="#ffffff")
-    fig.add_shape(type="rect", xref="paper", yref="y", x0=0, x1=1, y0=target-5, y1=target+5,
-                  fillcolor="rgba(255,0,0,0.06)", line_width=0)
-    fig.add_hline(y=target, line_dash="dash", line_color="red", annotation_text=f"هدف {target}")
-    st.plotly_chart(fig, use_container_width=True)
-
-def plot_lines_multirole(per_role, title, target=45):
-    x=[f"{i+1:02d}" for i in range(len(list(per_role.values())[0]))]; fig=go.Figure()
-    for lab,vals in per_role.items():
-        fig.add_trace(go.Scatter(x=x, y=vals, mode="lines+markers", name=lab, line=dict(width=2, color=ROLE_COLORS.get(lab))))
-    fig.update_layout(template=PLOTLY_TEMPLATE, font=dict(family="Vazir, Tahoma"),
-        title=title, xaxis_title="موضوع", yaxis_title="نمره (0..100)", paper_bgcolor="#ffffff", hovermode="x unified")
-    fig.add_shape(type="rect", xref="paper", yref="y", x0=0, x1=1, y0=target-5, y1=target+5,
-                  fillcolor="rgba(255,0,0,0.06)", line_width=0)
-    fig.add_hline(y=target, line_dash="dash", line_color="red", annotation_text=f"هدف {target}")
-    st.plotly_chart(fig, use_container_width=True)
-
-def org_weighted_topic(per_role_norm_fa, topic_id:int):
-    w=NORM_WEIGHTS.get(topic_id,{}); num=0.; den=0.
-    for en_key,weight in w.items():
-        fa=ROLE_MAP_EN2FA[en_key]; lst=per_role_norm_fa.get(fa,[]); idx=topic_id-1
-        if idx<len(lst) and pd.notna(lst[idx]): num+=weight*lst[idx]; den+=weight
-    return np.nan if den==0 else num/den
+def show_fig(fig):
+    """st.plotly_chart (serialization + send) timed as ``fig_render``, with the JSON payload size when measured."""
+    with run_timer.stage("fig_render"): st.plotly_chart(fig, use_container_width=True)
+    run_timer.payload("plotly", fig)
+def plot_radar(series_dict, title, tick_names, target=45, annotate=False, show_legend=True, key=None, light=False, bands=None):
+    """Render a radar; with ``key`` (identity of the plotted data) the figure comes from charts' cache."""
+    charts = timing.lazy_import("charts")
+    with run_timer.stage("fig_build"):
+        fig = (charts.cached_radar(key, series_dict, title, tick_names, target, annotate, show_legend, light, bands, SURVEY.role_colors) if key is not None
+               else charts.build_radar(series_dict, title, tick_names, target, annotate, show_legend, light, bands, SURVEY.role_colors))
+    show_fig(fig)
+
+def plot_bars_multirole(per_role, names, title, target=45, key=None, light=False, errors=None):
+    charts = timing.lazy_import("charts")
+    with run_timer.stage("fig_build"):
+        fig = (charts.cached_bars(key, per_role, names, title, target, light, errors, SURVEY.role_colors) if key is not None
+               else charts.build_bars_multirole(per_role, names, title, target, light, errors, SURVEY.role_colors))
+    show_fig(fig)
+
+def plot_lines_multirole(per_role, title, target=45, key=None, light=False):
+    charts = timing.lazy_import("charts")
+    with run_timer.stage("fig_build"):
+        fig = (charts.cached_lines(key, per_role, title, target, light, SURVEY.role_colors) if key is not None
+               else charts.build_lines_multirole(per_role, title, target, light, SURVEY.role_colors))
+    show_fig(fig)
+
+SURVEY_PAGE_SIZE = 5   # topics per survey page
+LEVEL_LABELS = [opt for (opt,_) in LEVEL_OPTIONS]; REL_LABELS = [opt for (opt,_) in REL_OPTIONS]
+
+def _is_answered(answers:dict, tid:int)->bool:
+    a=answers.get(tid); return bool(a) and a[0] is not None and a[1] is not None
+
+def _reset_answers(ss):
+    """Start a fresh questionnaire: new widget keys (``answer_gen``) so the radios do not resend the last answers
+    (Streamlit drops the old keys' state once they are no longer rendered)."""
+    ss["answers"] = {}; ss["survey_page"] = 0; ss["answer_gen"] = ss.get("answer_gen", 0)+1
+
+def render_topic(t:dict, answers:dict):
+    """Question card + two radios for one topic; the choice is kept in ``answers`` across pages."""
+    prev = answers.get(t["id"], [None, None]); desc = t["desc"].replace("\n","<br>")
+    st.markdown(f'''
+    <div class="question-card">
+      <div class="q-head"><span class="q-num">{t["id"]:02d}</span>{t["name"]}</div>
+      <div class="q-desc">{desc}</div>
+    </div>
+    ''', unsafe_allow_html=True)
+    st.markdown(f'<div class="q-question">۱) به نظر شما، موضوع «{t["name"]}» در سازمان شما در چه سطحی قرار دارد؟</div>', unsafe_allow_html=True)
+    gen = st.session_state.get("answer_gen", 0)
+    m_choice = st.radio("سطح", options=LEVEL_LABELS, key=f"mat_{t['id']}_{gen}", horizontal=False, label_visibility="collapsed",
+                        index=LEVEL_LABELS.index(prev[0]) if prev[0] in LEVEL_LABELS else None)
+    st.markdown(f'<div class="q-question">۲) موضوع «{t["name"]}» چقدر به حیطه کاری شما ارتباط مستقیم دارد؟</div>', unsafe_allow_html=True)
+    r_choice = st.radio("ارتباط", options=REL_LABELS, key=f"rel_{t['id']}_{gen}", horizontal=False, label_visibility="collapsed",
+                        index=REL_LABELS.index(prev[1]) if prev[1] in REL_LABELS else None)
+    answers[t["id"]] = [m_choice, r_choice]
 
 def get_company_logo_path(company:str)->Path|None:
     folder=DATA_DIR/company
@@ -237,6 +152,19 @@ if holding_logo_file: (ASSETS_DIR/"holding_logo.png").write_bytes(holding_logo_f
 holding_logo_path = ASSETS_DIR/"holding_logo.png"
 TARGET = st.sidebar.slider("🎯 خط هدف (0..100)", 0, 100, 45, 1)
 annotate_radar = st.sidebar.checkbox("نمایش اعداد روی نقاط رادار", value=False)
+light_charts = st.sidebar.checkbox("نمودارهای سبک (WebGL و اعداد گرد شده)", value=False,
+                                   help="حجم داده ارسالی به مرورگر را کم می‌کند؛ برای اینترنت موبایل مناسب است.")
+show_ci = st.sidebar.checkbox("بازهٔ اطمینان ۹۵٪ (بوت‌استرپ)", value=False,
+                              help="نوار خطا روی رادار و نمودار میله‌ای و بازهٔ شاخص‌ها؛ برای هر نسخهٔ داده یک‌بار محاسبه می‌شود.")
+weight_by_n = st.sidebar.checkbox("وزن‌دهی بر اساس تعداد پاسخ‌دهندگان", value=False,
+                                  help="ضریب فازی هر نقش در تعداد پاسخ‌های آن نقش ضرب می‌شود تا نقش‌های کم‌نمونه وزن کمتری بگیرند.")
+
+# ---------- run profiling: session / rerun counters ----------
+# the previous run of this session is complete by now (st.stop() can end a run anywhere), so it is recorded here
+_prev_timer = st.session_state.get("_run_timer"); st.session_state["_run_timer"] = run_timer
+st.session_state.setdefault("_session_id", uuid.uuid4().hex[:8]); st.session_state["_reruns"] = st.session_state.get("_reruns", 0)+1
+run_timer.session, run_timer.rerun = st.session_state["_session_id"], st.session_state["_reruns"]
+if _prev_timer is not None: timing.record(_prev_timer)
 
 tabs = st.tabs(["📝 پرسشنامه","📊 داشبورد"])
 
@@ -257,33 +185,50 @@ with tabs[0]:
     respondent = st.text_input("نام و نام خانوادگی (اختیاری)")
     role = st.selectbox("نقش / رده سازمانی", ROLES)
 
-    answers={}
-    # show all 40 topics (no pagination)
-    for t in TOPICS:
-        st.markdown(f'''
-        <div class="question-card">
-          <div class="q-head"><span class="q-num">{t["id"]:02d}</span>{t["name"]}</div>
-          <div class="q-desc">{t["desc"].replace("\n","<br>")}</div>
-        </div>
-        ''', unsafe_allow_html=True)
-        st.markdown(f'<div class="q-question">۱) به نظر شما، موضوع «{t["name"]}» در سازمان شما در چه سطحی قرار دارد؟</div>', unsafe_allow_html=True)
-        m_choice = st.radio("", options=[opt for (opt,_) in LEVEL_OPTIONS], key=f"mat_{t['id']}", horizontal=False, label_visibility="collapsed")
-        st.markdown(f'<div class="q-question">۲) موضوع «{t["name"]}» چقدر به حیطه کاری شما ارتباط مستقیم دارد؟</div>', unsafe_allow_html=True)
-        r_choice = st.radio("", options=[opt for (opt,_) in REL_OPTIONS], key=f"rel_{t['id']}", horizontal=False, label_visibility="collapsed")
-        answers[t['id']] = (m_choice, r_choice)
-
-    if st.button("ثبت پاسخ"):
-        if not company: st.error("نام شرکت را وارد کنید.")
-        elif not role: st.error("نقش/رده سازمانی را انتخاب کنید.")
-        elif len(answers)!=len(TOPICS): st.error("لطفاً همهٔ ۴۰ موضوع را پاسخ دهید.")
-        else:
-            ensure_company(company)
-            rec={"timestamp":datetime.now().isoformat(timespec="seconds"),"company":company,"respondent":respondent,"role":role}
-            for t in TOPICS:
-                m = dict(LEVEL_OPTIONS)[answers[t['id']][0]]
-                r = dict(REL_OPTIONS)[answers[t['id']][1]]
-                rec[f"t{t['id']}_maturity"]=m; rec[f"t{t['id']}_rel"]=r; rec[f"t{t['id']}_adj"]=m*r
-            save_response(company, rec); st.success("✅ پاسخ شما با موفقیت ذخیره شد.")
+    # answers live in session state so only the active page's widgets need rendering
+    ss = st.session_state
+    if ss.get("survey_key")!=SURVEY.key: _reset_answers(ss); ss["survey_key"] = SURVEY.key
+    ss.setdefault("answers", {}); ss.setdefault("survey_page", 0)
+    answers = ss["answers"]
+    pages = [TOPICS[i:i+SURVEY_PAGE_SIZE] for i in range(0, len(TOPICS), SURVEY_PAGE_SIZE)]
+    ss["survey_page"] = min(ss["survey_page"], len(pages)-1)
+    show_all = st.checkbox("نمایش همهٔ موضوع‌ها در یک صفحه", value=False)
+
+    def _goto(i): st.session_state["survey_page"] = i
+
+    progress_slot = st.empty()   # filled after this page's radios have updated the answers
+    page = ss["survey_page"]
+    for t in (TOPICS if show_all else pages[page]):
+        render_topic(t, answers)
+    answered = sum(1 for t in TOPICS if _is_answered(answers, t["id"]))
+    progress_slot.progress(answered/len(TOPICS), text=f"{answered} از {len(TOPICS)} موضوع پاسخ داده شده")
+
+    if not show_all:
+        st.caption(f"صفحه {page+1} از {len(pages)} — موضوع‌های {pages[page][0]['id']:02d} تا {pages[page][-1]['id']:02d}")
+        nav_prev, nav_next = st.columns(2)
+        nav_prev.button("→ صفحه قبل", on_click=_goto, args=(page-1,), disabled=page==0, use_container_width=True)
+        nav_next.button("صفحه بعد ←", on_click=_goto, args=(page+1,), disabled=page==len(pages)-1, use_container_width=True)
+
+    if show_all or page==len(pages)-1:
+        if st.button("ثبت پاسخ", type="primary"):
+            missing = [t["id"] for t in TOPICS if not _is_answered(answers, t["id"])]
+            if not company: st.error("نام شرکت را وارد کنید.")
+            elif not role: st.error("نقش/رده سازمانی را انتخاب کنید.")
+            elif missing:
+                st.error(f"لطفاً همهٔ {len(TOPICS)} موضوع را پاسخ دهید. موضوع‌های بی‌پاسخ: " + "، ".join(f"{i:02d}" for i in missing))
+                first = next(k for k,pg in enumerate(pages) if any(t["id"]==missing[0] for t in pg))
+                if not show_all: st.button("رفتن به اولین موضوع بی‌پاسخ", on_click=_goto, args=(first,))
+            else:
+                ensure_company(company)
+                rec={"timestamp":datetime.now().isoformat(timespec="seconds"),"company":company,"respondent":respondent,"role":role,
+                     "survey":SURVEY.key}
+                for t in TOPICS:
+                    m = SURVEY.level_codes[answers[t['id']][0]]
+                    r = SURVEY.rel_codes[answers[t['id']][1]]
+                    rec[f"t{t['id']}_maturity"]=m; rec[f"t{t['id']}_rel"]=r; rec[f"t{t['id']}_adj"]=m*r
+                storage.submit(company, rec, run_timer.stage); st.success("✅ پاسخ شما با موفقیت ذخیره شد.")
+                _reset_answers(ss)   # a second click now finds an empty questionnaire instead of storing a duplicate
+    run_timer.mark("survey")
 
 # ======================= Dashboard =======================
 with tabs[1]:
@@ -291,9 +236,102 @@ with tabs[1]:
     password = st.text_input("🔑 رمز عبور داشبورد را وارد کنید", type="password")
     if password != "Emacraven110":
         st.error("دسترسی محدود است. رمز عبور درست را وارد کنید."); st.stop()
-
-    companies = sorted([d.name for d in DATA_DIR.iterdir() if d.is_dir()])
+    charts = timing.lazy_import("charts")   # plotly is only loaded once the dashboard is unlocked
+    run_timer.mark("dashboard_auth")
+
+    # admin-only profiling panel (previous run of this session + recent runs of this server process)
+    with st.expander("⏱️ پروفایل اجرا (مدیر)"):
+        _cold = timing.cold_start()
+        st.caption(f"اجرای نخست این فرایند (cold start): {_cold.total_ms:.0f} ms" + (" — همین اجرا" if is_cold_run else "")
+                   + f" — اجراهای این نشست: {run_timer.rerun}")
+        if not run_timer.enabled:
+            st.info("پروفایل‌گیری خاموش است (SURVEY_PROFILE=0).")
+        elif _prev_timer is not None:
+            st.caption(f"اجرای قبلی این نشست: {_prev_timer.total_ms:.0f} ms")
+            p1, p2 = st.columns(2)
+            p1.dataframe(pd.DataFrame(_prev_timer.stages(), columns=["مرحله","ms"]).round(1), hide_index=True, use_container_width=True)
+            p2.dataframe(pd.DataFrame([(n, c, ms) for n,(c,ms) in _prev_timer.spans.items()], columns=["بخش","تعداد","ms"]).round(1),
+                         hide_index=True, use_container_width=True)
+            if _prev_timer.payloads:
+                st.caption("حجم ارسالی نمودارها: " + "، ".join(f"{n}: {c} نمودار، {b/1024:.0f} KB" for n,(c,b) in _prev_timer.payloads.items()))
+        if run_timer.enabled:   # each chart is serialized once more to measure it, so this is opt-in
+            run_timer.measure_payload = st.checkbox("اندازه‌گیری حجم ارسالی نمودارها", value=timing.PAYLOAD, key="_profile_payload",
+                                                    help="از اجرای بعدی در جدول بالا دیده می‌شود (SURVEY_PROFILE_PAYLOAD=1 پیش‌فرض را روشن می‌کند).")
+        if timing.IMPORT_MS:
+            st.caption("بارگذاری تنبل: " + "، ".join(f"{k} {v:.0f} ms" for k,v in timing.IMPORT_MS.items()))
+        if timing.HISTORY:
+            st.caption(f"{len(timing.HISTORY)} اجرای اخیر این سرور")
+            st.dataframe(pd.DataFrame(timing.summary()).round(1), hide_index=True, use_container_width=True)
+
+    # bulk import of offline answers (validated column-wise, one transaction per company; see bulk_import.py)
+    with st.expander("📥 ورود گروهی پاسخ‌ها (CSV / Excel)"):
+        st.caption("هر ردیف یک پاسخ‌دهنده: company، role، respondent (اختیاری)، timestamp (اختیاری) و برای هر موضوع "
+                   "t{id}_maturity و t{id}_rel — متن گزینه‌ها یا کد عددی آن‌ها "
+                   f"(سطح {'/'.join(str(c) for _,c in LEVEL_OPTIONS)}، ارتباط {'/'.join(str(c) for _,c in REL_OPTIONS)}). "
+                   f"ردیف‌ها با پرسشنامهٔ انتخاب‌شده ({SURVEY.key}) ثبت می‌شوند.")
+        st.download_button("⬇️ قالب خالی", data=bulk_import.template(SURVEY.topic_ids).to_csv(index=False).encode("utf-8-sig"),
+                           file_name="import_template.csv", mime="text/csv")
+        with st.form("bulk_import_form"):
+            imp_file = st.file_uploader("فایل پاسخ‌ها", type=["csv","xlsx"])
+            imp_company = st.text_input("نام شرکت برای همهٔ ردیف‌ها (اختیاری؛ در غیر این صورت ستون company)")
+            imp_strict = st.checkbox("در صورت وجود هر خطا هیچ ردیفی ثبت نشود")
+            imp_go = st.form_submit_button("ثبت پاسخ‌ها")
+        if imp_go and imp_file is not None:
+            with st.spinner("در حال اعتبارسنجی و ثبت…"):
+                with run_timer.stage("bulk_import"):
+                    imp = bulk_import.import_file(imp_file, SURVEY.topic_ids, imp_company.strip() or None,
+                                                  imp_strict, name=imp_file.name, survey=SURVEY)
+            st.success(f"{imp.rows_imported} از {imp.rows_read} ردیف ثبت شد" +
+                       ("" if not imp.imported else " — " + "، ".join(f"{c}: {n}" for c,n in imp.imported.items())))
+            if len(imp.errors):
+                st.error(f"{len(imp.errors)} خطا" + (" — به دلیل حالت سخت‌گیرانه چیزی ثبت نشد." if imp_strict else " — ردیف‌های دارای خطا ثبت نشدند."))
+                st.dataframe(imp.errors.head(1000), hide_index=True, use_container_width=True)
+                st.download_button("⬇️ گزارش خطاها", data=imp.errors.to_csv(index=False).encode("utf-8-sig"),
+                                   file_name="import_errors.csv", mime="text/csv")
+
+    companies = storage.list_companies()
     if not companies: st.warning("هنوز هیچ پاسخی ثبت نشده است."); st.stop()
+
+    view = st.radio("نمای داشبورد", ["شرکت","هلدینگ (همه شرکت‌ها)"], horizontal=True)
+    if view!="شرکت":
+        # ---------- holding-wide rollup ----------
+        topic_labels=[f"{i+1:02d} — {t['name']}" for i,t in enumerate(TOPICS)]
+        results = holding.score_all(SURVEY.topic_ids, TARGET, companies, weighted=weight_by_n, survey=SURVEY)
+        if not results: st.warning("هنوز هیچ پاسخی برای این پرسشنامه ثبت نشده است."); st.stop()
+        rank_df = holding.ranking_table(results, topic_labels)
+
+        st.markdown('<div class="panel">', unsafe_allow_html=True)
+        k1,k2,k3 = st.columns(3)
+        k1.markdown(f"""<div class="kpi"><div class="title">تعداد شرکت‌ها</div>
+        <div class="value">{len(results)}</div><div class="sub">دارای پاسخ</div></div>""", unsafe_allow_html=True)
+        k2.markdown(f"""<div class="kpi"><div class="title">میانگین هلدینگ</div>
+        <div class="value">{np.mean([r['org_avg'] for r in results]):.1f}</div><div class="sub">میانگین ساده شرکت‌ها</div></div>""", unsafe_allow_html=True)
+        k3.markdown(f"""<div class="kpi"><div class="title">کل پاسخ‌ها</div>
+        <div class="value">{sum(r['n'] for r in results)}</div><div class="sub">همه شرکت‌ها</div></div>""", unsafe_allow_html=True)
+        st.markdown('</div>', unsafe_allow_html=True)
+
+        st.markdown('<div class="panel"><h4>رتبه‌بندی شرکت‌ها</h4>', unsafe_allow_html=True)
+        st.dataframe(rank_df, use_container_width=True, hide_index=True)
+        st.markdown('</div>', unsafe_allow_html=True)
+
+        st.markdown('<div class="panel"><h4>Heatmap شرکت × موضوع</h4>', unsafe_allow_html=True)
+        mat = holding.topic_matrix(results, topic_labels).reindex(rank_df["شرکت"])
+        # data version + count weighting (with the survey): what the plotted org series depend on
+        hold_key = (SURVEY.key,)+tuple((r["company"], r["version"], r["weighted"]) for r in results)
+        with run_timer.stage("fig_build"): fig_hold = charts.cached(("holding_heat", hold_key), lambda: charts.build_company_heatmap(mat))
+        show_fig(fig_hold)
+        st.markdown('</div>', unsafe_allow_html=True)
+
+        st.markdown('<div class="panel"><h4>رادار مقایسه‌ای شرکت‌ها (میانگین سازمان)</h4>', unsafe_allow_html=True)
+        by_name = {r["company"]: r for r in results}
+        overlay = st.multiselect("شرکت‌های قابل نمایش", rank_df["شرکت"].tolist(), default=rank_df["شرکت"].tolist()[:5])
+        if overlay:
+            plot_radar({c: by_name[c]["org_series"].tolist() for c in overlay}, "رادار شرکت‌ها", topic_labels,
+                       key=("holding", SURVEY.key, tuple((c, by_name[c]["version"], by_name[c]["weighted"]) for c in overlay)), light=light_charts,
+                       target=TARGET, annotate=False, show_legend=True)
+        st.markdown('</div>', unsafe_allow_html=True)
+        st.stop()
+
     company = st.selectbox("انتخاب شرکت", companies)
 
     # logos
@@ -306,66 +344,80 @@ with tabs[1]:
         comp_logo_path = get_company_logo_path(company)
         if comp_logo_path: st.image(str(comp_logo_path), width=90, caption=company)
 
-    df = load_company_df(company)
-    if df.empty: st.warning("برای این شرکت پاسخی وجود ندارد."); st.stop()
-
-    # normalize 0..100
-    for t in TOPICS: 
-        c=f"t{t['id']}_adj"; df[c]=df[c].apply(lambda x: (x/40)*100 if pd.notna(x) else np.nan)
-
-    # per-role means (40)
-    role_means={}
-    for r in ROLES:
-        sub=df[df["role"]==r]
-        role_means[r]=[sub[f"t{t['id']}_adj"].mean() if not sub.empty else np.nan for t in TOPICS]
-
-    # fuzzy org mean
-    per_role_norm_fa={r:role_means[r] for r in ROLES}
-    org_series=[org_weighted_topic(per_role_norm_fa, t["id"]) for t in TOPICS]
-    org_avg=float(np.nanmean(org_series)) if any(pd.notna(v) for v in org_series) else 0.0
-    pass_rate=np.mean([1 if (v>=TARGET) else 0 for v in org_series if pd.notna(v)])*100 if any(pd.notna(v) for v in org_series) else 0
-
-    # simple means for top/bottom
-    simple_means=[]
-    for i,_ in enumerate(TOPICS):
-        vals=[role_means[r][i] for r in ROLES if pd.notna(role_means[r][i])]
-        simple_means.append(np.nanmean(vals) if vals else np.nan)
-    best_idx=int(np.nanargmax(simple_means)) if np.isfinite(np.nanmax(simple_means)) else None
-    worst_idx=int(np.nanargmin(simple_means)) if np.isfinite(np.nanmin(simple_means)) else None
+    # precomputed role × topic totals (refreshed incrementally, cached per data version)
+    with run_timer.stage("aggregates"): agg = aggregates.get(company, SURVEY)
+    if agg["total"]==0: st.warning("برای این شرکت در این پرسشنامه پاسخی وجود ندارد."); st.stop()
+
+    # per-role means (one per topic), normalized 0..100
+    topic_ids=list(SURVEY.topic_ids)
+    with run_timer.stage("scoring"):
+        means = scoring.role_means_from_aggregates(agg, topic_ids, ROLES)
+        role_means={r: means[i].tolist() for i,r in enumerate(ROLES)}
+        # fuzzy org mean + KPIs (vectorized, see scoring.py)
+        W = scoring.weight_matrix(topic_ids, ROLES, SURVEY)
+        if weight_by_n: W = scoring.count_weighted(W, aggregates.role_topic_counts(agg, ROLES, topic_ids))
+        kpis = scoring.summarize(means, W, TARGET)
+    org_series = kpis["org_series"].tolist(); org_avg = kpis["org_avg"]; pass_rate = kpis["pass_rate"]
+    best_idx, worst_idx = kpis["best_idx"], kpis["worst_idx"]
     best_label=f"{best_idx+1:02d} — {TOPICS[best_idx]['name']}" if best_idx is not None else "-"
     worst_label=f"{worst_idx+1:02d} — {TOPICS[worst_idx]['name']}" if worst_idx is not None else "-"
 
+    # bootstrap intervals (resamples cached per data version; see stats.py)
+    ci = None
+    if show_ci:
+        with st.spinner("محاسبهٔ بازهٔ اطمینان…"), run_timer.stage("bootstrap"):
+            ci = stats.intervals(stats.resample(company, topic_ids, ROLES, survey=SURVEY), scoring.weight_matrix(topic_ids, ROLES, SURVEY),
+                                 TARGET, weight_by_n)
+    def ci_txt(name, fmt):
+        if ci is None or ci[name][0]!=ci[name][0]: return ""
+        return f" — CI95: {ci[name][0]:{fmt}}–{ci[name][1]:{fmt}}"
+    run_timer.mark("aggregates_scoring")
+
     # KPIs inside panel
     st.markdown('<div class="panel">', unsafe_allow_html=True)
     k1,k2,k3,k4 = st.columns(4)
     k1.markdown(f"""<div class="kpi"><div class="title">میانگین سازمان (فازی)</div>
-    <div class="value">{org_avg:.1f}</div><div class="sub">از 100</div></div>""", unsafe_allow_html=True)
+    <div class="value">{org_avg:.1f}</div><div class="sub">از 100{ci_txt("org_avg", ".1f")}</div></div>""", unsafe_allow_html=True)
     k2.markdown(f"""<div class="kpi"><div class="title">نرخ عبور از هدف</div>
-    <div class="value">{pass_rate:.0f}%</div><div class="sub">نقاط ≥ هدف</div></div>""", unsafe_allow_html=True)
+    <div class="value">{pass_rate:.0f}%</div><div class="sub">نقاط ≥ هدف{ci_txt("pass_rate", ".0f")}</div></div>""", unsafe_allow_html=True)
     k3.markdown(f"""<div class="kpi"><div class="title">بهترین موضوع</div>
     <div class="value">{best_label}</div><div class="sub">میانگین ساده نقش‌ها</div></div>""", unsafe_allow_html=True)
     k4.markdown(f"""<div class="kpi"><div class="title">ضعیف‌ترین موضوع</div>
     <div class="value">{worst_label}</div><div class="sub">میانگین ساده نقش‌ها</div></div>""", unsafe_allow_html=True)
     st.markdown('</div>', unsafe_allow_html=True)
 
+    # respondents per role + low-sample flag
+    st.markdown('<div class="panel"><h4>تعداد پاسخ‌دهندگان</h4>', unsafe_allow_html=True)
+    n_role = [int(agg["n"].get(r, 0)) for r in ROLES]
+    st.dataframe(pd.DataFrame({"نقش": ROLES, "تعداد پاسخ‌دهنده": n_role,
+                               "وضعیت": ["⚠️ نمونهٔ کم" if n<stats.MIN_N else "✓" for n in n_role]}),
+                 hide_index=True, use_container_width=True)
+    low = [r for r,n in zip(ROLES, n_role) if n<stats.MIN_N]
+    if low: st.warning(f"نقش‌های با کمتر از {stats.MIN_N} پاسخ‌دهنده: " + "، ".join(low) + " — میانگین این نقش‌ها قابل اتکا نیست.")
+    st.markdown('</div>', unsafe_allow_html=True)
+
     # filters panel
     st.markdown('<div class="panel"><h4>فیلترها</h4>', unsafe_allow_html=True)
     roles_selected = st.multiselect("نقش‌های قابل نمایش", ROLES, default=ROLES)
-    topic_range = st.slider("بازهٔ موضوع‌ها", 1, 40, (1,40))
+    topic_range = st.slider("بازهٔ موضوع‌ها", 1, len(TOPICS), (1, len(TOPICS))) if len(TOPICS)>1 else (1, 1)
     idx0, idx1 = topic_range[0]-1, topic_range[1]
     topics_slice = TOPICS[idx0:idx1]; tick_names=[f"{i+idx0+1:02d} — {t['name']}" for i,t in enumerate(topics_slice)]
     role_means_filtered={r: role_means[r][idx0:idx1] for r in roles_selected}
     org_series_slice = org_series[idx0:idx1]
+    # figure-cache identity: company data version + role selection + topic range (target/annotate are patched)
+    data_key = (company, SURVEY.key, agg["version"], show_ci, weight_by_n); roles_key = tuple(roles_selected)
+    role_band = lambda r: None if ci is None else {r: (ci["role"][0][ROLES.index(r)][idx0:idx1].tolist(), ci["role"][1][ROLES.index(r)][idx0:idx1].tolist())}
     st.markdown('</div>', unsafe_allow_html=True)
 
     # radar per role panel
-    st.markdown('<div class="panel"><h4>رادار ۴۰‌بخشی برای هر رده</h4>', unsafe_allow_html=True)
+    st.markdown(f'<div class="panel"><h4>رادار {len(TOPICS)}‌بخشی برای هر رده</h4>', unsafe_allow_html=True)
     cols=st.columns(2); cidx=0
     for r in roles_selected:
         vals=role_means_filtered[r]
         if not vals or all(pd.isna(vals)): continue
         with cols[cidx%2]:
-            plot_radar({r:vals}, f"رادار — {r}", tick_names, target=TARGET, annotate=annotate_radar, show_legend=False)
+            plot_radar({r:vals}, f"رادار — {r}", tick_names, target=TARGET, annotate=annotate_radar, show_legend=False,
+                       key=(data_key, "role", r, topic_range), light=light_charts, bands=role_band(r))
         cidx+=1
     if cidx==0: st.info("داده‌ای برای ترسیم رادار تک‌نقش وجود ندارد.")
     st.markdown('</div>', unsafe_allow_html=True)
@@ -373,59 +425,152 @@ with tabs[1]:
     # overlay radar
     st.markdown('<div class="panel"><h4>رادار مقایسه‌ای نقش‌ها</h4>', unsafe_allow_html=True)
     if role_means_filtered:
-        plot_radar(role_means_filtered, "رادار مقایسه‌ای", tick_names, target=TARGET, annotate=False, show_legend=True)
+        plot_radar(role_means_filtered, "رادار مقایسه‌ای", tick_names, target=TARGET, annotate=False, show_legend=True,
+                   key=(data_key, "overlay", roles_key, topic_range), light=light_charts)
     st.markdown('</div>', unsafe_allow_html=True)
 
     # org radar
     st.markdown('<div class="panel"><h4>رادار میانگین سازمان (وزن‌دهی فازی)</h4>', unsafe_allow_html=True)
-    plot_radar({"میانگین سازمان": org_series_slice}, "میانگین سازمان", tick_names, target=TARGET, annotate=annotate_radar, show_legend=False)
+    plot_radar({"میانگین سازمان": org_series_slice}, "میانگین سازمان", tick_names, target=TARGET, annotate=annotate_radar, show_legend=False,
+               key=(data_key, "org", topic_range), light=light_charts,
+               bands=None if ci is None else {"میانگین سازمان": (ci["org"][0][idx0:idx1].tolist(), ci["org"][1][idx0:idx1].tolist())})
     st.markdown('</div>', unsafe_allow_html=True)
 
     # bars
     st.markdown('<div class="panel"><h4>نمودار میله‌ای (نقش‌ها)</h4>', unsafe_allow_html=True)
-    plot_bars_multirole({r:role_means[r][idx0:idx1] for r in roles_selected}, [t['name'] for t in topics_slice], "مقایسه رده‌ها", target=TARGET)
+    plot_bars_multirole({r:role_means[r][idx0:idx1] for r in roles_selected}, [t['name'] for t in topics_slice], "مقایسه رده‌ها", target=TARGET,
+                        key=(data_key, roles_key, topic_range), light=light_charts,
+                        errors=None if ci is None else {r: role_band(r)[r] for r in roles_selected})
     st.markdown('</div>', unsafe_allow_html=True)
 
     # lines
     st.markdown('<div class="panel"><h4>نمودار خطی مقایسه‌ای</h4>', unsafe_allow_html=True)
-    plot_lines_multirole({r:role_means[r][idx0:idx1] for r in roles_selected}, "Line Chart — مقایسه رده‌ها", target=TARGET)
+    plot_lines_multirole({r:role_means[r][idx0:idx1] for r in roles_selected}, "Line Chart — مقایسه رده‌ها", target=TARGET,
+                         key=(data_key, roles_key, topic_range), light=light_charts)
     st.markdown('</div>', unsafe_allow_html=True)
 
     # heatmap
     st.markdown('<div class="panel"><h4>Heatmap موضوع × نقش</h4>', unsafe_allow_html=True)
     heat_df = pd.DataFrame({"موضوع":tick_names})
     for r in roles_selected: heat_df[r]=role_means[r][idx0:idx1]
-    hm = heat_df.melt(id_vars="موضوع", var_name="نقش", value_name="امتیاز")
-    fig_heat = px.density_heatmap(hm, x="نقش", y="موضوع", z="امتیاز", color_continuous_scale="RdYlGn", height=560, template=PLOTLY_TEMPLATE)
-    st.plotly_chart(fig_heat, use_container_width=True)
+    with run_timer.stage("fig_build"): fig_heat, hm = charts.cached(("heat", data_key, roles_key, topic_range), lambda: charts.build_heatmap(heat_df))
+    show_fig(fig_heat)
     st.markdown('</div>', unsafe_allow_html=True)
 
     # box
     st.markdown('<div class="panel"><h4>Boxplot توزیع نمرات</h4>', unsafe_allow_html=True)
-    fig_box = px.box(hm.dropna(), x="نقش", y="امتیاز", points="all", color="نقش", color_discrete_map=ROLE_COLORS, template=PLOTLY_TEMPLATE)
-    st.plotly_chart(fig_box, use_container_width=True)
+    with run_timer.stage("fig_build"): fig_box = charts.cached(("box", data_key, roles_key, topic_range), lambda: charts.build_box(hm, SURVEY.role_colors))
+    show_fig(fig_box)
     st.markdown('</div>', unsafe_allow_html=True)
 
-    # corr & clustering
+    # corr & clustering (models and matrices cached per data version/roles/range/k, see clustering.py)
     st.markdown('<div class="panel"><h4>ماتریس همبستگی و خوشه‌بندی</h4>', unsafe_allow_html=True)
     corr_base = heat_df.set_index("موضوع")[roles_selected]
+    model_key = (data_key, roles_key, topic_range)
     if not corr_base.empty:
-        corr = corr_base.T.corr()
-        fig_corr = px.imshow(corr, text_auto=True, color_continuous_scale="RdBu_r", aspect="auto", height=620, template=PLOTLY_TEMPLATE)
-        st.plotly_chart(fig_corr, use_container_width=True)
+        corr = clustering.topic_correlation(model_key, corr_base)
+        with run_timer.stage("fig_build"): fig_corr = charts.cached(("corr", data_key, roles_key, topic_range), lambda: charts.build_corr(corr))
+        show_fig(fig_corr)
     if SKLEARN_OK and corr_base.notna().any().any():
+        cl_mode = st.radio("مبنای خوشه‌بندی", ["موضوع‌ها (میانگین نقش‌ها)", "پاسخ‌دهندگان"], horizontal=True)
         k = st.slider("تعداد خوشه‌ها (K)", 2, 6, 3)
-        X = corr_base.fillna(corr_base.mean()).values
-        km = KMeans(n_clusters=k, n_init=10, random_state=42).fit(X)
-        clusters = km.labels_
-        cl_df = pd.DataFrame({"موضوع":corr_base.index,"خوشه":clusters}).sort_values("خوشه")
-        st.dataframe(cl_df, use_container_width=True)
+        if cl_mode=="پاسخ‌دهندگان":
+            topic_ids_slice = [t["id"] for t in topics_slice]
+            with st.spinner("خوشه‌بندی پاسخ‌دهندگان…"):
+                with run_timer.stage("clustering"): res = clustering.respondent_clusters(company, topic_ids_slice, roles_selected, k, survey=SURVEY)
+            if res is None:
+                st.info("تعداد پاسخ‌دهندگان کمتر از تعداد خوشه‌هاست.")
+            else:
+                c1, c2 = st.columns(2)
+                c1.dataframe(res["sizes"].rename_axis("خوشه"), use_container_width=True)
+                c2.dataframe(res["roles"], use_container_width=True)
+                centers = res["centers"].T; centers.index = tick_names
+                st.dataframe(centers.round(1), use_container_width=True)
+        else:
+            with run_timer.stage("clustering"): cl_df = clustering.topic_clusters(model_key, corr_base, k)
+            st.dataframe(cl_df, use_container_width=True)
+        with st.expander("انتخاب K با شاخص سیلوئت"):
+            if st.button("محاسبهٔ سیلوئت برای K=2..8"):
+                with st.spinner("در حال برازش مدل‌ها…"):
+                    sweep = (clustering.respondent_sweep(company, [t["id"] for t in topics_slice], roles_selected, survey=SURVEY)
+                             if cl_mode=="پاسخ‌دهندگان" else clustering.topic_sweep(model_key, corr_base, range(2, 9)))
+                st.dataframe(sweep.set_index("k").round(3), use_container_width=True)
     st.markdown('</div>', unsafe_allow_html=True)
 
+    # trends panel: served from monthly buckets (trends.py), never from raw rows
+    st.markdown('<div class="panel"><h4>روند زمانی بلوغ</h4>', unsafe_allow_html=True)
+    month_list = trends.months(company, SURVEY)
+    if len(month_list)<1:
+        st.info("برای این شرکت تاریخ ثبت معتبری وجود ندارد.")
+    else:
+        waves = trends.load_waves(BASE/"waves.json")
+        freq_labels = {"ماهانه":"month", "فصلی":"quarter", "سالانه":"year"}
+        if waves: freq_labels["موج‌های نظرسنجی"] = "wave"
+        f1, f2 = st.columns([1,2])
+        freq = freq_labels[f1.radio("دوره‌بندی", list(freq_labels), horizontal=True)]
+        win = f2.select_slider("بازهٔ ماه‌ها", month_list, value=(month_list[0], month_list[-1])) if len(month_list)>1 else (month_list[0],)*2
+        # org average / pass rate always over all roles; the role filter only picks the per-role lines
+        with run_timer.stage("trends"): tr = trends.trend(company, [t["id"] for t in topics_slice], roles_selected, TARGET, freq, waves,
+                                                           win[0], win[1], SURVEY)
+        if tr.empty:
+            st.info("در این بازه داده‌ای وجود ندارد.")
+        else:
+            with run_timer.stage("fig_build"):
+                fig_tr = charts.cached(("trend", data_key, roles_key, topic_range, freq, win, TARGET, light_charts),
+                                       lambda: charts.build_trend(tr, roles_selected, TARGET, light_charts, SURVEY.role_colors))
+            show_fig(fig_tr)
+            st.dataframe(tr.set_index("دوره").round(1), use_container_width=True)
+            # before/after radar: org series of two periods (month ranges or waves) from the same buckets
+            periods = tr["دوره"].tolist()
+            if len(periods)>1:
+                b1, b2 = st.columns(2)
+                p_before = b1.selectbox("دورهٔ قبل", periods, index=0)
+                p_after = b2.selectbox("دورهٔ بعد", periods, index=len(periods)-1)
+                W_slice = scoring.weight_matrix([t["id"] for t in topics_slice], ROLES, SURVEY)
+                in_win = pd.Series([mo for mo in month_list if win[0]<=mo<=win[1]])
+                month_period = trends.period_of(in_win, freq, waves)
+                cmp = {}
+                for p in (p_before, p_after):
+                    m = in_win[month_period==p].tolist()
+                    rm, _ = trends.window_means(company, [t["id"] for t in topics_slice], ROLES, survey=SURVEY, month_set=m)
+                    W_p = W_slice
+                    if weight_by_n:
+                        W_p = scoring.count_weighted(W_slice, trends.window_counts(company, [t["id"] for t in topics_slice],
+                                                                                   ROLES, survey=SURVEY, month_set=m))
+                    cmp[str(p)] = scoring.org_scores(rm, W_p).tolist()
+                plot_radar(cmp, "مقایسهٔ قبل/بعد", tick_names, target=TARGET, annotate=False, show_legend=True,
+                           key=(data_key, "trend_cmp", freq, win, str(p_before), str(p_after), topic_range), light=light_charts)
+    st.markdown('</div>', unsafe_allow_html=True)
+
+    run_timer.mark("charts")
+
     # downloads panel
     st.markdown('<div class="panel"><h4>دانلود</h4>', unsafe_allow_html=True)
-    st.download_button("⬇️ دانلود CSV پاسخ‌های شرکت",
-                       data=load_company_df(company).to_csv(index=False).encode("utf-8-sig"),
-                       file_name=f"{company}_responses.csv", mime="text/csv")
-    st.caption("برای دانلود تصویر نمودارها می‌توان بستهٔ `kaleido` را به requirements اضافه کرد و از fig.to_image استفاده نمود.")
+    # exports are generated only on request, streamed in chunks to disk and reused until new data arrives
+    with st.form("export_form"):
+        e1, e2 = st.columns(2)
+        exp_fmt = e1.radio("قالب فایل", ["CSV","Excel"], horizontal=True) if export.EXCEL_OK else "CSV"
+        exp_scope = e2.radio("دامنه", ["همین شرکت","همه شرکت‌ها"], horizontal=True)
+        exp_roles = st.multiselect("نقش‌ها", ROLES, default=ROLES)
+        exp_range = st.slider("بازهٔ موضوع‌ها (خروجی)", 1, len(TOPICS), (1, len(TOPICS))) if len(TOPICS)>1 else (1, 1)
+        exp_use_dates = st.checkbox("فیلتر بر اساس تاریخ ثبت")
+        exp_dates = st.date_input("بازهٔ تاریخ", value=(), help="تاریخ شروع و پایان (شامل هر دو)")
+        exp_go = st.form_submit_button("📄 تهیهٔ فایل خروجی")
+    if exp_go:
+        flt = export.ExportFilter(
+            roles=None if set(exp_roles)==set(ROLES) else tuple(exp_roles),
+            topic_ids=tuple(t["id"] for t in TOPICS[exp_range[0]-1:exp_range[1]]),
+            date_from=exp_dates[0] if exp_use_dates and len(exp_dates)>0 else None,
+            date_to=exp_dates[-1] if exp_use_dates and len(exp_dates)>0 else None,
+            fmt="xlsx" if exp_fmt=="Excel" else "csv",
+            companies=(company,) if exp_scope=="همین شرکت" else tuple(companies), survey=SURVEY.key)
+        with st.spinner("در حال تهیهٔ فایل…"):
+            exp_path, exp_rows = export.export(flt)
+        st.caption(f"{exp_rows} ردیف — {exp_path.stat().st_size/2**20:.1f} MB")
+        # download_button reads the whole file into server memory for this session; very large exports
+        # are better copied from the exports/ folder on the server (old files are pruned by export.prune)
+        with open(exp_path, "rb") as fh:
+            st.download_button("⬇️ دانلود فایل", data=fh, file_name=export.file_name(flt), mime=export.MIME[flt.fmt])
+    st.caption("گزارش ایستای همهٔ شرکت‌ها و هلدینگ (HTML/PNG/PDF): `python report.py --formats html png pdf` — فقط شرکت‌هایی که دادهٔ جدید دارند دوباره ساخته می‌شوند.")
     st.markdown('</div>', unsafe_allow_html=True)
+    run_timer.mark("dashboard")
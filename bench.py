@@ -0,0 +1,243 @@
+# bench.py
+# -*- coding: utf-8 -*-
+"""Benchmark / load-test harness for the submit and dashboard paths.
+
+Generates synthetic responses that follow the TOPICS / LEVEL_OPTIONS / REL_OPTIONS
+schema into a scratch data directory, then times each stage separately and runs
+concurrent submitters against one company to check that no rows are lost.
+Results are printed (or written) as JSON so runs can be compared across versions.
+
+    python bench.py --rows 1000 10000 --companies 1 10 --submitters 8 --out bench.json
+"""
+import argparse
+import json
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import aggregates
+import holding
+import scoring
+import snapshot
+import storage
+from survey_config import DEFAULT_SURVEY, ROLES, LEVEL_OPTIONS, REL_OPTIONS, load_topics
+
+TOPICS, _ = load_topics()
+TOPIC_IDS = [t["id"] for t in TOPICS]
+SEED_CHUNK = 20_000
+
+
+# ---------- synthetic data ----------
+def synth_responses(n:int, company:str, rng:np.random.Generator, start:datetime|None=None, days:int=730)->pd.DataFrame:
+    """``n`` random responses for ``company`` with the same columns the survey tab writes."""
+    T = len(TOPIC_IDS)
+    mat = rng.choice(np.array([v for _,v in LEVEL_OPTIONS]), size=(n, T))
+    rel = rng.choice(np.array([v for _,v in REL_OPTIONS]), size=(n, T))
+    start = start or datetime(2024, 1, 1)
+    secs = np.sort(rng.integers(0, days*86400, size=n))
+    df = pd.DataFrame({"timestamp": [(start+timedelta(seconds=int(s))).isoformat(timespec="seconds") for s in secs],
+                       "company": company, "respondent": [f"synthetic-{i}" for i in range(n)],
+                       "role": rng.choice(np.array(ROLES, dtype=object), size=n), "survey": DEFAULT_SURVEY})
+    cols = {}
+    for j,t in enumerate(TOPIC_IDS):
+        cols[f"t{t}_maturity"] = mat[:, j]; cols[f"t{t}_rel"] = rel[:, j]; cols[f"t{t}_adj"] = mat[:, j]*rel[:, j]
+    return pd.concat([df, pd.DataFrame(cols)], axis=1)
+
+
+def synth_record(company:str, rng:np.random.Generator)->dict:
+    return synth_responses(1, company, rng).iloc[0].to_dict()
+
+
+def seed(companies:list[str], rows:int, rng:np.random.Generator)->None:
+    per = np.full(len(companies), rows//len(companies)); per[:rows%len(companies)] += 1
+    for company, n in zip(companies, per):
+        for lo in range(0, int(n), SEED_CHUNK):
+            df = synth_responses(min(SEED_CHUNK, int(n)-lo), company, rng)
+            storage.append_records(company, df.to_dict("records"))
+
+
+# ---------- timing helpers ----------
+def _stats(samples:list[float])->dict:
+    ms = sorted(s*1000 for s in samples)
+    return {"n": len(ms), "min_ms": ms[0], "mean_ms": statistics.fmean(ms), "p50_ms": ms[len(ms)//2],
+            "p95_ms": ms[min(len(ms)-1, int(len(ms)*0.95))], "max_ms": ms[-1]}
+
+
+def timeit(fn, repeat:int=5)->dict:
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter(); fn(); samples.append(time.perf_counter()-t0)
+    return _stats(samples)
+
+
+def response_columns()->list[str]:
+    cols = list(storage.META_COLS)
+    for t in TOPIC_IDS: cols += [f"t{t}_maturity", f"t{t}_rel", f"t{t}_adj"]
+    return cols
+
+
+# ---------- stages ----------
+def bench_submit(company:str, rng, repeat:int)->dict:
+    recs = [synth_record(company, rng) for _ in range(repeat)]; it = iter(recs)
+    return timeit(lambda: storage.submit(company, next(it)), repeat)
+
+
+def bench_load(company:str, repeat:int)->dict:
+    """load_company_df (snapshot), the raw store, and the dashboard's role + _adj projection."""
+    cols = response_columns(); adj = ["role"]+[f"t{t}_adj" for t in TOPIC_IDS]
+    return {"snapshot_build": timeit(lambda: snapshot.refresh(company), 1),
+            "load_company_df": timeit(lambda: snapshot.read(company, cols), repeat),
+            "store_read_all": timeit(lambda: storage.read_responses(company, cols), repeat),
+            "snapshot_read_adj": timeit(lambda: snapshot.read(company, adj), repeat),
+            "memory_mb_all": snapshot.read(company, cols).memory_usage(deep=True).sum()/2**20}
+
+
+def bench_scoring(company:str, repeat:int)->dict:
+    W = scoring.weight_matrix(TOPIC_IDS, ROLES)
+    aggregates._CACHE.pop((company, DEFAULT_SURVEY), None)
+    out = {"aggregates_cold": timeit(lambda: (aggregates._CACHE.pop((company, DEFAULT_SURVEY), None), aggregates.get(company)), 1),
+           "aggregates_cached": timeit(lambda: aggregates.get(company), repeat)}
+    agg = aggregates.get(company)
+    means = scoring.role_means_from_aggregates(agg, TOPIC_IDS, ROLES)
+    out["summarize"] = timeit(lambda: scoring.summarize(means, W, 45), repeat)
+    df = storage.read_responses(company, ["role"]+[f"t{t}_adj" for t in TOPIC_IDS])
+    out["role_means_from_df"] = timeit(lambda: scoring.role_means_from_df(df, TOPIC_IDS, ROLES), repeat)
+    return out
+
+
+def bench_charts(company:str, repeat:int)->dict:
+    import charts
+    agg = aggregates.get(company)
+    means = scoring.role_means_from_aggregates(agg, TOPIC_IDS, ROLES)
+    org = scoring.summarize(means, scoring.weight_matrix(TOPIC_IDS, ROLES), 45)["org_series"].tolist()
+    per_role = {r: means[i].tolist() for i,r in enumerate(ROLES)}
+    ticks = [f"{i+1:02d} — {t['name']}" for i,t in enumerate(TOPICS)]; names = [t["name"] for t in TOPICS]
+    heat_df = pd.DataFrame({"موضوع": ticks, **per_role})
+    _, hm = charts.build_heatmap(heat_df)
+    corr = heat_df.set_index("موضوع")[ROLES].T.corr()
+    builders = {
+        "radar_single": lambda: charts.build_radar({ROLES[0]: per_role[ROLES[0]]}, "", ticks, 45, False, False),
+        "radar_overlay": lambda: charts.build_radar(per_role, "", ticks, 45, False, True),
+        "radar_org": lambda: charts.build_radar({"org": org}, "", ticks, 45, True, False),
+        "bars": lambda: charts.build_bars_multirole(per_role, names, "", 45),
+        "lines": lambda: charts.build_lines_multirole(per_role, "", 45),
+        "heatmap": lambda: charts.build_heatmap(heat_df)[0],
+        "box": lambda: charts.build_box(hm),
+        "corr": lambda: charts.build_corr(corr),
+    }
+    out = {}
+    for name, fn in builders.items():
+        out[name] = timeit(fn, repeat); out[name]["json_bytes"] = len(fn().to_json())
+    # figure cache: warm hit, and a target change that only re-patches the cached base traces
+    charts.clear_cache(); targets = iter(range(1000))
+    key = ("bench", company)
+    charts.cached_radar(key, per_role, "", ticks, 45, False, True)
+    out["radar_overlay_cache_hit"] = timeit(lambda: charts.cached_radar(key, per_role, "", ticks, 45, False, True), repeat)
+    out["radar_overlay_target_patch"] = timeit(lambda: charts.cached_radar(key, per_role, "", ticks, next(targets), False, True), repeat)
+    out["light_json_bytes"] = {"radar_overlay": len(charts.build_radar(per_role, "", ticks, 45, False, True, light=True).to_json()),
+                               "bars": len(charts.build_bars_multirole(per_role, names, "", 45, light=True).to_json()),
+                               "lines": len(charts.build_lines_multirole(per_role, "", 45, light=True).to_json())}
+    return out
+
+
+def bench_holding(topic_ids, repeat:int)->dict:
+    holding._CACHE.clear(); aggregates._CACHE.clear()
+    return {"score_all_cold": timeit(lambda: holding.score_all(topic_ids, 45), 1),
+            "score_all_cached": timeit(lambda: holding.score_all(topic_ids, 45), repeat)}
+
+
+def _submitter(args)->int:
+    data_dir, company, n, seed_ = args
+    storage.DATA_DIR = Path(data_dir)
+    rng = np.random.default_rng(seed_)
+    for _ in range(n): storage.submit(company, synth_record(company, rng))
+    return n
+
+
+def bench_concurrency(company:str, submitters:int, per_submitter:int, mode:str)->dict:
+    before = storage.count_responses(company)
+    Pool = ProcessPoolExecutor if mode=="process" else ThreadPoolExecutor
+    t0 = time.perf_counter()
+    with Pool(max_workers=submitters) as ex:
+        written = sum(ex.map(_submitter, [(str(storage.DATA_DIR), company, per_submitter, 1000+i) for i in range(submitters)]))
+    elapsed = time.perf_counter()-t0
+    after = storage.count_responses(company)
+    aggregates._CACHE.pop((company, DEFAULT_SURVEY), None)
+    agg_total = aggregates.get(company)["total"]
+    return {"mode": mode, "submitters": submitters, "per_submitter": per_submitter, "expected": before+written,
+            "actual": after, "lost_rows": before+written-after, "aggregate_total": agg_total,
+            "elapsed_s": elapsed, "submits_per_s": written/elapsed if elapsed else None}
+
+
+# ---------- driver ----------
+def _git_rev()->str|None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=Path(__file__).parent, timeout=10).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def run(rows_list, companies_list, submitters:int, per_submitter:int, repeat:int, mode:str, keep:bool)->dict:
+    report = {"meta": {"started": datetime.now().isoformat(timespec="seconds"), "git": _git_rev(),
+                       "python": platform.python_version(), "numpy": np.__version__, "pandas": pd.__version__,
+                       "topics": len(TOPIC_IDS)},
+              "runs": []}
+    orig_dir = storage.DATA_DIR
+    for n_comp in companies_list:
+        for rows in rows_list:
+            tmp = Path(tempfile.mkdtemp(prefix="survey-bench-"))
+            storage.DATA_DIR = tmp; aggregates._CACHE.clear(); holding._CACHE.clear()
+            try:
+                rng = np.random.default_rng(42)
+                names = [f"company-{i:03d}" for i in range(n_comp)]
+                t0 = time.perf_counter(); seed(names, rows, rng); seed_s = time.perf_counter()-t0
+                c0 = names[0]
+                r = {"rows": rows, "companies": n_comp, "rows_in_target_company": storage.count_responses(c0),
+                     "seed_s": seed_s}
+                r["load"] = bench_load(c0, repeat)
+                r["scoring"] = bench_scoring(c0, repeat)
+                r["charts"] = bench_charts(c0, repeat)
+                r["holding"] = bench_holding(TOPIC_IDS, repeat)
+                r["save_response"] = bench_submit(c0, rng, max(repeat, 20))
+                if submitters: r["concurrency"] = bench_concurrency(c0, submitters, per_submitter, mode)
+                report["runs"].append(r)
+                print(f"[bench] rows={rows} companies={n_comp} done", file=sys.stderr)
+            finally:
+                storage.DATA_DIR = orig_dir
+                if keep: print(f"[bench] data kept in {tmp}", file=sys.stderr)
+                else: shutil.rmtree(tmp, ignore_errors=True)
+    report["meta"]["finished"] = datetime.now().isoformat(timespec="seconds")
+    return report
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--rows", type=int, nargs="+", default=[1000, 10000], help="total synthetic rows per scale")
+    ap.add_argument("--companies", type=int, nargs="+", default=[1], help="number of companies the rows are spread over")
+    ap.add_argument("--submitters", type=int, default=8, help="concurrent submitters for the lost-row check (0 to skip)")
+    ap.add_argument("--per-submitter", type=int, default=25)
+    ap.add_argument("--mode", choices=["process", "thread"], default="process")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--out", help="write JSON here instead of stdout")
+    ap.add_argument("--keep", action="store_true", help="keep the scratch data directories")
+    a = ap.parse_args(argv)
+    report = run(a.rows, a.companies, a.submitters, a.per_submitter, a.repeat, a.mode, a.keep)
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if a.out: Path(a.out).write_text(text, encoding="utf-8")
+    else: print(text)
+    return 0 if all(r.get("concurrency", {}).get("lost_rows", 0)==0 for r in report["runs"]) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,190 @@
+# bulk_import.py
+# -*- coding: utf-8 -*-
+"""Bulk import of offline (paper/Excel) survey answers, validated column-wise (no Streamlit import).
+
+Input is one row per respondent with ``company``, ``role``, optional ``respondent`` and
+``timestamp``, and ``t{id}_maturity`` / ``t{id}_rel`` for every topic of the chosen survey
+version (default survey unless ``--survey``). Answers may be the option labels of the form
+or their numeric codes (maturity 0..4, relevance 1/3/5/7/10 in the default survey); roles may
+be the survey's role labels or their English names. Rows are tagged with the survey key. Each column is
+mapped and checked with vectorized pandas operations, ``_adj`` is computed as one array
+product, and the valid rows of each company are written in a single transaction.
+
+    python bulk_import.py answers.xlsx                 # errors -> answers.errors.csv
+    python bulk_import.py answers.csv --company "شرکت الف" --strict --survey asset_management@1
+"""
+import argparse
+import json
+import sys
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import aggregates
+import storage
+from survey_config import get_survey
+
+CSV_CHUNK_ROWS = 50_000
+ERROR_COLS = ["ردیف", "ستون", "مقدار", "خطا"]
+
+
+@dataclass
+class ImportResult:
+    rows_read: int = 0
+    imported: dict = field(default_factory=dict)    # company -> rows written
+    errors: pd.DataFrame = field(default_factory=lambda: pd.DataFrame(columns=ERROR_COLS))
+
+    @property
+    def rows_imported(self)->int:
+        return sum(self.imported.values())
+
+
+def template(topic_ids)->pd.DataFrame:
+    """Empty frame with the expected import columns."""
+    cols = ["timestamp", "company", "respondent", "role"]+[f"t{t}_{k}" for t in topic_ids for k in ("maturity", "rel")]
+    return pd.DataFrame(columns=cols)
+
+
+def _codes(options)->tuple[dict, set]:
+    return {lab.strip(): code for lab, code in options}, {code for _, code in options}
+
+
+def _map_answers(s:pd.Series, options)->tuple[pd.Series, pd.Series]:
+    """Labels or numeric codes to codes (float, NaN where missing or invalid), plus the blank-cell mask."""
+    labels, valid = _codes(options)
+    codes, uniques = pd.factorize(s)   # a column has only a handful of distinct answers: map those, then take
+    def one(v):
+        v = str(v).strip()
+        if v in labels: return labels[v]
+        try: num = float(v)
+        except ValueError: return np.nan
+        return num if num in valid else np.nan
+    table = np.array([one(v) for v in uniques]+[np.nan], dtype=float)   # code -1 (NaN cell) picks the trailing entry
+    blank = np.array([str(v).strip()=="" for v in uniques]+[True])
+    return pd.Series(table[codes], index=s.index), pd.Series(blank[codes], index=s.index)
+
+
+def _row_errors(mask:pd.Series, col:str, values:pd.Series, msg:str)->pd.DataFrame:
+    idx = mask[mask.to_numpy(dtype=bool)].index
+    return pd.DataFrame({"ردیف": idx+2, "ستون": col, "مقدار": values.reindex(idx).astype(object).to_numpy(), "خطا": msg})
+
+
+def validate(raw:pd.DataFrame, topic_ids, company:str|None=None, survey=None)->tuple[pd.DataFrame, pd.DataFrame]:
+    """Return ``(valid rows ready for storage, error report)``; rows with any error are dropped.
+
+    ``raw`` keeps its original 0-based index so error rows map to spreadsheet rows (index + 2).
+    """
+    raw = raw.rename(columns=lambda c: str(c).strip()); survey = get_survey(survey)
+    errors = []
+    out = pd.DataFrame(index=raw.index)
+
+    comp = pd.Series(company, index=raw.index, dtype="string") if company else \
+        raw.get("company", pd.Series(pd.NA, index=raw.index)).astype("string").str.strip()
+    comp = comp.mask(comp=="")
+    bad_comp = comp.isna() | comp.str.contains(r"[/\\]|^\.\.?$", regex=True).fillna(False)
+    errors.append(_row_errors(bad_comp, "company", comp, "نام شرکت خالی یا نامعتبر است"))
+    out["company"] = comp
+
+    role_in = raw.get("role", pd.Series(pd.NA, index=raw.index)).astype("string").str.strip()
+    role_map = {r: r for r in survey.roles} | survey.role_aliases
+    role = role_in.map(role_map)
+    errors.append(_row_errors(role.isna(), "role", role_in, "نقش نامعتبر است"))
+    out["role"] = role
+
+    out["survey"] = survey.key
+    out["respondent"] = raw.get("respondent", pd.Series("", index=raw.index)).astype("string").fillna("")
+    if "timestamp" in raw:
+        ts_in = raw["timestamp"].astype("string").str.strip()
+        ts = pd.to_datetime(ts_in, errors="coerce")
+        errors.append(_row_errors(ts_in.notna() & ts.isna(), "timestamp", ts_in, "تاریخ نامعتبر است"))
+        now = datetime.now().isoformat(timespec="seconds")
+        out["timestamp"] = ts.dt.strftime("%Y-%m-%dT%H:%M:%S").fillna(now)
+    else:
+        out["timestamp"] = datetime.now().isoformat(timespec="seconds")
+
+    mats, rels = [], []
+    for t in topic_ids:
+        for kind, options, dest in (("maturity", survey.level_options, mats), ("rel", survey.rel_options, rels)):
+            col = f"t{t}_{kind}"
+            if col not in raw:
+                errors.append(pd.DataFrame({"ردیف": [1], "ستون": [col], "مقدار": [None], "خطا": ["ستون وجود ندارد"]}))
+                dest.append(pd.Series(np.nan, index=raw.index)); continue
+            codes, missing = _map_answers(raw[col], options)
+            errors.append(_row_errors(missing, col, raw[col], "پاسخ خالی است"))
+            errors.append(_row_errors(~missing & codes.isna(), col, raw[col], "گزینهٔ نامعتبر"))
+            dest.append(codes)
+    M = np.column_stack([s.to_numpy(dtype=float) for s in mats]) if mats else np.empty((len(raw), 0))
+    R = np.column_stack([s.to_numpy(dtype=float) for s in rels]) if rels else np.empty((len(raw), 0))
+    A = M*R
+    answers = pd.DataFrame({f"t{t}_{k}": X[:, j] for j, t in enumerate(topic_ids)
+                            for k, X in (("maturity", M), ("rel", R), ("adj", A))}, index=raw.index)
+    out = pd.concat([out[storage.META_COLS], answers], axis=1)
+
+    err = pd.concat([e for e in errors if len(e)], ignore_index=True) if any(len(e) for e in errors) \
+        else pd.DataFrame(columns=ERROR_COLS)
+    bad_rows = set(err["ردیف"][err["ردیف"]>=2]-2) if len(err) else set()
+    if len(err) and (err["ردیف"]==1).any():   # a required column is missing: nothing can be imported
+        bad_rows = set(raw.index)
+    ok = out[~out.index.isin(bad_rows)]
+    num = [c for c in ok.columns if c not in storage.META_COLS]
+    ok = ok.astype({c: "int64" for c in num}) if len(ok) else ok
+    return ok, err.sort_values(["ردیف", "ستون"], kind="stable").reset_index(drop=True)
+
+
+def read_file(path_or_buf, name:str|None=None):
+    """Yield raw frames (all values as text): CSV in chunks, Excel as one sheet."""
+    name = str(name or path_or_buf).lower()
+    if name.endswith((".xlsx", ".xlsm", ".xls")):
+        yield pd.read_excel(path_or_buf, dtype=str)
+    else:
+        yield from pd.read_csv(path_or_buf, dtype=str, chunksize=CSV_CHUNK_ROWS, encoding="utf-8-sig")
+
+
+def import_frames(frames, topic_ids, company:str|None=None, strict:bool=False, survey=None)->ImportResult:
+    """Validate every frame, then write the valid rows with one transaction per company.
+
+    With ``strict`` nothing is written when any row has an error.
+    """
+    res = ImportResult(); valid, errs, offset = [], [], 0
+    for raw in frames:
+        raw.index = pd.RangeIndex(offset, offset+len(raw)); offset += len(raw)
+        ok, err = validate(raw, topic_ids, company, survey)
+        valid.append(ok); errs.append(err); res.rows_read += len(raw)
+    errs = [e for e in errs if len(e)]
+    if errs: res.errors = pd.concat(errs, ignore_index=True)
+    if strict and len(res.errors): return res
+    data = pd.concat(valid) if valid else pd.DataFrame()
+    if data.empty: return res
+    for comp, rows in data.groupby("company", sort=False):
+        res.imported[comp] = storage.append_frame(comp, rows)
+        aggregates.refresh(comp)
+    return res
+
+
+def import_file(path_or_buf, topic_ids, company:str|None=None, strict:bool=False, name:str|None=None,
+                survey=None)->ImportResult:
+    return import_frames(read_file(path_or_buf, name), topic_ids, company, strict, survey)
+
+
+def main(argv=None)->int:
+    ap = argparse.ArgumentParser(description="Import offline survey answers from CSV/Excel.")
+    ap.add_argument("path")
+    ap.add_argument("--company", help="use this company for every row (ignores the company column)")
+    ap.add_argument("--strict", action="store_true", help="import nothing if any row has an error")
+    ap.add_argument("--errors", help="error report path (default: <input>.errors.csv)")
+    ap.add_argument("--survey", help="survey key, e.g. asset_management@1 (default survey when omitted)")
+    a = ap.parse_args(argv)
+    survey = get_survey(a.survey)
+    res = import_file(a.path, survey.topic_ids, a.company, a.strict, survey=survey)
+    if len(res.errors):
+        out = Path(a.errors or Path(a.path).with_suffix(".errors.csv"))
+        res.errors.to_csv(out, index=False, encoding="utf-8-sig")
+    print(json.dumps({"rows_read": res.rows_read, "imported": res.imported, "errors": len(res.errors)}, ensure_ascii=False))
+    return 1 if len(res.errors) else 0
+
+
+if __name__=="__main__":
+    sys.exit(main())
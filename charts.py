@@ -0,0 +1,183 @@
+# charts.py
+# -*- coding: utf-8 -*-
+"""Plotly figure builders for the dashboard (no Streamlit import; callers render or export).
+
+Radar/bar/line figures are split into data traces (``_*_base``) and a cheap patch for
+the target line and radar labels, so ``cached_*`` can keep the base per data key and
+only re-patch when the target or annotate flag changes. ``light=True`` rounds values
+and uses WebGL traces where plotly has them, to cut the payload sent per rerun.
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import plotly.express as px
+
+from survey_config import ROLE_COLORS
+
+PLOTLY_TEMPLATE = "plotly_white"
+
+FIG_CACHE_SIZE = 256
+_FIG_CACHE:OrderedDict = OrderedDict()
+_FIG_LOCK = threading.Lock()
+
+def _angles_deg(n:int):
+    """Evenly spaced radar angles for ``n`` topics (any survey size), starting at 12 o'clock."""
+    base=np.arange(n)*(360.0/max(n,1)); return (base+90)%360
+
+def _light_vals(vals, light:bool):
+    """Light payload: one decimal is plenty for a 0..100 chart and shrinks the JSON sent to the browser."""
+    if not light: return list(vals)
+    return [None if v is None or v!=v else round(float(v), 1) for v in vals]
+
+def _radar_text(v): return f"{v:.0f}" if v is not None and v==v else ""
+
+def _rgba(color, alpha):
+    color=(color or "#7f7f7f").lstrip("#"); r,g,b=(int(color[i:i+2],16) for i in (0,2,4))
+    return f"rgba({r},{g},{b},{alpha})"
+
+def _ci_arrays(vals, lo, hi):
+    """Asymmetric error-bar lengths (NaN-safe) from interval bounds."""
+    v=np.asarray(vals, dtype=float); return (np.nan_to_num(np.asarray(hi, dtype=float)-v).tolist(),
+                                           np.nan_to_num(v-np.asarray(lo, dtype=float)).tolist())
+
+# ---------- base traces (cached) + cheap patches for target / text overlay ----------
+def _radar_base(series_dict, tick_names, show_legend=True, light=False, bands=None, colors=None):
+    N=len(tick_names); angles=_angles_deg(N); fig=go.Figure(); colors=colors or ROLE_COLORS
+    Trace = go.Scatterpolargl if light else go.Scatterpolar
+    for label,(lo,hi) in (bands or {}).items():   # confidence band: outer ring (hi) then inner ring (lo) reversed
+        lo=_light_vals(lo, light); hi=_light_vals(hi, light); th=angles.tolist()
+        fig.add_trace(go.Scatterpolar(r=hi+[hi[0], lo[0]]+lo[:0:-1]+[lo[0]], theta=th+[th[0], th[0]]+th[:0:-1]+[th[0]], thetaunit="degrees",
+            mode="lines", fill="toself", fillcolor=_rgba(colors.get(label), 0.15), line=dict(width=0),
+            name=f"بازهٔ اطمینان — {label}", hoverinfo="skip", showlegend=False))
+    for label,vals in series_dict.items():
+        arr=_light_vals(vals, light)
+        if len(arr)!=N: arr=(arr+[None]*N)[:N]
+        fig.add_trace(Trace(
+            r=arr+[arr[0]], theta=angles.tolist()+[angles[0]], thetaunit="degrees",
+            mode="lines+markers", name=label,
+            marker=dict(size=6, line=dict(width=1), color=colors.get(label))))
+    fig.update_layout(template="plotly_white", font=dict(family="Vazir, Tahoma"),
+        polar=dict(radialaxis=dict(visible=True, range=[0,100], dtick=10, gridcolor="#e6ecf5"),
+                   angularaxis=dict(thetaunit="degrees",direction="clockwise",rotation=0,
+                                    tickmode="array", tickvals=angles.tolist(), ticktext=tick_names, gridcolor="#edf2fb")),
+        paper_bgcolor="#ffffff", showlegend=show_legend, legend=dict(orientation="h", yanchor="bottom", y=-0.2),
+        margin=dict(t=40,b=80,l=10,r=10))
+    return fig
+
+def _radar_patch(fig, target, annotate):
+    if annotate:
+        for tr in fig.data:
+            if tr.fill!="toself": tr.update(mode="lines+markers+text", text=[_radar_text(v) for v in tr.r])
+    N=len(fig.layout.polar.angularaxis.ticktext or []); angles=_angles_deg(N)
+    fig.add_trace(go.Scatterpolar(r=[target]*(N+1), theta=angles.tolist()+[angles[0]],
+        thetaunit="degrees", mode="lines", name=f"هدف {target}", line=dict(dash="dash",width=3,color="#444"), hoverinfo="skip"))
+    return fig
+
+def _target_band_patch(fig, target):
+    fig.add_shape(type="rect", xref="paper", yref="y", x0=0, x1=1, y0=target-5, y1=target+5,
+                  fillcolor="rgba(255,0,0,0.06)", line_width=0)
+    fig.add_hline(y=target, line_dash="dash", line_color="red", annotation_text=f"هدف {target}")
+    return fig
+
+def _bars_base(per_role, names, title, light=False, errors=None, colors=None):
+    x=[f"{i+1:02d} — {n}" for i,n in enumerate(names)]; fig=go.Figure()
+    for lab,vals in per_role.items():
+        err=None
+        if errors and lab in errors:
+            up,down=_ci_arrays(vals, *errors[lab])
+            err=dict(type="data", symmetric=False, array=_light_vals(up, light), arrayminus=_light_vals(down, light), thickness=1)
+        fig.add_trace(go.Bar(x=x, y=_light_vals(vals, light), name=lab, marker_color=(colors or ROLE_COLORS).get(lab), error_y=err))
+    fig.update_layout(template=PLOTLY_TEMPLATE, font=dict(family="Vazir, Tahoma"),
+        title=title, xaxis_title="موضوع", yaxis_title="نمره (0..100)", xaxis=dict(tickfont=dict(size=10)),
+        barmode="group", legend=dict(orientation="h", yanchor="bottom", y=-0.25),
+        margin=dict(t=40,b=120,l=10,r=10), paper_bgcolor="#ffffff")
+    return fig
+
+def _lines_base(per_role, title, light=False, colors=None):
+    x=[f"{i+1:02d}" for i in range(len(list(per_role.values())[0]))]; fig=go.Figure()
+    Trace = go.Scattergl if light else go.Scatter
+    for lab,vals in per_role.items():
+        fig.add_trace(Trace(x=x, y=_light_vals(vals, light), mode="lines+markers", name=lab, line=dict(width=2, color=(colors or ROLE_COLORS).get(lab))))
+    fig.update_layout(template=PLOTLY_TEMPLATE, font=dict(family="Vazir, Tahoma"),
+        title=title, xaxis_title="موضوع", yaxis_title="نمره (0..100)", paper_bgcolor="#ffffff", hovermode="x unified")
+    return fig
+
+def build_radar(series_dict, title, tick_names, target=45, annotate=False, show_legend=True, light=False, bands=None, colors=None):
+    return _radar_patch(_radar_base(series_dict, tick_names, show_legend, light, bands, colors), target, annotate)
+
+def build_bars_multirole(per_role, names, title, target=45, light=False, errors=None, colors=None):
+    return _target_band_patch(_bars_base(per_role, names, title, light, errors, colors), target)
+
+def build_lines_multirole(per_role, title, target=45, light=False, colors=None):
+    return _target_band_patch(_lines_base(per_role, title, light, colors), target)
+
+# ---------- figure cache ----------
+def cached(key, build):
+    """LRU cache of built figures. ``key`` must identify the data (e.g. data version, roles, topic range)."""
+    with _FIG_LOCK:
+        fig = _FIG_CACHE.get(key)
+        if fig is not None:
+            _FIG_CACHE.move_to_end(key); return fig
+    fig = build()
+    with _FIG_LOCK:
+        _FIG_CACHE[key] = fig
+        while len(_FIG_CACHE)>FIG_CACHE_SIZE: _FIG_CACHE.popitem(last=False)
+    return fig
+
+def _patched(key, base_key, build_base, patch):
+    """Final figure for ``key``: reuse the cached base traces and only apply the target/text patch."""
+    return cached(key, lambda: patch(go.Figure(cached(base_key, build_base))))
+
+def cached_radar(data_key, series_dict, title, tick_names, target=45, annotate=False, show_legend=True, light=False, bands=None,
+                 colors=None):
+    """``colors`` (role -> colour, e.g. ``Survey.role_colors``) is assumed fixed for a ``data_key``."""
+    base_key = ("radar", data_key, show_legend, light, bands is not None)
+    return _patched(base_key+(target, annotate), base_key,
+                    lambda: _radar_base(series_dict, tick_names, show_legend, light, bands, colors),
+                    lambda fig: _radar_patch(fig, target, annotate))
+
+def cached_bars(data_key, per_role, names, title, target=45, light=False, errors=None, colors=None):
+    base_key = ("bars", data_key, title, light, errors is not None)
+    return _patched(base_key+(target,), base_key, lambda: _bars_base(per_role, names, title, light, errors, colors),
+                    lambda fig: _target_band_patch(fig, target))
+
+def cached_lines(data_key, per_role, title, target=45, light=False, colors=None):
+    base_key = ("lines", data_key, title, light)
+    return _patched(base_key+(target,), base_key, lambda: _lines_base(per_role, title, light, colors),
+                    lambda fig: _target_band_patch(fig, target))
+
+def clear_cache():
+    with _FIG_LOCK: _FIG_CACHE.clear()
+
+def build_heatmap(heat_df:pd.DataFrame):
+    """Topic × role density heatmap; returns (figure, long-form frame reused by the box plot)."""
+    hm = heat_df.melt(id_vars="موضوع", var_name="نقش", value_name="امتیاز")
+    fig = px.density_heatmap(hm, x="نقش", y="موضوع", z="امتیاز", color_continuous_scale="RdYlGn", height=560, template=PLOTLY_TEMPLATE)
+    return fig, hm
+
+def build_box(hm:pd.DataFrame, colors=None):
+    return px.box(hm.dropna(), x="نقش", y="امتیاز", points="all", color="نقش", color_discrete_map=colors or ROLE_COLORS, template=PLOTLY_TEMPLATE)
+
+def build_corr(corr:pd.DataFrame):
+    return px.imshow(corr, text_auto=True, color_continuous_scale="RdBu_r", aspect="auto", height=620, template=PLOTLY_TEMPLATE)
+
+def build_company_heatmap(mat:pd.DataFrame):
+    """Company × topic heatmap for the holding view."""
+    return px.imshow(mat, color_continuous_scale="RdYlGn", zmin=0, zmax=100, aspect="auto",
+                     height=max(360, 28*len(mat)+200), template=PLOTLY_TEMPLATE)
+
+def build_trend(tr:pd.DataFrame, roles, target=45, light=False, colors=None):
+    """Org average and per-role means over periods (rows of :func:`trends.trend`)."""
+    fig=go.Figure(); Trace = go.Scattergl if light else go.Scatter; x=tr["دوره"].astype(str).tolist()
+    fig.add_trace(Trace(x=x, y=_light_vals(tr["میانگین سازمان"], light), mode="lines+markers", name="میانگین سازمان",
+                        line=dict(width=4, color="#111"), customdata=tr["تعداد پاسخ"], hovertemplate="%{y:.1f} (n=%{customdata})"))
+    for r in roles:
+        if r in tr: fig.add_trace(Trace(x=x, y=_light_vals(tr[r], light), mode="lines+markers", name=r,
+                                        line=dict(width=2, color=(colors or ROLE_COLORS).get(r))))
+    fig.update_layout(template=PLOTLY_TEMPLATE, font=dict(family="Vazir, Tahoma"), xaxis_title="دوره", yaxis_title="نمره (0..100)",
+                      xaxis=dict(type="category"), paper_bgcolor="#ffffff", hovermode="x unified",
+                      legend=dict(orientation="h", yanchor="bottom", y=-0.3))
+    return _target_band_patch(fig, target)
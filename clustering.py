@@ -0,0 +1,180 @@
+# clustering.py
+# -*- coding: utf-8 -*-
+"""Topic correlation and K-means clustering with cached models (no Streamlit import).
+
+Two modes:
+
+* topics — the topics × roles matrix of role means (small; full ``KMeans``);
+* respondents — each response's ``t{id}_adj`` vector, fitted with ``MiniBatchKMeans.partial_fit``
+  over snapshot batches so memory stays bounded by the batch size.
+
+Results are cached per (data version, roles, topic range, k); a K sweep scores several
+``k`` on a sample with the silhouette coefficient, fitting the candidates in parallel.
+sklearn is imported lazily on first use.
+"""
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import aggregates
+import scoring
+import snapshot
+import storage
+import timing
+from survey_config import get_survey
+
+CACHE_SIZE = 64
+BATCH_ROWS = 10_000
+SWEEP_SAMPLE = 5_000
+SEED = 42
+
+_CACHE:OrderedDict = OrderedDict()
+_LOCK = threading.Lock()
+
+
+def _cached(key, compute):
+    with _LOCK:
+        hit = _CACHE.get(key)
+        if hit is not None:
+            _CACHE.move_to_end(key); return hit
+    val = compute()
+    with _LOCK:
+        _CACHE[key] = val
+        while len(_CACHE)>CACHE_SIZE: _CACHE.popitem(last=False)
+    return val
+
+
+def _impute(X:np.ndarray, fill:np.ndarray)->np.ndarray:
+    X = np.asarray(X, dtype=float)
+    return np.where(np.isnan(X), fill, X)
+
+
+# ---------- topic mode (topics × roles matrix of means) ----------
+def topic_correlation(key, mat:pd.DataFrame)->pd.DataFrame:
+    """Topic × topic correlation across roles; ``key`` identifies (data version, roles, topic range)."""
+    return _cached(("corr", key), lambda: mat.T.corr())
+
+
+def _topic_features(mat:pd.DataFrame)->pd.DataFrame:
+    # roles without any answer carry no information (and would leave NaN after imputation)
+    mat = mat.loc[:, mat.notna().any()]
+    return mat.fillna(mat.mean())
+
+
+def topic_clusters(key, mat:pd.DataFrame, k:int)->pd.DataFrame:
+    """``KMeans`` labels per topic (rows of ``mat``); empty frame when there is nothing to cluster."""
+    def fit():
+        X = _topic_features(mat)
+        if X.shape[1]==0 or len(X)<2: return pd.DataFrame(columns=["موضوع", "خوشه"])
+        KMeans = timing.lazy_import("sklearn.cluster").KMeans
+        km = KMeans(n_clusters=min(k, len(X)), n_init=10, random_state=SEED).fit(X.to_numpy())
+        return pd.DataFrame({"موضوع":X.index, "خوشه":km.labels_}).sort_values("خوشه")
+    return _cached(("topics", key, k), fit)
+
+
+def topic_sweep(key, mat:pd.DataFrame, ks=range(2, 7), max_workers:int|None=None)->pd.DataFrame:
+    """Silhouette and inertia per ``k`` for the topic matrix."""
+    def run():
+        X = _topic_features(mat)
+        if X.shape[1]==0: return pd.DataFrame(columns=["k", "silhouette", "inertia"])
+        return k_sweep(X.to_numpy(), ks, max_workers, minibatch=False)
+    return _cached(("topic_sweep", key, tuple(ks)), run)
+
+
+# ---------- respondent mode (raw _adj vectors) ----------
+def _version(company:str):
+    return storage.data_version(company)
+
+
+def _fill_values(company:str, topic_ids, survey)->np.ndarray:
+    # overall topic means from the running totals impute unanswered topics without an extra pass
+    agg = aggregates.get(company, survey)
+    ti = {t:i for i,t in enumerate(agg["topics"])}
+    s = agg["sum"].sum(axis=0); c = agg["count"].sum(axis=0)
+    return np.array([s[ti[t]]/c[ti[t]] if t in ti and c[ti[t]] else 0.0 for t in topic_ids])
+
+
+def _batches(company:str, topic_ids, roles, batch_rows:int, survey=None):
+    survey = get_survey(survey)
+    cols = [f"t{t}_adj" for t in topic_ids]; fill = _fill_values(company, topic_ids, survey); roles = set(roles)
+    for df in snapshot.iter_batches(company, ["role"]+cols, batch_rows, survey=survey.key):
+        df = df[df["role"].astype(object).isin(roles).to_numpy()]
+        if len(df):
+            X = _impute(df[cols].to_numpy(dtype=float, na_value=np.nan), fill)
+            yield df["role"].astype(object).to_numpy(), scoring.normalize_adj(X, survey.max_adj)
+
+
+def respondent_clusters(company:str, topic_ids, roles, k:int, batch_rows:int=BATCH_ROWS, survey=None)->dict|None:
+    """Mini-batch K-means over respondents (normalized ``_adj`` vectors) of the selected roles.
+
+    Returns ``{"centers": DataFrame k × topics, "sizes": Series, "roles": DataFrame role × cluster, "inertia": float}``
+    or None when there are fewer respondents than ``k``.
+    """
+    topic_ids = tuple(topic_ids); roles = tuple(roles); survey = get_survey(survey)
+    def fit():
+        MiniBatchKMeans = timing.lazy_import("sklearn.cluster").MiniBatchKMeans
+        km = MiniBatchKMeans(n_clusters=k, batch_size=min(batch_rows, 4096), n_init=3, random_state=SEED)
+        pending = None; fitted = False
+        for _, X in _batches(company, topic_ids, roles, batch_rows, survey):
+            pending = X if pending is None else np.vstack([pending, X])
+            if len(pending)<k: continue   # the first partial_fit needs at least k samples
+            km.partial_fit(pending); pending = None; fitted = True
+        if not fitted: return None
+        if pending is not None and len(pending)>=k: km.partial_fit(pending)
+        labels, role_of = [], []; inertia = 0.0
+        for r, X in _batches(company, topic_ids, roles, batch_rows, survey):
+            lab = km.predict(X); labels.append(lab); role_of.append(r)
+            inertia += float(((X-km.cluster_centers_[lab])**2).sum())
+        labels = np.concatenate(labels); role_of = np.concatenate(role_of)
+        return {"centers": pd.DataFrame(km.cluster_centers_, columns=list(topic_ids)),
+                "sizes": pd.Series(np.bincount(labels, minlength=k), name="تعداد"),
+                "roles": pd.crosstab(pd.Series(role_of, name="نقش"), pd.Series(labels, name="خوشه")),
+                "inertia": inertia}
+    return _cached(("respondents", company, _version(company), survey.key, topic_ids, roles, k), fit)
+
+
+def respondent_sample(company:str, topic_ids, roles, n:int=SWEEP_SAMPLE, survey=None)->np.ndarray:
+    """Uniform sample of at most ``n`` respondent vectors (reservoir over snapshot batches)."""
+    rng = np.random.default_rng(SEED)
+    keep = np.empty((0, len(topic_ids))); keep_keys = np.empty(0)
+    for _, X in _batches(company, topic_ids, roles, BATCH_ROWS, survey):
+        # keep the n rows with the smallest random keys seen so far
+        pool = np.vstack([keep, X]); pool_keys = np.concatenate([keep_keys, rng.random(len(X))])
+        order = np.argsort(pool_keys)[:n]
+        keep, keep_keys = pool[order], pool_keys[order]
+    return keep
+
+
+def _score_k(X:np.ndarray, k:int, minibatch:bool)->dict:
+    cluster = timing.lazy_import("sklearn.cluster"); metrics = timing.lazy_import("sklearn.metrics")
+    model = cluster.MiniBatchKMeans(n_clusters=k, n_init=3, random_state=SEED) if minibatch else \
+        cluster.KMeans(n_clusters=k, n_init=10, random_state=SEED)
+    labels = model.fit_predict(X)
+    sil = float(metrics.silhouette_score(X, labels)) if 1<len(set(labels))<len(X) else np.nan
+    return {"k":k, "silhouette":sil, "inertia":float(model.inertia_)}
+
+
+def k_sweep(X:np.ndarray, ks=range(2, 9), max_workers:int|None=None, minibatch:bool=True)->pd.DataFrame:
+    """Fit each ``k`` in parallel (threads; sklearn releases the GIL in its kernels) and score it."""
+    ks = [k for k in ks if 2<=k<len(X)]
+    if not ks: return pd.DataFrame(columns=["k", "silhouette", "inertia"])
+    workers = max_workers or min(len(ks), os.cpu_count() or 2)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        rows = list(pool.map(lambda k: _score_k(X, k, minibatch), ks))
+    return pd.DataFrame(rows)
+
+
+def respondent_sweep(company:str, topic_ids, roles, ks=range(2, 9), sample:int=SWEEP_SAMPLE,
+                     max_workers:int|None=None, survey=None)->pd.DataFrame:
+    """Silhouette K sweep over a respondent sample, cached per data version."""
+    topic_ids = tuple(topic_ids); roles = tuple(roles); survey = get_survey(survey)
+    return _cached(("respondent_sweep", company, _version(company), survey.key, topic_ids, roles, tuple(ks), sample),
+                   lambda: k_sweep(respondent_sample(company, topic_ids, roles, sample, survey), ks, max_workers))
+
+
+def clear_cache():
+    with _LOCK: _CACHE.clear()
@@ -0,0 +1,170 @@
+# export.py
+# -*- coding: utf-8 -*-
+"""Lazy, chunked CSV/Excel exports of survey responses (no Streamlit import).
+
+Exports are produced only when requested, by streaming snapshot batches through the
+filters straight into a file under ``EXPORT_DIR``, so memory stays bounded by the batch
+size whatever the number of responses. A finished file is reused until one of the
+exported companies receives new data; files unused for ``MAX_AGE_S`` and, beyond
+``MAX_FILES``, the least recently used ones are removed (:func:`prune`). Streamlit's
+``download_button`` holds the whole file in server memory for the session, so very
+large exports are better fetched from ``EXPORT_DIR`` directly.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from pathlib import Path
+
+import pandas as pd
+
+import snapshot
+import storage
+import timing
+from survey_config import get_survey
+
+EXCEL_OK = timing.module_available("openpyxl")   # imported by _write_xlsx only (write-only mode streams rows to disk)
+
+EXPORT_DIR = Path("exports")
+BATCH_ROWS = 20_000
+EXCEL_MAX_ROWS = 1_048_575   # per sheet, excluding the header row
+MAX_FILES = 32               # exports kept on disk (least recently used removed first)
+MAX_AGE_S = 24*3600          # exports unused this long are removed
+MIN_AGE_S = 600              # a file used this recently is never removed (it may still be downloading)
+MIME = {"csv": "text/csv", "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"}
+
+_LOCKS:dict = {}
+_LOCKS_GUARD = threading.Lock()
+
+
+@dataclass(frozen=True)
+class ExportFilter:
+    """Which rows/columns to export. ``None`` means no restriction."""
+    roles: tuple|None = None
+    topic_ids: tuple|None = None
+    date_from: date|None = None
+    date_to: date|None = None          # inclusive
+    fmt: str = "csv"
+    companies: tuple = field(default_factory=tuple)
+    survey: str|None = None            # survey key; None exports every questionnaire version
+
+    def key(self)->str:
+        raw = json.dumps([self.roles, self.topic_ids, str(self.date_from), str(self.date_to), self.fmt, self.companies,
+                          self.survey],
+                         ensure_ascii=False, default=str)
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def _columns(company:str, topic_ids)->list[str]:
+    cols = storage.response_columns(company)
+    if topic_ids is None: return cols
+    keep = {f"t{t}_{k}" for t in topic_ids for k in ("maturity", "rel", "adj")}
+    return [c for c in cols if c in storage.META_COLS or c in keep]
+
+
+def _apply(df:pd.DataFrame, flt:ExportFilter)->pd.DataFrame:
+    mask = pd.Series(True, index=df.index)
+    if flt.roles is not None:
+        mask &= df["role"].astype(object).isin(flt.roles)
+    if flt.date_from is not None or flt.date_to is not None:
+        ts = df["timestamp"].astype("string")   # ISO-8601 text sorts chronologically
+        if flt.date_from is not None: mask &= ts>=flt.date_from.isoformat()
+        if flt.date_to is not None: mask &= ts<(flt.date_to+timedelta(days=1)).isoformat()
+        mask = mask.fillna(False)
+    return df[mask.to_numpy(dtype=bool)]
+
+
+def iter_rows(flt:ExportFilter, batch_rows:int=BATCH_ROWS):
+    """Yield ``(columns, DataFrame)`` batches for every company in the filter, filters applied."""
+    union = []
+    for c in flt.companies:
+        for col in _columns(c, flt.topic_ids):
+            if col not in union: union.append(col)
+    for c in flt.companies:
+        for batch in snapshot.iter_batches(c, _columns(c, flt.topic_ids), batch_rows, survey=flt.survey):
+            out = _apply(batch, flt)
+            if len(out): yield union, out.reindex(columns=union)
+
+
+def _versions(companies)->dict:
+    return {c: list(storage.data_version(c)) for c in companies}
+
+
+def _write_csv(path:Path, flt:ExportFilter)->int:
+    n = 0; header = True
+    with open(path, "w", encoding="utf-8-sig", newline="") as fh:
+        for cols, df in iter_rows(flt):
+            df.to_csv(fh, index=False, header=header); header = False; n += len(df)
+        if header:   # no matching rows: still write the header
+            cols = [] if not flt.companies else _columns(flt.companies[0], flt.topic_ids)
+            fh.write(",".join(cols)+"\n")
+    return n
+
+
+def _write_xlsx(path:Path, flt:ExportFilter)->int:
+    from openpyxl import Workbook
+    wb = Workbook(write_only=True); ws = None; in_sheet = 0; n = 0; cols = None
+    for cols, df in iter_rows(flt):
+        for row in df.astype(object).where(df.notna(), None).itertuples(index=False, name=None):
+            if ws is None or in_sheet>=EXCEL_MAX_ROWS:
+                ws = wb.create_sheet(f"responses_{len(wb.worksheets)+1}"); ws.append(cols); in_sheet = 0
+            ws.append(row); in_sheet += 1; n += 1
+    if ws is None:
+        ws = wb.create_sheet("responses_1")
+        ws.append(cols or ([] if not flt.companies else _columns(flt.companies[0], flt.topic_ids)))
+    wb.save(path)
+    return n
+
+
+def export(flt:ExportFilter)->tuple[Path, int]:
+    """Write (or reuse) the export described by ``flt``. Returns ``(path, rows)``."""
+    if flt.fmt=="xlsx" and not EXCEL_OK:
+        raise RuntimeError("openpyxl is required for Excel exports")
+    EXPORT_DIR.mkdir(parents=True, exist_ok=True)
+    key = flt.key(); path = EXPORT_DIR/f"{key}.{flt.fmt}"; meta = EXPORT_DIR/f"{key}.json"
+    with _LOCKS_GUARD:
+        lock = _LOCKS.setdefault(key, threading.Lock())
+    with lock:
+        versions = _versions(flt.companies)
+        if path.exists() and meta.exists():
+            info = json.loads(meta.read_text(encoding="utf-8"))
+            if info.get("versions")==versions:
+                os.utime(meta); return path, info["rows"]   # last use, for prune()
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        rows = (_write_xlsx if flt.fmt=="xlsx" else _write_csv)(tmp, flt)
+        tmp.replace(path)
+        meta.write_text(json.dumps({"versions": versions, "rows": rows}), encoding="utf-8")
+    prune(keep=key)
+    return path, rows
+
+
+def prune(keep:str|None=None)->int:
+    """Remove old exports (data file, meta and stray temp files of a key together). Returns keys removed."""
+    if not EXPORT_DIR.is_dir(): return 0
+    now = time.time(); used:dict = {}
+    for p in EXPORT_DIR.iterdir():
+        key = p.name.split(".", 1)[0]
+        if key==keep: continue
+        try: used[key] = max(used.get(key, 0.0), p.stat().st_mtime)
+        except FileNotFoundError: continue   # removed concurrently
+    ranked = sorted(used, key=used.get, reverse=True)
+    room = MAX_FILES-(keep is not None)
+    drop = [k for i,k in enumerate(ranked) if now-used[k]>MIN_AGE_S and (i>=room or now-used[k]>MAX_AGE_S)]
+    for k in drop:
+        for p in EXPORT_DIR.glob(f"{k}.*"): p.unlink(missing_ok=True)
+    return len(drop)
+
+
+def filtered(flt:ExportFilter)->bool:
+    """True when roles, dates or a strict subset of the survey's topics narrow the export."""
+    if flt.roles is not None or flt.date_from is not None or flt.date_to is not None: return True
+    return flt.topic_ids is not None and not set(get_survey(flt.survey).topic_ids)<=set(flt.topic_ids)
+
+
+def file_name(flt:ExportFilter)->str:
+    scope = flt.companies[0] if len(flt.companies)==1 else "all_companies"
+    suffix = "_filtered" if filtered(flt) else ""
+    return f"{scope}_responses{suffix}.{flt.fmt}"
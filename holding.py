@@ -0,0 +1,73 @@
+# holding.py
+# -*- coding: utf-8 -*-
+"""Holding-wide rollup: score every company folder in parallel, cached per company data version."""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import aggregates
+import scoring
+import storage
+from survey_config import get_survey
+
+_CACHE:dict = {}
+_LOCK = threading.Lock()
+
+
+def score_company(company:str, topic_ids, target:float, weighted:bool=False, survey=None)->dict:
+    """Org series + KPIs for one company and survey version; recomputed only when its data version changes.
+
+    ``weighted`` scales the fuzzy role weights by each role's answer count (:func:`scoring.count_weighted`).
+    The cached scores do not depend on ``target``; only ``pass_rate`` is applied per call. ``version``
+    (data version) and ``weighted`` identify the plotted series, e.g. for figure cache keys.
+    """
+    topic_ids = tuple(topic_ids); survey = get_survey(survey); roles = list(survey.roles)
+    version = storage.data_version(company); key = (version, topic_ids, weighted)
+    with _LOCK:
+        hit = _CACHE.get((company, survey.key))
+    if hit is None or hit["key"]!=key:
+        agg = aggregates.get(company, survey)
+        means = scoring.role_means_from_aggregates(agg, topic_ids, roles)
+        W = scoring.weight_matrix(topic_ids, roles, survey)
+        if weighted: W = scoring.count_weighted(W, aggregates.role_topic_counts(agg, roles, list(topic_ids)))
+        hit = scoring.summarize(means, W, target)
+        hit.update(key=key, version=version, weighted=weighted, survey=survey.key, company=company, n=agg["total"],
+                   role_means=means)
+        with _LOCK:
+            _CACHE[(company, survey.key)] = hit
+    return {**hit, "pass_rate": scoring.pass_rate(hit["org_series"], target)}
+
+
+def score_all(topic_ids, target:float, companies=None, max_workers:int|None=None, weighted:bool=False,
+              survey=None)->list[dict]:
+    """Score all companies (default: every folder under ``storage.DATA_DIR``) on a thread pool.
+
+    Companies without responses to ``survey`` are left out.
+    """
+    companies = storage.list_companies() if companies is None else list(companies)
+    if not companies: return []
+    workers = max_workers or min(16, (os.cpu_count() or 4)*2, len(companies))
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        results = list(ex.map(lambda c: score_company(c, topic_ids, target, weighted, survey), companies))
+    return [r for r in results if r["n"]>0]
+
+
+def ranking_table(results:list[dict], topic_labels:list[str])->pd.DataFrame:
+    """One row per company, ranked by fuzzy org average."""
+    def lab(i): return topic_labels[i] if i is not None else "-"
+    df = pd.DataFrame([{"شرکت":r["company"], "تعداد پاسخ":r["n"],
+                        "میانگین سازمان (فازی)":round(r["org_avg"], 1), "نرخ عبور از هدف (%)":round(r["pass_rate"], 0),
+                        "بهترین موضوع":lab(r["best_idx"]), "ضعیف‌ترین موضوع":lab(r["worst_idx"])} for r in results])
+    if df.empty: return df
+    df = df.sort_values("میانگین سازمان (فازی)", ascending=False, kind="stable").reset_index(drop=True)
+    df.insert(0, "رتبه", np.arange(1, len(df)+1))
+    return df
+
+
+def topic_matrix(results:list[dict], topic_labels:list[str])->pd.DataFrame:
+    """Company × topic matrix of fuzzy org scores (0..100)."""
+    return pd.DataFrame(np.vstack([r["org_series"] for r in results]) if results else np.empty((0, len(topic_labels))),
+                        index=[r["company"] for r in results], columns=topic_labels)
@@ -0,0 +1,178 @@
+# report.py
+# -*- coding: utf-8 -*-
+"""Headless batch reports: per-company and holding-level HTML pages plus PNG/PDF figures.
+
+Reuses the dashboard scoring (:mod:`holding`) and figure builders (:mod:`charts`) without
+Streamlit. Companies are rendered in a process pool (static image export with kaleido is
+CPU-bound), and ``<out>/manifest.json`` records the data version and options each report
+was built from, so a rerun only rebuilds companies whose data changed.
+
+    python report.py                          # html for every company + holding
+    python report.py --formats html png pdf --target 50 --workers 4
+    python report.py --companies A B --force
+    python report.py --survey asset_management@1
+"""
+import argparse
+import hashlib
+import html
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+import aggregates
+import holding
+import storage
+import timing
+from survey_config import get_survey, survey_key
+
+REPORT_DIR = Path("reports")
+MANIFEST = "manifest.json"
+FORMATS = ("html", "png", "pdf")
+HOLDING = "_holding"
+KALEIDO_OK = timing.module_available("kaleido")
+IMAGE_SCALE = 2
+OVERLAY_MAX = 5
+OUTPUT_RE = re.compile(r"index\.html|\d{2}\.(?:png|pdf)")   # files _write owns in a report folder
+
+
+def _version(company:str)->list:
+    return list(storage.data_version(company))
+
+
+def _options_key(topic_ids, target:float, formats, survey:str)->str:
+    raw = json.dumps([list(topic_ids), target, sorted(formats), survey])
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:12]
+
+
+def _page(title:str, body:list[str])->str:
+    return ("<!DOCTYPE html><html lang='fa' dir='rtl'><head><meta charset='utf-8'>"
+            f"<title>{html.escape(title)}</title><script src='../plotly.min.js'></script>"
+            "<style>body{font-family:Vazir,Tahoma,sans-serif;max-width:1200px;margin:24px auto;color:#1f2937}"
+            "table{border-collapse:collapse}td,th{border:1px solid #e5e7eb;padding:4px 10px}"
+            "h2{margin-top:32px}</style></head><body>"
+            f"<h1>{html.escape(title)}</h1><p>{time.strftime('%Y-%m-%d %H:%M')}</p>"+"".join(body)+"</body></html>")
+
+
+def _write(out:Path, name:str, figs:dict, formats, summary_html:str)->list[str]:
+    """Write ``figs`` as one HTML page and/or one image per figure; returns written file names.
+
+    Outputs of an earlier run that this one no longer writes (a dropped format) are removed.
+    """
+    out.mkdir(parents=True, exist_ok=True); written = []
+    if "html" in formats:
+        body = [summary_html]+[f"<h2>{html.escape(t)}</h2>"+f.to_html(full_html=False, include_plotlyjs=False)
+                               for t,f in figs.items()]
+        (out/"index.html").write_text(_page(name, body), encoding="utf-8"); written.append("index.html")
+    for fmt in ("png", "pdf"):
+        if fmt not in formats: continue
+        if not KALEIDO_OK: raise RuntimeError("kaleido is required for png/pdf reports")
+        for i, f in enumerate(figs.values(), 1):
+            fn = f"{i:02d}.{fmt}"; f.write_image(out/fn, format=fmt, scale=IMAGE_SCALE if fmt=="png" else 1)
+            written.append(fn)
+    for p in out.iterdir():
+        if OUTPUT_RE.fullmatch(p.name) and p.name not in written: p.unlink(missing_ok=True)
+    return written
+
+
+def _kpi_table(rows:dict)->str:
+    return "<table>"+"".join(f"<tr><th>{html.escape(k)}</th><td>{html.escape(str(v))}</td></tr>" for k,v in rows.items())+"</table>"
+
+
+def render_company(company:str, target:float, formats, out_dir:str, survey:str|None=None)->dict:
+    """Build and write one company's report (runs in a worker process; the survey is compiled there once)."""
+    import charts
+    survey = get_survey(survey); topics = survey.topics; topic_ids = list(survey.topic_ids)
+    ticks = [f"{i+1:02d} — {t['name']}" for i,t in enumerate(topics)]
+    res = holding.score_company(company, topic_ids, target, survey=survey)
+    role_means = {r: res["role_means"][i].tolist() for i,r in enumerate(survey.roles) if not np.isnan(res["role_means"][i]).all()}
+    figs = {"رادار میانگین سازمان (وزن‌دهی فازی)":
+                charts.build_radar({"میانگین سازمان": res["org_series"].tolist()}, "میانگین سازمان", ticks, target, show_legend=False, colors=survey.role_colors),
+            "رادار مقایسه‌ای نقش‌ها": charts.build_radar(role_means, "رادار مقایسه‌ای", ticks, target, colors=survey.role_colors),
+            "نمودار میله‌ای (نقش‌ها)": charts.build_bars_multirole(role_means, [t["name"] for t in topics], "مقایسه رده‌ها", target, colors=survey.role_colors),
+            "نمودار خطی مقایسه‌ای": charts.build_lines_multirole(role_means, "Line Chart — مقایسه رده‌ها", target, colors=survey.role_colors)}
+    lab = lambda i: ticks[i] if i is not None else "-"
+    summary = _kpi_table({"تعداد پاسخ": res["n"], "میانگین سازمان (فازی)": f"{res['org_avg']:.1f}",
+                          "نرخ عبور از هدف": f"{res['pass_rate']:.0f}%", "بهترین موضوع": lab(res["best_idx"]),
+                          "ضعیف‌ترین موضوع": lab(res["worst_idx"])})
+    files = _write(Path(out_dir)/company, company, figs, formats, summary)
+    return {"company": company, "files": files}
+
+
+def render_holding(target:float, formats, out_dir:str, companies:list, survey:str|None=None)->dict:
+    import charts
+    survey = get_survey(survey); topic_ids = list(survey.topic_ids)
+    labels = [f"{i+1:02d} — {t['name']}" for i,t in enumerate(survey.topics)]
+    results = holding.score_all(topic_ids, target, companies, survey=survey)
+    rank = holding.ranking_table(results, labels)
+    if rank.empty: return {"company": HOLDING, "files": []}
+    by_name = {r["company"]: r for r in results}
+    mat = holding.topic_matrix(results, labels).reindex(rank["شرکت"])
+    figs = {"Heatmap شرکت × موضوع": charts.build_company_heatmap(mat),
+            "رادار مقایسه‌ای شرکت‌ها (میانگین سازمان)":
+                charts.build_radar({c: by_name[c]["org_series"].tolist() for c in rank["شرکت"].head(OVERLAY_MAX)},
+                                   "رادار شرکت‌ها", labels, target)}
+    summary = "<h2>رتبه‌بندی شرکت‌ها</h2>"+rank.to_html(index=False, border=0)
+    files = _write(Path(out_dir)/HOLDING, "هلدینگ", figs, formats, summary)
+    return {"company": HOLDING, "files": files}
+
+
+def _plotly_js(out:Path)->None:
+    # one shared copy of plotly.js for all pages (each page lives one folder below ``out``)
+    if (out/"plotly.min.js").exists(): return
+    from plotly.offline import get_plotlyjs
+    (out/"plotly.min.js").write_text(get_plotlyjs(), encoding="utf-8")
+
+
+def run(companies=None, formats=("html",), target:float=45, out_dir=REPORT_DIR, workers:int|None=None,
+        force:bool=False, survey:str|None=None)->dict:
+    """Rebuild reports (of one survey version) for companies whose data or the report options changed."""
+    survey = survey_key(survey); topic_ids = list(get_survey(survey).topic_ids)
+    out = Path(out_dir); out.mkdir(parents=True, exist_ok=True)
+    manifest_path = out/MANIFEST
+    manifest = json.loads(manifest_path.read_text(encoding="utf-8")) if manifest_path.exists() and not force else {}
+    companies = storage.list_companies() if companies is None else list(companies)
+    opts = _options_key(topic_ids, target, formats, survey)
+    versions = {c: _version(c) for c in companies}
+    todo = [c for c in companies if manifest.get(c)!={"version": versions[c], "options": opts}
+            and aggregates.get(c, survey)["total"]>0]
+    t0 = time.perf_counter()
+    if todo:
+        with ProcessPoolExecutor(max_workers=workers or min(len(todo), os.cpu_count() or 2)) as pool:
+            futures = {c: pool.submit(render_company, c, target, formats, str(out), survey) for c in todo}
+            for c, fut in futures.items():
+                fut.result(); manifest[c] = {"version": versions[c], "options": opts}
+    hold_state = {"version": [versions[c] for c in companies], "options": opts}
+    rebuilt_holding = manifest.get(HOLDING)!=hold_state
+    if rebuilt_holding:
+        render_holding(target, formats, str(out), companies, survey); manifest[HOLDING] = hold_state
+    if "html" in formats: _plotly_js(out)
+    manifest_path.write_text(json.dumps(manifest, ensure_ascii=False, indent=1), encoding="utf-8")
+    return {"rebuilt": todo, "skipped": [c for c in companies if c not in todo], "holding": rebuilt_holding,
+            "seconds": round(time.perf_counter()-t0, 2), "out": str(out)}
+
+
+def main(argv=None)->int:
+    ap = argparse.ArgumentParser(description="Render static survey reports for every company and the holding.")
+    ap.add_argument("--companies", nargs="*", help="default: every company folder")
+    ap.add_argument("--formats", nargs="+", choices=FORMATS, default=["html"])
+    ap.add_argument("--target", type=int, default=45, help="0..100, as the dashboard slider")
+    ap.add_argument("--out", default=str(REPORT_DIR))
+    ap.add_argument("--workers", type=int)
+    ap.add_argument("--force", action="store_true", help="ignore the manifest and rebuild everything")
+    ap.add_argument("--survey", help="survey key, e.g. asset_management@1 (default survey when omitted)")
+    a = ap.parse_args(argv)
+    if {"png", "pdf"} & set(a.formats) and not KALEIDO_OK:
+        print("kaleido is not installed: use --formats html or `pip install kaleido`", file=sys.stderr); return 2
+    summary = run(a.companies, tuple(a.formats), a.target, a.out, a.workers, a.force, a.survey)
+    print(json.dumps(summary, ensure_ascii=False, indent=1))
+    return 0
+
+
+if __name__=="__main__":
+    sys.exit(main())
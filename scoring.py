@@ -0,0 +1,91 @@
+# scoring.py
+# -*- coding: utf-8 -*-
+"""Vectorized scoring: normalization, role means, fuzzy-weighted org scores and KPIs.
+
+Importable without Streamlit so batch jobs can reuse it. Role means are arrays shaped
+roles × topics (0..100, NaN where a role has no answer for a topic); the fuzzy weights
+are a topics × roles matrix taken from the compiled survey (:func:`survey_config.get_survey`).
+"""
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from survey_config import ROLES, get_survey
+
+MAX_ADJ = 40.0   # maturity 4 × relevance 10 (default survey; see ``Survey.max_adj``)
+
+
+def normalize_adj(x, max_adj:float=MAX_ADJ)->np.ndarray:
+    """Raw ``_adj`` (0..max_adj) to 0..100; NaN stays NaN."""
+    return np.asarray(x, dtype=float)/max_adj*100.0
+
+
+@lru_cache(maxsize=256)
+def _weight_matrix(survey, topic_ids:tuple, roles:tuple)->np.ndarray:
+    W = survey.weight_matrix(topic_ids, roles)
+    W.setflags(write=False)
+    return W
+
+
+def weight_matrix(topic_ids, roles=ROLES, survey=None)->np.ndarray:
+    """Fuzzy weights as a read-only topics × roles matrix (0 where a role has no weight)."""
+    return _weight_matrix(get_survey(survey), tuple(int(t) for t in topic_ids), tuple(roles))
+
+
+def count_weighted(W:np.ndarray, counts:np.ndarray)->np.ndarray:
+    """Fuzzy weights scaled by each role's answer count per topic (``counts`` roles × topics), so thin roles weigh less."""
+    return np.asarray(W, dtype=float)*np.asarray(counts, dtype=float).T
+
+
+def role_means_from_df(df:pd.DataFrame, topic_ids, roles=ROLES, survey=None)->np.ndarray:
+    """Per-role means of the normalized ``_adj`` columns with a single groupby."""
+    cols = [f"t{t}_adj" for t in topic_ids]
+    vals = df.reindex(columns=cols).apply(pd.to_numeric, errors="coerce")
+    means = vals.groupby(df["role"]).mean().reindex(index=list(roles))
+    return normalize_adj(means.to_numpy(dtype=float, na_value=np.nan), get_survey(survey).max_adj)
+
+
+def role_means_from_aggregates(agg:dict, topic_ids, roles=ROLES)->np.ndarray:
+    """Per-role means (0..100) from :func:`aggregates.get` totals, without touching raw rows."""
+    import aggregates
+    return normalize_adj(aggregates.role_topic_means(agg, list(roles), list(topic_ids)), get_survey(agg.get("survey")).max_adj)
+
+
+def org_scores(role_means:np.ndarray, W:np.ndarray)->np.ndarray:
+    """Fuzzy-weighted org score per topic; roles with no data drop out of numerator and denominator."""
+    M = np.asarray(role_means, dtype=float).T            # topics × roles
+    valid = ~np.isnan(M)
+    num = np.where(valid, W*np.where(valid, M, 0.0), 0.0).sum(axis=1)
+    den = np.where(valid, W, 0.0).sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(den==0, np.nan, num/np.where(den==0, 1.0, den))
+
+
+def simple_means(role_means:np.ndarray)->np.ndarray:
+    """Unweighted mean over roles per topic (NaN when no role answered)."""
+    m = np.ma.masked_invalid(np.asarray(role_means, dtype=float))
+    return m.mean(axis=0).filled(np.nan)
+
+
+def pass_rate(org:np.ndarray, target:float)->float:
+    """Share (%) of topics whose org score reaches ``target`` (topics without data are left out)."""
+    org = np.asarray(org, dtype=float); valid = ~np.isnan(org)
+    return float((org[valid]>=target).mean()*100) if valid.any() else 0
+
+
+def summarize(role_means:np.ndarray, W:np.ndarray, target:float)->dict:
+    """Org series and KPIs (org_avg, pass_rate, best/worst topic index) for one company."""
+    org = org_scores(role_means, W)
+    valid = ~np.isnan(org)
+    simple = simple_means(role_means)
+    ms = np.ma.masked_invalid(simple)
+    has_simple = ms.count()>0
+    return {
+        "org_series": org,
+        "org_avg": float(np.nanmean(org)) if valid.any() else 0.0,
+        "pass_rate": pass_rate(org, target),
+        "simple_means": simple,
+        "best_idx": int(ms.argmax()) if has_simple else None,
+        "worst_idx": int(ms.argmin()) if has_simple else None,
+    }
@@ -0,0 +1,245 @@
+# snapshot.py
+# -*- coding: utf-8 -*-
+"""Columnar (Parquet) snapshot of a company's responses with compact, typed columns.
+
+``data/<company>/snapshot/`` holds Parquet parts covering consecutive row-id ranges of
+the response store; new rows become a new small part and parts are compacted into one
+file once there are more than ``MAX_PARTS``. Maturity/relevance are stored as int8, the
+adjusted product as int16 and role/company/survey as dictionary (categorical) columns, so
+readers can pull just the columns they need, e.g. ``read(company, ["role", *adj_cols])``,
+optionally only the rows of one survey version (``survey=``).
+
+Without pyarrow, readers fall back to the SQLite store with the same compact dtypes.
+"""
+import re
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import storage
+from survey_config import DEFAULT_SURVEY
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_OK = True
+except Exception:
+    PYARROW_OK = False
+
+SNAPSHOT_DIR = "snapshot"
+MAX_PARTS = 8
+RETIRE_SECONDS = 300   # grace period before compacted-away part files are deleted
+PART_ROWS = 100_000
+
+_INT8 = re.compile(r"^t\d+_(maturity|rel)$")
+_INT16 = re.compile(r"^t\d+_adj$")
+CATEGORICAL = ("role", "company", "survey")
+
+
+def snapshot_dir(company:str):
+    return storage.company_dir(company)/SNAPSHOT_DIR
+
+
+def arrow_type(col:str):
+    if _INT8.match(col): return pa.int8()
+    if _INT16.match(col): return pa.int16()
+    if col in CATEGORICAL: return pa.dictionary(pa.int32(), pa.string())
+    return pa.string()
+
+
+def compact_dtypes(df:pd.DataFrame)->pd.DataFrame:
+    """Apply the snapshot dtypes in pandas (int8/int16 where complete, float where NaN, categoricals)."""
+    out = {}
+    for c in df.columns:
+        s = df[c]
+        if _INT8.match(c) or _INT16.match(c):
+            s = pd.to_numeric(s, errors="coerce")
+            out[c] = s.astype(np.int8 if _INT8.match(c) else np.int16) if s.notna().all() else s.astype(np.float32)
+        elif c in CATEGORICAL:
+            out[c] = s.astype("category")
+        else:
+            out[c] = s
+    return pd.DataFrame(out, index=df.index)
+
+
+# ---------- writing ----------
+def _ensure_tables(conn)->None:
+    conn.execute("CREATE TABLE IF NOT EXISTS snapshot_parts (name TEXT PRIMARY KEY, first_id INTEGER, last_id INTEGER)")
+    conn.execute("CREATE TABLE IF NOT EXISTS snapshot_retired (name TEXT PRIMARY KEY, retired_at REAL)")
+
+
+def _parts(conn)->list[tuple]:
+    return conn.execute("SELECT name, first_id, last_id FROM snapshot_parts ORDER BY first_id").fetchall()
+
+
+def _arrow_col(s:pd.Series, typ):
+    if pa.types.is_integer(typ):
+        return pa.array(pd.to_numeric(s, errors="coerce"), type=typ, from_pandas=True)
+    return pa.array(s.astype("string"), type=typ, from_pandas=True)
+
+
+def _to_table(df:pd.DataFrame):
+    cols = [c for c in df.columns if c!="id"]
+    schema = pa.schema([(c, arrow_type(c)) for c in cols])
+    return pa.Table.from_arrays([_arrow_col(df[c], schema.field(c).type) for c in cols], schema=schema)
+
+
+def _part_name(first_id:int, last_id:int)->str:
+    return f"part-{first_id:012d}-{last_id:012d}.parquet"
+
+
+def _write_tmp(folder, table):
+    # unique temp name: concurrent writers (e.g. two compactions) never share a temp file
+    with tempfile.NamedTemporaryFile(dir=folder, prefix=".part-", suffix=".tmp", delete=False) as fh:
+        tmp = Path(fh.name)
+    try: pq.write_table(table, tmp, compression="zstd")
+    except BaseException:
+        tmp.unlink(missing_ok=True); raise
+    return tmp
+
+
+def _write_part(folder, table, first_id:int, last_id:int)->str:
+    name = _part_name(first_id, last_id)
+    _write_tmp(folder, table).replace(folder/name)
+    return name
+
+
+def refresh(company:str)->bool:
+    """Write rows appended since the last refresh as new part(s); compact when needed. Returns True if changed."""
+    if not PYARROW_OK: return False
+    folder = snapshot_dir(company); folder.mkdir(parents=True, exist_ok=True)
+    conn = storage.connect(company); changed = False
+    try:
+        _ensure_tables(conn)
+        last = conn.execute("SELECT COALESCE(MAX(id),0) FROM responses").fetchone()[0]
+        done = conn.execute("SELECT COALESCE(MAX(last_id),0) FROM snapshot_parts").fetchone()[0]
+        if done==last: return False
+        conn.execute("BEGIN IMMEDIATE")   # one snapshot writer at a time per company
+        try:
+            # re-read under the lock: rows and parts may have been added since the check above
+            last = conn.execute("SELECT COALESCE(MAX(id),0) FROM responses").fetchone()[0]
+            parts = _parts(conn); done = parts[-1][2] if parts else 0
+            if done>last or not parts:   # store rebuilt (or first snapshot): start from scratch
+                conn.execute("DELETE FROM snapshot_parts"); done = 0
+                for f in folder.glob("part-*.parquet"): f.unlink(missing_ok=True)
+            cols = storage.columns(conn)
+            sql = f"SELECT id, {', '.join(map(storage._quote, cols))} FROM responses WHERE id > ? ORDER BY id"
+            for chunk in pd.read_sql_query(sql, conn, params=(done,), chunksize=PART_ROWS):
+                if chunk.empty: continue
+                first, end = int(chunk["id"].iloc[0]), int(chunk["id"].iloc[-1])
+                name = _write_part(folder, _to_table(chunk), first, end)
+                conn.execute("INSERT OR REPLACE INTO snapshot_parts VALUES(?,?,?)", (name, first, end)); changed = True
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK"); raise
+        if len(_parts(conn))>MAX_PARTS: compact(company, conn)
+    finally:
+        conn.close()
+    return changed
+
+
+def compact(company:str, conn=None)->bool:
+    """Merge all current parts into a single file (outside the write lock; only the swap is locked).
+
+    The swap happens only if the part list is still the one that was merged; otherwise (a
+    concurrent compaction or rebuild won) the merged file is discarded. Returns True if swapped.
+    """
+    own = conn is None
+    if own: conn = storage.connect(company); _ensure_tables(conn)
+    tmp = None
+    try:
+        parts = _parts(conn)
+        if len(parts)<=1: return False
+        folder = snapshot_dir(company)
+        try: table = pa.concat_tables([pq.read_table(folder/n) for n,_,_ in parts], promote_options="default")
+        except FileNotFoundError: return False   # parts replaced by a concurrent compaction/rebuild
+        tmp = _write_tmp(folder, table.unify_dictionaries().combine_chunks())
+        name = _part_name(parts[0][1], parts[-1][2])
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if _parts(conn)!=parts:
+                conn.execute("ROLLBACK"); return False
+            tmp.replace(folder/name); tmp = None
+            conn.executemany("DELETE FROM snapshot_parts WHERE name=?", [(n,) for n,_,_ in parts if n!=name])
+            conn.execute("INSERT OR REPLACE INTO snapshot_parts VALUES(?,?,?)", (name, parts[0][1], parts[-1][2]))
+            # replaced parts stay on disk for RETIRE_SECONDS so readers that listed them can finish
+            now = time.time()
+            conn.executemany("INSERT OR REPLACE INTO snapshot_retired VALUES(?,?)", [(n, now) for n,_,_ in parts if n!=name])
+            expired = [r[0] for r in conn.execute("SELECT name FROM snapshot_retired WHERE retired_at<?", (now-RETIRE_SECONDS,))]
+            conn.executemany("DELETE FROM snapshot_retired WHERE name=?", [(n,) for n in expired])
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK"); raise
+        for n in expired: (folder/n).unlink(missing_ok=True)
+        return True
+    finally:
+        if tmp is not None: tmp.unlink(missing_ok=True)
+        if own: conn.close()
+
+
+# ---------- reading ----------
+def part_files(company:str)->list:
+    conn = storage.connect(company)
+    try:
+        _ensure_tables(conn)
+        return [snapshot_dir(company)/n for n,_,_ in _parts(conn)]
+    finally:
+        conn.close()
+
+
+def read_table(company:str, columns:list[str]|None=None):
+    """Arrow table of the up-to-date snapshot, limited to ``columns`` that exist."""
+    refresh(company)
+    for attempt in range(3):   # a concurrent compaction may swap files between listing and reading
+        try:
+            tables = []
+            for f in part_files(company):
+                have = pq.read_schema(f).names
+                tables.append(pq.read_table(f, columns=[c for c in (columns or have) if c in have]))
+            break
+        except FileNotFoundError:
+            if attempt==2: raise
+    if not tables: return None
+    return pa.concat_tables(tables, promote_options="default")
+
+
+def _of_survey(df:pd.DataFrame, survey:str|None, columns:list[str])->pd.DataFrame:
+    # ``survey`` column is read only for the filter; untagged (legacy) rows belong to the default survey
+    if survey is None: return df
+    tag = df["survey"].astype(object) if "survey" in df else pd.Series(None, index=df.index, dtype=object)
+    df = df[tag.fillna(DEFAULT_SURVEY).replace("", DEFAULT_SURVEY).to_numpy()==survey]
+    return df if "survey" in columns else df.drop(columns="survey", errors="ignore")
+
+
+def read(company:str, columns:list[str]|None=None, survey:str|None=None)->pd.DataFrame:
+    """Responses as a DataFrame with compact dtypes, loading only ``columns`` (all when None).
+
+    With ``survey`` (a survey key) only that questionnaire version's rows are returned.
+    """
+    cols = columns if columns is None or survey is None or "survey" in columns else columns+["survey"]
+    if not PYARROW_OK:
+        return _of_survey(compact_dtypes(storage.read_responses(company, cols)), survey, columns or ["survey"])
+    table = read_table(company, cols)
+    df = table.to_pandas() if table is not None else pd.DataFrame(columns=cols or [])
+    if cols is not None:
+        for c in cols:
+            if c not in df.columns: df[c] = np.nan
+        df = df[cols]
+    return _of_survey(df, survey, columns or ["survey"])
+
+
+def iter_batches(company:str, columns:list[str]|None=None, batch_size:int=50_000, survey:str|None=None):
+    """Yield the snapshot as DataFrames of at most ``batch_size`` rows (bounded memory), optionally of one survey."""
+    columns = columns or storage.response_columns(company)
+    cols = columns if survey is None or "survey" in columns else columns+["survey"]
+    if not PYARROW_OK:
+        for chunk in storage.iter_responses(company, cols, batch_size): yield _of_survey(compact_dtypes(chunk), survey, columns)
+        return
+    refresh(company)
+    for f in part_files(company):
+        pf = pq.ParquetFile(f); have = set(pf.schema_arrow.names)
+        for batch in pf.iter_batches(batch_size=batch_size, columns=[c for c in cols if c in have]):
+            yield _of_survey(batch.to_pandas().reindex(columns=cols), survey, columns)
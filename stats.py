@@ -0,0 +1,134 @@
+# stats.py
+# -*- coding: utf-8 -*-
+"""Bootstrap confidence intervals for role means, org scores and KPIs (no Streamlit import).
+
+Respondents are resampled within each role with Poisson(1) weights (the streaming form of
+the bootstrap: every row gets an independent weight, so a block of ``b`` resamples is just
+two matrix products ``weights @ values`` and ``weights @ answered``). Blocks of resamples run
+on a thread pool (numpy releases the GIL in the products) with independent seeds, and the
+resampled role × topic means are cached per company data version; KPIs for a given target
+or weighting are cheap reductions of those samples. Responses are streamed from the
+snapshot in batches and each role keeps at most ``MAX_N`` rows (a uniform random sample),
+so memory stays bounded on large stores; intervals of capped roles are slightly conservative.
+"""
+import os
+import threading
+import warnings
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import scoring
+import snapshot
+import storage
+from survey_config import get_survey
+
+N_BOOT = 500
+BLOCK = 50
+SEED = 12345
+LEVEL = 0.95
+MIN_N = 5           # respondents per role below which results are flagged as low-sample
+MAX_N = 2_000       # respondents per role kept for resampling
+CACHE_SIZE = 32
+
+_CACHE:OrderedDict = OrderedDict()
+_LOCK = threading.Lock()
+
+
+def _role_matrices(company:str, topic_ids, roles, survey)->tuple[list[np.ndarray], np.ndarray]:
+    """Per role: respondents × topics matrix of normalized ``_adj`` (NaN where unanswered), plus respondents per role.
+
+    Roles with more than ``MAX_N`` respondents keep the ``MAX_N`` rows with the smallest
+    random key (a uniform sample that can be taken batch by batch).
+    """
+    cols = [f"t{t}_adj" for t in topic_ids]; rng = np.random.default_rng(SEED)
+    keys = [np.empty(0)]*len(roles); mats = [np.empty((0, len(cols)))]*len(roles); n = np.zeros(len(roles), dtype=int)
+    for df in snapshot.iter_batches(company, ["role"]+cols, survey=survey.key):
+        role = df["role"].astype(object).to_numpy()
+        X = scoring.normalize_adj(df[cols].to_numpy(dtype=float, na_value=np.nan), survey.max_adj)
+        u = rng.random(len(X))
+        for i, r in enumerate(roles):
+            m = role==r
+            if not m.any(): continue
+            n[i] += int(m.sum()); keys[i] = np.concatenate([keys[i], u[m]]); mats[i] = np.vstack([mats[i], X[m]])
+            if len(keys[i])>MAX_N:
+                top = np.argpartition(keys[i], MAX_N)[:MAX_N]; keys[i], mats[i] = keys[i][top], mats[i][top]
+    return mats, n
+
+
+def _block(mats:list[np.ndarray], b:int, seed)->tuple[np.ndarray, np.ndarray]:
+    """``b`` resamples: (b × roles × topics) weighted sums and answer counts."""
+    rng = np.random.default_rng(seed); T = mats[0].shape[1] if mats else 0
+    S = np.zeros((b, len(mats), T)); C = np.zeros((b, len(mats), T))
+    for i, X in enumerate(mats):
+        if not len(X): continue
+        ok = ~np.isnan(X)
+        w = rng.poisson(1.0, size=(b, len(X))).astype(float)
+        S[:, i] = w@np.where(ok, X, 0.0); C[:, i] = w@ok
+    return S, C
+
+
+def resample(company:str, topic_ids, roles, n_boot:int=N_BOOT, max_workers:int|None=None, survey=None)->dict:
+    """Bootstrap samples of role means (one survey version's responses), cached per data version.
+
+    Returns ``{"means": B × roles × topics, "counts": B × roles × topics, "n": respondents per role}``.
+    """
+    topic_ids = tuple(topic_ids); roles = tuple(roles); survey = get_survey(survey)
+    key = (company, storage.data_version(company), survey.key, topic_ids, roles, n_boot)
+    with _LOCK:
+        hit = _CACHE.get(key)
+        if hit is not None:
+            _CACHE.move_to_end(key); return hit
+    mats, n = _role_matrices(company, topic_ids, roles, survey)
+    sizes = [BLOCK]*(n_boot//BLOCK)+([n_boot%BLOCK] if n_boot%BLOCK else [])
+    seeds = np.random.SeedSequence(SEED).spawn(len(sizes))
+    workers = max_workers or min(len(sizes), os.cpu_count() or 2)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        parts = list(pool.map(lambda a: _block(mats, *a), zip(sizes, seeds)))
+    S = np.concatenate([p[0] for p in parts]); C = np.concatenate([p[1] for p in parts])
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = np.where(C>0, S/np.where(C>0, C, 1), np.nan)
+    C *= (n/np.maximum([len(X) for X in mats], 1))[None, :, None]   # answer counts of capped roles back at full scale
+    res = {"means": means, "counts": C, "n": n}
+    with _LOCK:
+        _CACHE[key] = res
+        while len(_CACHE)>CACHE_SIZE: _CACHE.popitem(last=False)
+    return res
+
+
+def _org(means:np.ndarray, W:np.ndarray, counts:np.ndarray|None)->np.ndarray:
+    """Vectorized :func:`scoring.org_scores` over resamples: B × topics."""
+    Wb = W.T[None]*(counts if counts is not None else 1.0)      # B × roles × topics
+    valid = ~np.isnan(means)
+    num = np.where(valid, Wb*np.where(valid, means, 0.0), 0.0).sum(axis=1)
+    den = np.where(valid, Wb, 0.0).sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(den==0, np.nan, num/np.where(den==0, 1.0, den))
+
+
+def _interval(x:np.ndarray, axis=0, level:float=LEVEL)->tuple[np.ndarray, np.ndarray]:
+    a = (1-level)/2*100
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)   # all-NaN slices stay NaN
+        lo, hi = np.nanpercentile(x, [a, 100-a], axis=axis)
+    return lo, hi
+
+
+def intervals(boot:dict, W:np.ndarray, target:float, weighted:bool=False, level:float=LEVEL)->dict:
+    """Percentile intervals for role means, org series, org_avg and pass_rate from :func:`resample` output."""
+    means = boot["means"]
+    org = _org(means, W, boot["counts"] if weighted else None)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        org_avg = np.nanmean(org, axis=1)
+    valid = ~np.isnan(org)
+    pass_rate = np.where(valid.any(axis=1), (np.where(valid, org, -np.inf)>=target).sum(axis=1)/np.maximum(valid.sum(axis=1), 1)*100, np.nan)
+    return {"role": _interval(means, 0, level), "org": _interval(org, 0, level),
+            "org_avg": tuple(float(v) for v in _interval(org_avg, 0, level)),
+            "pass_rate": tuple(float(v) for v in _interval(pass_rate, 0, level)),
+            "n": boot["n"], "low_sample": boot["n"]<MIN_N}
+
+
+def clear_cache():
+    with _LOCK: _CACHE.clear()
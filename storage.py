@@ -0,0 +1,256 @@
+# storage.py
+# -*- coding: utf-8 -*-
+"""Append-only response store: one SQLite (WAL) database per company.
+
+Every submit is a single INSERT inside a write transaction, so cost stays flat
+as a company grows and concurrent Streamlit sessions (threads or processes)
+cannot lose each other's rows. This module does not import Streamlit.
+"""
+import contextlib
+import hashlib
+import re
+import sqlite3
+from pathlib import Path
+
+import pandas as pd
+
+DATA_DIR = Path("data")
+DB_NAME = "responses.db"
+CSV_NAME = "responses.csv"
+META_COLS = ["timestamp", "company", "respondent", "role", "survey"]   # survey: key of the questionnaire version (NULL = default)
+BUSY_TIMEOUT_MS = 30_000
+
+_TOPIC_COL = re.compile(r"^t\d+_(maturity|rel|adj)$")
+
+
+def company_dir(company:str)->Path:
+    return DATA_DIR/company
+
+
+def db_path(company:str)->Path:
+    return company_dir(company)/DB_NAME
+
+
+def list_companies()->list[str]:
+    if not DATA_DIR.exists(): return []
+    return sorted(d.name for d in DATA_DIR.iterdir() if d.is_dir())
+
+
+def _col_type(col:str)->str:
+    return "INTEGER" if _TOPIC_COL.match(col) else "TEXT"
+
+
+def _quote(col:str)->str:
+    return '"' + col.replace('"', '""') + '"'
+
+
+def connect(company:str)->sqlite3.Connection:
+    """Open the company database (creating it, and migrating a legacy CSV, if needed)."""
+    company_dir(company).mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(db_path(company), timeout=BUSY_TIMEOUT_MS/1000, isolation_level=None)
+    conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("CREATE TABLE IF NOT EXISTS responses (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                 + ", ".join(f"{_quote(c)} TEXT" for c in META_COLS) + ")")
+    _ensure_meta(conn)
+    if (company_dir(company)/CSV_NAME).exists():
+        _migrate_csv(conn, company)
+    return conn
+
+
+def columns(conn:sqlite3.Connection)->list[str]:
+    return [r[1] for r in conn.execute("PRAGMA table_info(responses)") if r[1]!="id"]
+
+
+def _ensure_columns(conn:sqlite3.Connection, cols)->None:
+    have = set(columns(conn))
+    for c in cols:
+        if c not in have and c!="id":
+            conn.execute(f"ALTER TABLE responses ADD COLUMN {_quote(c)} {_col_type(c)}"); have.add(c)
+
+
+def _ensure_meta(conn:sqlite3.Connection)->None:
+    # databases created before a meta column existed (e.g. ``survey``) get it on first open
+    have = set(columns(conn))
+    for c in [c for c in META_COLS if c not in have]:
+        try: conn.execute(f"ALTER TABLE responses ADD COLUMN {_quote(c)} TEXT")
+        except sqlite3.OperationalError as e:
+            if "duplicate column" not in str(e): raise   # another connection added it first
+
+
+def _insert_rows(conn:sqlite3.Connection, records:list[dict])->int:
+    cols = list(dict.fromkeys(c for rec in records for c in rec if c!="id"))
+    _ensure_columns(conn, cols)
+    sql = f"INSERT INTO responses ({', '.join(map(_quote, cols))}) VALUES ({', '.join('?'*len(cols))})"
+    conn.executemany(sql, ([_to_sql(rec.get(c)) for c in cols] for rec in records))
+    return len(records)
+
+
+def _to_sql(v):
+    if v is None: return None
+    if isinstance(v, float) and v!=v: return None
+    if hasattr(v, "item"): return v.item()   # numpy scalars
+    return v
+
+
+def append_records(company:str, records:list[dict])->int:
+    """Append records atomically (one write transaction). Returns rows written."""
+    if not records: return 0
+    conn = connect(company)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            n = _insert_rows(conn, records)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK"); raise
+        return n
+    finally:
+        conn.close()
+
+
+def append_frame(company:str, df:pd.DataFrame)->int:
+    """Append a DataFrame of rows in one write transaction (bulk path; no per-row dicts)."""
+    if df.empty: return 0
+    cols = [c for c in df.columns if c!="id"]
+    # column-wise conversion to Python values (NaN -> NULL); rows are zipped lazily for executemany
+    values = [df[c].tolist() if df[c].dtype.kind in "iub" else df[c].astype(object).where(df[c].notna(), None).tolist()
+              for c in cols]
+    conn = connect(company)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            _ensure_columns(conn, cols)
+            conn.executemany(f"INSERT INTO responses ({', '.join(map(_quote, cols))}) VALUES ({', '.join('?'*len(cols))})",
+                             zip(*values))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK"); raise
+        return len(df)
+    finally:
+        conn.close()
+
+
+def append_response(company:str, rec:dict)->None:
+    append_records(company, [rec])
+
+
+def submit(company:str, rec:dict, stage=None)->None:
+    """Store one questionnaire answer and fold it into the running aggregates (the app's submit path).
+
+    ``stage`` (e.g. ``RunTimer.stage``) wraps each step as ``submit_store`` / ``submit_aggregates``.
+    """
+    import aggregates   # aggregates imports this module
+    stage = stage or (lambda name: contextlib.nullcontext())
+    with stage("submit_store"): append_response(company, rec)
+    with stage("submit_aggregates"): aggregates.refresh(company)
+
+
+def read_responses(company:str, cols:list[str]|None=None)->pd.DataFrame:
+    """Read stored rows (without the internal id) in insertion order."""
+    conn = connect(company)
+    try:
+        have = columns(conn)
+        use = have if cols is None else [c for c in cols if c in have]
+        if not use: return pd.DataFrame(columns=cols or [])
+        df = pd.read_sql_query(f"SELECT {', '.join(map(_quote, use))} FROM responses ORDER BY id", conn)
+    finally:
+        conn.close()
+    if cols is not None:
+        for c in cols:
+            if c not in df.columns: df[c] = pd.NA
+        df = df[cols]
+    return df
+
+
+def response_columns(company:str)->list[str]:
+    """Stored column names (without the internal id), in table order."""
+    conn = connect(company)
+    try: return columns(conn)
+    finally: conn.close()
+
+
+def iter_responses(company:str, cols:list[str]|None=None, chunksize:int=50_000):
+    """Yield the stored rows in insertion order as DataFrame chunks of at most ``chunksize`` rows."""
+    conn = connect(company)
+    try:
+        have = columns(conn)
+        use = have if cols is None else [c for c in cols if c in have]
+        if not use: return
+        sql = f"SELECT {', '.join(map(_quote, use))} FROM responses ORDER BY id"
+        for chunk in pd.read_sql_query(sql, conn, chunksize=chunksize):
+            if cols is not None:
+                chunk = chunk.reindex(columns=cols)
+            yield chunk
+    finally:
+        conn.close()
+
+
+def count_responses(company:str)->int:
+    conn = connect(company)
+    try: return conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+    finally: conn.close()
+
+
+def data_version(company:str)->tuple:
+    """Cheap change marker: (db file identity, last row id). Changes on every append (or rebuild) only,
+    not when derived tables (aggregates, trends, snapshot registry) are written.
+
+    A plain read on a bare connection (no schema setup); only a pending legacy CSV goes through :func:`connect`.
+    """
+    p = db_path(company)
+    if (company_dir(company)/CSV_NAME).exists(): connect(company).close()   # performs the migration
+    if not p.exists(): return (0, 0)
+    conn = sqlite3.connect(p, timeout=BUSY_TIMEOUT_MS/1000)
+    try: last = conn.execute("SELECT COALESCE(MAX(id),0) FROM responses").fetchone()[0]
+    except sqlite3.OperationalError as e:
+        if "no such table" not in str(e): raise
+        last = 0   # database file created but not initialised yet
+    finally: conn.close()
+    return (p.stat().st_ino, last)
+
+
+# ---------- one-shot CSV migration ----------
+def _migrate_csv(conn:sqlite3.Connection, company:str)->int:
+    """Import the legacy CSV (appended to any rows already in the database), then rename it.
+
+    Each imported file is recorded by content hash in the same transaction, so a crash
+    between COMMIT and the rename cannot import the same file twice.
+    """
+    src = company_dir(company)/CSV_NAME; n = 0
+    conn.execute("BEGIN IMMEDIATE")   # serializes concurrent first-time migrations
+    try:
+        conn.execute("CREATE TABLE IF NOT EXISTS csv_migrations (sha1 TEXT PRIMARY KEY, rows INTEGER)")
+        if src.exists():
+            digest = hashlib.sha1(src.read_bytes()).hexdigest()
+            if conn.execute("SELECT 1 FROM csv_migrations WHERE sha1=?", (digest,)).fetchone() is None:
+                df = pd.read_csv(src)
+                recs = df.astype(object).where(df.notna(), None).to_dict("records")
+                n = _insert_rows(conn, recs) if recs else 0
+                conn.execute("INSERT INTO csv_migrations VALUES(?,?)", (digest, n))
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK"); raise
+    try: src.rename(src.with_name(CSV_NAME+".migrated"))
+    except FileNotFoundError: pass   # another session finished first
+    return n
+
+
+def migrate_all()->dict:
+    """Migrate every legacy data/<company>/responses.csv into its database."""
+    out = {}
+    for company in list_companies():
+        if (company_dir(company)/CSV_NAME).exists():
+            conn = connect(company)   # connect() performs the migration
+            try: out[company] = conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            finally: conn.close()
+    return out
+
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv)>1 and sys.argv[1]=="migrate":
+        for c, n in migrate_all().items(): print(f"{c}: {n} rows migrated")
+    else:
+        print("usage: python storage.py migrate")
@@ -0,0 +1,245 @@
+# survey_config.py
+# -*- coding: utf-8 -*-
+"""Questionnaire definitions shared by the app, scoring and batch jobs (no Streamlit import).
+
+Each questionnaire is a versioned JSON file ``surveys/<id>@<version>.json``; its key (the
+file stem) is stored with every response. A file may list its own ``topics`` (or a
+``topics_file``), ``roles`` (``{"name", "en", "color"}``), ``level_options`` /
+``rel_options`` (``[label, code]``), ``weights`` (``{topic_id: {role or en name: w}}``) and
+``expected_topics``; anything omitted falls back to the constants below, which define the
+original asset-management questionnaire. :func:`get_survey` compiles a file once per
+process (again only if it changes) into a :class:`Survey` with index maps, option-code
+maps and a read-only topics × roles weight matrix.
+"""
+import json
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+
+TOPICS_PATH = Path(__file__).with_name("topics.json")
+SURVEYS_DIR = Path(__file__).with_name("surveys")
+DEFAULT_SURVEY = "asset_management@1"   # also the survey of responses stored before surveys were tagged
+EXPECTED_TOPICS = 40
+
+# ─────────────────────── نقش‌ها و رنگ‌ها ───────────────────────
+ROLES = ["مدیران ارشد","مدیران اجرایی","سرپرستان / خبرگان","متخصصان فنی","متخصصان غیر فنی"]
+ROLE_COLORS = {"مدیران ارشد":"#d62728","مدیران اجرایی":"#1f77b4","سرپرستان / خبرگان":"#2ca02c","متخصصان فنی":"#ff7f0e","متخصصان غیر فنی":"#9467bd"}
+
+# ───────────────────── گزینه‌های پاسخ ─────────────────────
+LEVEL_OPTIONS = [
+    ("اطلاعی در این مورد ندارم.",0),
+    ("سازمان نیاز به این موضوع را شناسایی کرده ولی جزئیات آن را نمی‌دانم.",1),
+    ("سازمان در حال تدوین دستورالعمل‌های مرتبط است و فعالیت‌هایی به‌صورت موردی انجام می‌شود.",2),
+    ("بله، این موضوع در سازمان به‌صورت کامل و استاندارد پیاده‌سازی و اجرایی شده است.",3),
+    ("بله، چند سال است که نتایج اجرای آن بر اساس شاخص‌های استاندارد ارزیابی می‌شود و از بهترین تجربه‌ها برای بهبود مستمر استفاده می‌گردد.",4),
+]
+REL_OPTIONS = [("هیچ ارتباطی ندارد.",1),("ارتباط کم دارد.",3),("تا حدی مرتبط است.",5),("ارتباط زیادی دارد.",7),("کاملاً مرتبط است.",10)]
+
+# ─────────── ضرایب فازی نرمال‌شده (همان جدول شما) ───────────
+ROLE_MAP_EN2FA={"Senior Managers":"مدیران ارشد","Executives":"مدیران اجرایی","Supervisors/Sr Experts":"سرپرستان / خبرگان","Technical Experts":"متخصصان فنی","Non-Technical Experts":"متخصصان غیر فنی"}
+NORM_WEIGHTS = {  # … همان جدول کامل 1..40 (بدون تغییر)
+    1:{"Senior Managers":0.3846,"Executives":0.2692,"Supervisors/Sr Experts":0.1923,"Technical Experts":0.1154,"Non-Technical Experts":0.0385},
+    2:{"Senior Managers":0.2692,"Executives":0.3846,"Supervisors/Sr Experts":0.1923,"Technical Experts":0.1154,"Non-Technical Experts":0.0385},
+    3:{"Senior Managers":0.3846,"Executives":0.2692,"Supervisors/Sr Experts":0.1923,"Technical Experts":0.1154,"Non-Technical Experts":0.0385},
+    4:{"Senior Managers":0.3846,"Executives":0.2692,"Supervisors/Sr Experts":0.1923,"Technical Experts":0.1154,"Non-Technical Experts":0.0385},
+    5:{"Senior Managers":0.2692,"Executives":0.3846,"Supervisors/Sr Experts":0.1923,"Technical Experts":0.1154,"Non-Technical Experts":0.0385},
+    6:{"Senior Managers":0.1923,"Executives":0.2692,"Supervisors/Sr Experts":0.1154,"Technical Experts":0.0385,"Non-Technical Experts":0.3846},
+    7:{"Senior Managers":0.0385,"Executives":0.1923,"Supervisors/Sr Experts":0.2692,"Technical Experts":0.3846,"Non-Technical Experts":0.1154},
+    8:{"Senior Managers":0.3846,"Executives":0.2692,"Supervisors/Sr Experts":0.1923,"Technical Experts":0.1154,"Non-Technical Experts":0.0385},
+    9:{"Senior Managers":0.3846,"Executives":0.2692,"Supervisors/Sr Experts":0.1154,"Technical Experts":0.0385,"Non-Technical Experts":0.1923},
+    10:{"Senior Managers":0.1154,"Executives":0.2692,"Supervisors/Sr Experts":0.1923,"Technical Experts":0.0385,"Non-Technical Experts":0.3846},
+    11:{"Senior Managers":0.1923,"Executives":0.3846,"Supervisors/Sr Experts":0.2692,"Technical Experts":0.1154,"Non-Technical Experts":0.0385},
+    12:{"Senior Managers":0.1154,"Executives":0.2692,"Supervisors/Sr Experts":0.1923,"Technical Experts":0.0385,"Non-Technical Experts":0.3846},
+    13:{"Senior Managers":0.1154,"Executives":0.2692,"Supervisors/Sr Experts":0.1923,"Technical Experts":0.0385,"Non-Technical Experts":0.3846},
+    14:{"Senior Managers":0.3846,"Executives":0.2692,"Supervisors/Sr Experts":0.1923,"Technical Experts":0.1154,"Non-Technical Experts":0.0385},
+    15:{"Senior Managers":0.1923,"Executives":0.3846,"Supervisors/Sr Experts":0.2692,"Technical Experts":0.1154,"Non-Technical Experts":0.0385},
+    16:{"Senior Managers":0.1154,"Executives":0.1923,"Supervisors/Sr Experts":0.3846,"Technical Experts":0.2692,"Non-Technical Experts":0.0385},
+    17:{"Senior Managers":0.1923,"Executives":0.3846,"Supervisors/Sr Experts":0.2692,"Technical Experts":0.1154,"Non-Technical Experts":0.0385},
+    18:{"Senior Managers":0.2692,"Executives":0.3846,"Supervisors/Sr Experts":0.1923,"Technical Experts":0.1154,"Non-Technical Experts":0.0385},
+    19:{"Senior Managers":0.1154,"Executives":0.2692,"Supervisors/Sr Experts":0.1923,"Technical Experts":0.0385,"Non-Technical Experts":0.3846},
+    20:{"Senior Managers":0.2692,"Executives":0.3846,"Supervisors/Sr Experts":0.1923,"Technical Experts":0.1154,"Non-Technical Experts":0.0385},
+    21:{"Senior Managers":0.1154,"Executives":0.2692,"Supervisors/Sr Experts":0.1923,"Technical Experts":0.0385,"Non-Technical Experts":0.3846},
+    22:{"Senior Managers":0.2692,"Executives":0.3846,"Supervisors/Sr Experts":0.1923,"Technical Experts":0.1154,"Non-Technical Experts":0.0385},
+    23:{"Senior Managers":0.1923,"Executives":0.3846,"Supervisors/Sr Experts":0.2692,"Technical Experts":0.1154,"Non-Technical Experts":0.0385},
+    24:{"Senior Managers":0.0385,"Executives":0.1923,"Supervisors/Sr Experts":0.2692,"Technical Experts":0.3846,"Non-Technical Experts":0.1154},
+    25:{"Senior Managers":0.0385,"Executives":0.1923,"Supervisors/Sr Experts":0.2692,"Technical Experts":0.3846,"Non-Technical Experts":0.1154},
+    26:{"Senior Managers":0.1154,"Executives":0.1923,"Supervisors/Sr Experts":0.3846,"Technical Experts":0.2692,"Non-Technical Experts":0.0385},
+    27:{"Senior Managers":0.1154,"Executives":0.1923,"Supervisors/Sr Experts":0.3846,"Technical Experts":0.2692,"Non-Technical Experts":0.0385},
+    28:{"Senior Managers":0.1154,"Executives":0.1923,"Supervisors/Sr Experts":0.3846,"Technical Experts":0.2692,"Non-Technical Experts":0.0385},
+    29:{"Senior Managers":0.1923,"Executives":0.3846,"Supervisors/Sr Experts":0.0385,"Technical Experts":0.1154,"Non-Technical Experts":0.2692},
+    30:{"Senior Managers":0.1154,"Executives":0.3846,"Supervisors/Sr Experts":0.0385,"Technical Experts":0.2692,"Non-Technical Experts":0.1923},
+    31:{"Senior Managers":0.1154,"Executives":0.2692,"Supervisors/Sr Experts":0.1923,"Technical Experts":0.0385,"Non-Technical Experts":0.3846},
+    32:{"Senior Managers":0.0385,"Executives":0.2692,"Supervisors/Sr Experts":0.1154,"Technical Experts":0.3846,"Non-Technical Experts":0.1923},
+    33:{"Senior Managers":0.0385,"Executives":0.1923,"Supervisors/Sr Experts":0.1154,"Technical Experts":0.3846,"Non-Technical Experts":0.2692},
+    34:{"Senior Managers":0.0385,"Executives":0.2692,"Supervisors/Sr Experts":0.1154,"Technical Experts":0.3846,"Non-Technical Experts":0.1923},
+    35:{"Senior Managers":0.0385,"Executives":0.1923,"Supervisors/Sr Experts":0.1154,"Technical Experts":0.3846,"Non-Technical Experts":0.2692},
+    36:{"Senior Managers":0.3846,"Executives":0.2692,"Supervisors/Sr Experts":0.1923,"Technical Experts":0.1154,"Non-Technical Experts":0.0385},
+    37:{"Senior Managers":0.0385,"Executives":0.2692,"Supervisors/Sr Experts":0.3846,"Technical Experts":0.1923,"Non-Technical Experts":0.1154},
+    38:{"Senior Managers":0.0385,"Executives":0.2692,"Supervisors/Sr Experts":0.3846,"Technical Experts":0.1923,"Non-Technical Experts":0.1154},
+    39:{"Senior Managers":0.1923,"Executives":0.3846,"Supervisors/Sr Experts":0.2692,"Technical Experts":0.1154,"Non-Technical Experts":0.0385},
+    40:{"Senior Managers":0.3846,"Executives":0.2692,"Supervisors/Sr Experts":0.1154,"Technical Experts":0.0385,"Non-Technical Experts":0.1923},
+}
+
+
+# ─────────────────────── بارگذاری موضوعات ───────────────────────
+class SurveyError(ValueError):
+    """A survey definition is missing or malformed."""
+
+
+class TopicsError(SurveyError):
+    """topics.json is missing or malformed."""
+
+
+def _check_topics(topics, expected:int|None, source:str="topics.json")->tuple:
+    if not isinstance(topics, list) or not all(isinstance(t, dict) for t in topics):
+        raise TopicsError(f"{source} باید فهرستی از موضوع‌ها باشد.")
+    ids = []
+    for i,t in enumerate(topics):
+        if not isinstance(t.get("id"), int) or not isinstance(t.get("name"), str) or not isinstance(t.get("desc"), str):
+            raise TopicsError(f"موضوع شماره {i+1} باید id (عدد)، name و desc داشته باشد.")
+        ids.append(t["id"])
+    if len(set(ids))!=len(ids):
+        raise TopicsError(f"شناسه‌های تکراری در {source} وجود دارد.")
+    warnings = []
+    if expected and len(topics)!=expected:
+        warnings.append(f"⚠️ تعداد موضوعات باید دقیقاً {expected} باشد (اکنون {len(topics)}).")
+    return tuple(topics), tuple(warnings)
+
+
+@lru_cache(maxsize=8)
+def _load_topics(path:str, mtime_ns:int, expected:int|None=EXPECTED_TOPICS)->tuple:
+    return _check_topics(json.loads(Path(path).read_text(encoding="utf-8")), expected)
+
+
+def load_topics(path=TOPICS_PATH)->tuple[list, list]:
+    """Parse and validate topics.json once per process (re-read only if the file changes).
+
+    Returns ``(topics, warnings)``; raises FileNotFoundError or TopicsError.
+    """
+    path = Path(path)
+    topics, warnings = _load_topics(str(path.resolve()), path.stat().st_mtime_ns)
+    return list(topics), list(warnings)
+
+
+# ─────────────────────── پرسشنامه‌های نسخه‌دار ───────────────────────
+@dataclass(frozen=True, eq=False)
+class Survey:
+    """One compiled questionnaire version (hashable by identity; recompiled only when its files change)."""
+    key: str
+    title: str
+    topics: tuple
+    roles: tuple
+    role_colors: dict
+    role_aliases: dict          # alternative role names (e.g. English) -> role
+    level_options: tuple        # (label, code)
+    rel_options: tuple
+    weights: np.ndarray         # topics × roles, read-only
+    warnings: tuple = ()
+    topic_ids: tuple = field(init=False)
+    topic_index: dict = field(init=False)   # topic id -> row of ``weights``
+    role_index: dict = field(init=False)
+    level_codes: dict = field(init=False)   # label -> code
+    rel_codes: dict = field(init=False)
+    max_adj: float = field(init=False)      # highest maturity × highest relevance
+
+    def __post_init__(self):
+        put = lambda k, v: object.__setattr__(self, k, v)
+        put("topic_ids", tuple(t["id"] for t in self.topics))
+        put("topic_index", {t:i for i,t in enumerate(self.topic_ids)})
+        put("role_index", {r:i for i,r in enumerate(self.roles)})
+        put("level_codes", dict(self.level_options)); put("rel_codes", dict(self.rel_options))
+        put("max_adj", float(max(c for _,c in self.level_options)*max(c for _,c in self.rel_options)))
+
+    def weight_matrix(self, topic_ids, roles)->np.ndarray:
+        """Weights for ``topic_ids`` × ``roles`` (0 for unknown topics/roles)."""
+        W = np.zeros((len(topic_ids), len(roles)))
+        rows = [(a, self.topic_index[t]) for a,t in enumerate(topic_ids) if t in self.topic_index]
+        cols = [(b, self.role_index[r]) for b,r in enumerate(roles) if r in self.role_index]
+        if rows and cols:
+            ra, rb = map(list, zip(*rows)); ca, cb = map(list, zip(*cols))
+            W[np.ix_(ra, ca)] = self.weights[np.ix_(rb, cb)]
+        return W
+
+
+def _topics_file(spec:dict, base:Path)->Path|None:
+    return None if "topics" in spec else base/spec.get("topics_file", TOPICS_PATH.name)
+
+
+def _compile(key:str, spec:dict, base:Path)->Survey:
+    src = _topics_file(spec, base)
+    if src is None: topics, warns = _check_topics(spec["topics"], spec.get("expected_topics"), key)
+    else: topics, warns = _load_topics(str(src.resolve()), src.stat().st_mtime_ns, spec.get("expected_topics"))
+    if "roles" in spec:
+        roles = [r["name"] if isinstance(r, dict) else str(r) for r in spec["roles"]]
+        colors = {r["name"]: r["color"] for r in spec["roles"] if isinstance(r, dict) and r.get("color")}
+        aliases = {r["en"]: r["name"] for r in spec["roles"] if isinstance(r, dict) and r.get("en")}
+    else:
+        roles, colors, aliases = list(ROLES), {r: ROLE_COLORS[r] for r in ROLES}, dict(ROLE_MAP_EN2FA)
+    if not roles or len(set(roles))!=len(roles): raise SurveyError(f"{key}: نقش‌ها خالی یا تکراری است.")
+    level = tuple((str(l), int(c)) for l,c in spec.get("level_options", LEVEL_OPTIONS))
+    rel = tuple((str(l), int(c)) for l,c in spec.get("rel_options", REL_OPTIONS))
+    if not level or not rel: raise SurveyError(f"{key}: گزینه‌های پاسخ خالی است.")
+    if "weights" in spec:
+        table = {int(t): w for t,w in spec["weights"].items()}
+    elif "roles" not in spec:
+        table = NORM_WEIGHTS
+    else:
+        table = {t["id"]: {r: 1.0/len(roles) for r in roles} for t in topics}   # no table: equal role weights
+    en = {fa: en for en, fa in aliases.items()}
+    W = np.array([[float(table.get(t["id"], {}).get(r, table.get(t["id"], {}).get(en.get(r), 0.0))) for r in roles]
+                  for t in topics], dtype=float).reshape(len(topics), len(roles))
+    W.setflags(write=False)
+    return Survey(key=key, title=spec.get("title", key), topics=topics, roles=tuple(roles), role_colors=colors,
+                  role_aliases=aliases, level_options=level, rel_options=rel, weights=W, warnings=warns)
+
+
+@lru_cache(maxsize=32)
+def _read_spec(path:str, mtime_ns:int)->dict:
+    try: return json.loads(Path(path).read_text(encoding="utf-8"))
+    except ValueError as e: raise SurveyError(f"{Path(path).name}: {e}") from e
+
+
+@lru_cache(maxsize=32)
+def _load_survey(path:str, mtime_ns:int, topics_mtime_ns:int)->Survey:
+    p = Path(path)
+    return _compile(p.stem, _read_spec(path, mtime_ns), p.parent)
+
+
+def survey_path(key:str)->Path:
+    return SURVEYS_DIR/f"{key}.json"
+
+
+def list_surveys()->list[str]:
+    """Keys of the available questionnaires (the default one first)."""
+    keys = sorted(p.stem for p in SURVEYS_DIR.glob("*@*.json")) if SURVEYS_DIR.is_dir() else []
+    return [DEFAULT_SURVEY]+[k for k in keys if k!=DEFAULT_SURVEY]
+
+
+def survey_key(survey=None)->str:
+    """Key stored with responses for a Survey, a key or ``None`` (default survey)."""
+    return survey.key if isinstance(survey, Survey) else (survey or DEFAULT_SURVEY)
+
+
+def get_survey(survey=None)->Survey:
+    """Compiled :class:`Survey` for a key (``None`` = default); a Survey is returned as is.
+
+    Costs two ``stat`` calls when cached; recompiles only when the survey or its topics file changes.
+    """
+    if isinstance(survey, Survey): return survey
+    key = survey_key(survey)
+    path = survey_path(key)
+    if not path.exists():
+        if key!=DEFAULT_SURVEY: raise SurveyError(f"پرسشنامهٔ «{key}» پیدا نشد.")
+        path = None   # built-in definition: the constants above + topics.json
+    spec = _read_spec(str(path.resolve()), path.stat().st_mtime_ns) if path else {"expected_topics": EXPECTED_TOPICS}
+    src = _topics_file(spec, path.parent if path else TOPICS_PATH.parent)
+    topics_mtime = src.stat().st_mtime_ns if src else 0
+    if path is None: return _load_survey_builtin(topics_mtime)
+    return _load_survey(str(path.resolve()), path.stat().st_mtime_ns, topics_mtime)
+
+
+@lru_cache(maxsize=2)
+def _load_survey_builtin(topics_mtime_ns:int)->Survey:
+    return _compile(DEFAULT_SURVEY, {"expected_topics": EXPECTED_TOPICS}, TOPICS_PATH.parent)
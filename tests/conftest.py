@@ -0,0 +1,52 @@
+# tests/conftest.py
+# -*- coding: utf-8 -*-
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import aggregates, holding, storage, survey_config, trends   # noqa: E402
+from survey_config import ROLES   # noqa: E402
+
+TOPIC_IDS = list(range(1, 41))
+LEVELS = (0, 1, 2, 3, 4)
+RELS = (1, 3, 5, 7, 10)
+
+
+def make_records(n:int, seed:int=0, roles=ROLES, topics=TOPIC_IDS, levels=LEVELS, rels=RELS, month:int=1,
+                 survey:str|None=None, company:str="A")->list[dict]:
+    """``n`` synthetic submits: random role, maturity and relevance codes per topic, ``_adj`` = their product."""
+    rng = np.random.default_rng(seed); roles = list(roles); out = []
+    for _ in range(n):
+        r = {"timestamp": f"2025-{month:02d}-10T10:00:00", "company": company, "respondent": "", "role": str(rng.choice(roles))}
+        if survey: r["survey"] = survey
+        for t in topics:
+            m, q = int(rng.choice(levels)), int(rng.choice(rels))
+            r.update({f"t{t}_maturity": m, f"t{t}_rel": q, f"t{t}_adj": m*q})
+        out.append(r)
+    return out
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """Empty ``data/`` and ``surveys/`` folders under ``tmp_path`` and cold per-company caches."""
+    monkeypatch.setattr(storage, "DATA_DIR", tmp_path/"data")
+    monkeypatch.setattr(survey_config, "SURVEYS_DIR", tmp_path/"surveys")
+    (tmp_path/"surveys").mkdir()
+    for mod in (aggregates, holding, trends): monkeypatch.setattr(mod, "_CACHE", {})
+    return tmp_path
+
+
+@pytest.fixture
+def company(data_dir):
+    """Company "A": 30 default-survey submits in each of 2025-01..03, the first role over-represented.
+
+    Returns ``(name, DataFrame of the stored records)``.
+    """
+    recs = [r for month in (1, 2, 3) for r in make_records(30, seed=month, roles=[ROLES[0]]*3+ROLES, month=month)]
+    storage.append_records("A", recs)
+    return "A", pd.DataFrame(recs)
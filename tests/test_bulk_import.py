@@ -0,0 +1,80 @@
+# tests/test_bulk_import.py
+# -*- coding: utf-8 -*-
+import numpy as np
+import pandas as pd
+import pytest
+
+import aggregates
+import bulk_import
+import storage
+from survey_config import LEVEL_OPTIONS, REL_OPTIONS, ROLES
+
+TOPICS = [1, 2]
+LEVEL, REL = LEVEL_OPTIONS[3][0], REL_OPTIONS[1][0]   # labels of codes 3 and 3
+
+
+def _raw(rows):
+    """Spreadsheet-like frame (all text) from ``(company, role, t1_m, t1_r, t2_m, t2_r)`` tuples."""
+    return pd.DataFrame(rows, columns=["company", "role", "t1_maturity", "t1_rel", "t2_maturity", "t2_rel"], dtype=object)
+
+
+def _watermark(company):
+    conn = storage.connect(company)
+    try: return conn.execute("SELECT last_id FROM agg_state WHERE name=?", (aggregates.WATERMARK,)).fetchone()[0]
+    finally: conn.close()
+
+
+def test_labels_codes_and_aliases():
+    ok, err = bulk_import.validate(_raw([("A", ROLES[0], LEVEL, REL, "4", "10"),
+                                         ("A", "Senior Managers", " 0 ", "1", LEVEL, "7")]), TOPICS)
+    assert err.empty and len(ok)==2
+    assert ok.iloc[0][["t1_maturity", "t1_rel", "t1_adj", "t2_adj"]].tolist()==[3, 3, 9, 40]
+    assert ok.iloc[1]["role"]==ROLES[0] and ok.iloc[1][["t1_adj", "t2_adj"]].tolist()==[0, 21]
+    assert (ok["survey"]=="asset_management@1").all() and ok["t1_adj"].dtype==np.int64
+
+
+def test_blank_and_invalid_cells_reported_by_spreadsheet_row():
+    ok, err = bulk_import.validate(_raw([("A", ROLES[0], "1", "1", "1", "1"),
+                                         ("A", ROLES[0], "", "1", "1", "1"),
+                                         ("A", ROLES[0], "9", "1", "1", "2"),
+                                         ("", "کارمند", "1", "1", "1", "1")]), TOPICS)
+    assert ok.index.tolist()==[0]
+    got = set(map(tuple, err[["ردیف", "ستون", "خطا"]].to_numpy().tolist()))
+    assert got=={(3, "t1_maturity", "پاسخ خالی است"), (4, "t1_maturity", "گزینهٔ نامعتبر"), (4, "t2_rel", "گزینهٔ نامعتبر"),
+                 (5, "company", "نام شرکت خالی یا نامعتبر است"), (5, "role", "نقش نامعتبر است")}
+
+
+def test_missing_column_rejects_every_row():
+    raw = _raw([("A", ROLES[0], "1", "1", "1", "1")]).drop(columns="t2_rel")
+    ok, err = bulk_import.validate(raw, TOPICS)
+    assert ok.empty and err[["ردیف", "ستون"]].values.tolist()==[[1, "t2_rel"]]
+
+
+def test_import_one_transaction_per_company(data_dir, monkeypatch):
+    calls = []
+    append = storage.append_frame
+    monkeypatch.setattr(storage, "append_frame", lambda c, df: calls.append((c, len(df))) or append(c, df))
+    frames = [_raw([("A", ROLES[0], "1", "3", "2", "5"), ("B", ROLES[1], "4", "10", "4", "10")]),
+              _raw([("A", ROLES[2], "3", "7", "0", "1"), ("B", "x", "1", "1", "1", "1")])]   # e.g. two CSV chunks
+    res = bulk_import.import_frames(frames, TOPICS)
+    assert sorted(calls)==[("A", 2), ("B", 1)] and res.imported=={"A": 2, "B": 1} and res.rows_read==4
+    assert res.errors["ردیف"].tolist()==[5]   # row numbers continue across chunks
+    stored = storage.read_responses("A")
+    assert stored["role"].tolist()==[ROLES[0], ROLES[2]] and pd.to_numeric(stored["t1_adj"]).tolist()==[3, 21]
+    assert _watermark("A")==2 and _watermark("B")==1   # aggregates refreshed by the import
+    agg = aggregates.get("A")
+    assert agg["total"]==2 and agg["sum"].sum()==pytest.approx(3+10+21+0)
+
+
+def test_strict_writes_nothing_on_error(data_dir):
+    res = bulk_import.import_frames([_raw([("A", ROLES[0], "1", "1", "1", "1"), ("A", ROLES[0], "1", "2", "1", "1")])],
+                                    TOPICS, strict=True)
+    assert res.imported=={} and len(res.errors)==1
+    assert storage.list_companies()==[] or storage.count_responses("A")==0
+
+
+def test_company_override_and_file(data_dir, tmp_path):
+    path = tmp_path/"answers.csv"
+    _raw([("ignored", ROLES[0], "1", "1", "1", "1")]).to_csv(path, index=False, encoding="utf-8-sig")
+    res = bulk_import.import_file(path, TOPICS, company="C")
+    assert res.imported=={"C": 1} and storage.read_responses("C")["company"].tolist()==["C"]
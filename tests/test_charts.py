@@ -0,0 +1,40 @@
+# tests/test_charts.py
+# -*- coding: utf-8 -*-
+import pytest
+
+import charts
+
+TICKS = ["a", "b", "c"]
+SERIES = {"میانگین سازمان": [40.0, 55.0, 70.0]}
+
+
+@pytest.fixture(autouse=True)
+def _cold_cache():
+    charts.clear_cache(); yield; charts.clear_cache()
+
+
+def _target(fig):
+    return [tr for tr in fig.data if tr.name.startswith("هدف")]
+
+
+def test_radar_hit_with_new_target_and_annotate_repatches(monkeypatch):
+    first = charts.cached_radar("k", SERIES, "t", TICKS, target=45)
+    monkeypatch.setattr(charts, "_radar_base", lambda *a, **k: pytest.fail("base rebuilt on a cache hit"))
+    second = charts.cached_radar("k", SERIES, "t", TICKS, target=60, annotate=True)
+    assert second is not first
+    assert [t.name for t in _target(second)]==["هدف 60"] and list(_target(second)[0].r)==[60]*4
+    assert list(second.data[0].text)==["40", "55", "70", "40"]
+    assert [t.name for t in _target(first)]==["هدف 45"] and first.data[0].text is None
+    base = charts._FIG_CACHE[("radar", "k", True, False, False)]
+    assert len(base.data)==1 and base.data[0].text is None and base.data[0].mode=="lines+markers"
+    assert charts.cached_radar("k", SERIES, "t", TICKS, target=45) is first
+
+
+def test_bars_hit_with_new_target_leaves_base_unpatched():
+    per_role = {"r": [10.0, 20.0, 30.0]}
+    first = charts.cached_bars("k", per_role, TICKS, "t", target=45)
+    second = charts.cached_bars("k", per_role, TICKS, "t", target=70)
+    assert [s.y0 for s in first.layout.shapes if s.type=="rect"]==[40]
+    assert [s.y0 for s in second.layout.shapes if s.type=="rect"]==[65]
+    base = charts._FIG_CACHE[("bars", "k", "t", False, False)]
+    assert not base.layout.shapes and not base.layout.annotations
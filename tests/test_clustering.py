@@ -0,0 +1,76 @@
+# tests/test_clustering.py
+# -*- coding: utf-8 -*-
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import clustering
+import storage
+import timing
+from conftest import TOPIC_IDS, make_records
+from survey_config import ROLES
+
+
+@pytest.fixture(autouse=True)
+def cold_cache(monkeypatch):
+    monkeypatch.setattr(clustering, "_CACHE", OrderedDict())
+
+
+def _blobs(per=40, centers=((10, 10), (50, 90), (90, 20)), seed=0):
+    rng = np.random.default_rng(seed)
+    return np.vstack([rng.normal(c, 2.0, size=(per, 2)) for c in centers])
+
+
+def test_respondent_clusters_cover_every_respondent_across_batches(company):
+    name, df = company
+    roles = ROLES[:3]
+    got = clustering.respondent_clusters(name, TOPIC_IDS, roles, 3, batch_rows=7)
+    sel = df[df["role"].isin(roles)]
+    assert got["centers"].shape==(3, len(TOPIC_IDS)) and int(got["sizes"].sum())==len(sel)
+    assert got["roles"].sum(axis=1).to_dict()==sel["role"].value_counts().to_dict()
+    assert ((got["centers"].to_numpy()>=0)&(got["centers"].to_numpy()<=100)).all()
+    assert got["inertia"]>0
+
+
+def test_respondent_clusters_cached_until_new_data(company, monkeypatch):
+    name, _ = company
+    first = clustering.respondent_clusters(name, TOPIC_IDS, ROLES, 3)
+    with monkeypatch.context() as m:
+        m.setattr(timing, "lazy_import", lambda *a: pytest.fail("refitted on a cache hit"))
+        assert clustering.respondent_clusters(name, TOPIC_IDS, ROLES, 3) is first
+    storage.append_records(name, make_records(5, seed=9, month=3))
+    again = clustering.respondent_clusters(name, TOPIC_IDS, ROLES, 3)
+    assert again is not first and int(again["sizes"].sum())==int(first["sizes"].sum())+5
+
+
+def test_respondent_clusters_too_few_respondents(data_dir):
+    storage.append_records("A", make_records(2))
+    assert clustering.respondent_clusters("A", TOPIC_IDS, ROLES, 3) is None
+
+
+def test_topic_clusters_cached_per_key_and_k(monkeypatch):
+    mat = pd.DataFrame(_blobs(per=5), index=[f"t{i}" for i in range(15)], columns=ROLES[:2])
+    first = clustering.topic_clusters("v1", mat, 3)
+    assert sorted(first["خوشه"].value_counts().tolist())==[5, 5, 5]
+    with monkeypatch.context() as m:
+        m.setattr(timing, "lazy_import", lambda *a: pytest.fail("refitted on a cache hit"))
+        assert clustering.topic_clusters("v1", mat, 3) is first
+    assert clustering.topic_clusters("v1", mat, 2) is not first
+
+
+def test_k_sweep_silhouette_peaks_at_true_k():
+    for minibatch in (True, False):
+        sweep = clustering.k_sweep(_blobs(), ks=range(2, 7), max_workers=2, minibatch=minibatch)
+        assert sweep["k"].tolist()==[2, 3, 4, 5, 6]
+        assert sweep.loc[sweep["silhouette"].idxmax(), "k"]==3
+        assert sweep["inertia"].is_monotonic_decreasing
+
+
+def test_respondent_sweep_on_capped_sample(company):
+    name, _ = company
+    assert clustering.respondent_sample(name, TOPIC_IDS, ROLES, n=20).shape==(20, len(TOPIC_IDS))
+    sweep = clustering.respondent_sweep(name, TOPIC_IDS, ROLES, ks=range(2, 5), sample=20)
+    assert sweep["k"].tolist()==[2, 3, 4] and sweep["silhouette"].between(-1, 1).all()
+    assert clustering.respondent_sweep(name, TOPIC_IDS, ROLES, ks=range(2, 5), sample=20) is sweep
@@ -0,0 +1,59 @@
+# tests/test_export.py
+# -*- coding: utf-8 -*-
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+import export
+import storage
+
+
+@pytest.fixture
+def export_dir(data_dir, monkeypatch):
+    monkeypatch.setattr(export, "EXPORT_DIR", data_dir/"exports")
+    export.EXPORT_DIR.mkdir()
+    return export.EXPORT_DIR
+
+
+def _fake(folder, key, age_s):
+    for name in (f"{key}.csv", f"{key}.json"):
+        p = folder/name; p.write_text("x"); t = time.time()-age_s; os.utime(p, (t, t))
+
+
+def test_prune_by_age_and_count(export_dir, monkeypatch):
+    monkeypatch.setattr(export, "MAX_FILES", 3)
+    _fake(export_dir, "old", export.MAX_AGE_S+60)
+    for i in range(4): _fake(export_dir, f"k{i}", export.MIN_AGE_S+60*(i+1))
+    _fake(export_dir, "fresh", 5)
+    (export_dir/"old.csv.123.tmp").write_text("x"); t = time.time()-export.MAX_AGE_S-60; os.utime(export_dir/"old.csv.123.tmp", (t, t))
+    assert export.prune()==3
+    assert sorted(p.name for p in export_dir.iterdir())==sorted(f"{k}.{e}" for k in ("fresh", "k0", "k1") for e in ("csv", "json"))
+
+
+def test_export_reuses_and_prunes(export_dir, monkeypatch):
+    storage.append_records("A", [{"timestamp": "2025-01-01", "company": "A", "role": "r", "t1_adj": 4}])
+    _fake(export_dir, "stale", export.MAX_AGE_S+60)
+    flt = export.ExportFilter(companies=("A",))
+    path, rows = export.export(flt)
+    assert rows==1 and len(pd.read_csv(path, encoding="utf-8-sig"))==1
+    assert not (export_dir/"stale.csv").exists()
+    assert export.export(flt)==(path, 1)
+
+
+def test_file_name_only_marks_real_filters():
+    full = tuple(range(1, 41))
+    assert export.file_name(export.ExportFilter(companies=("A",), survey="asset_management@1"))=="A_responses.csv"
+    assert export.file_name(export.ExportFilter(companies=("A", "B"), topic_ids=full, fmt="xlsx"))=="all_companies_responses.xlsx"
+    assert export.file_name(export.ExportFilter(companies=("A",), topic_ids=full[:10]))=="A_responses_filtered.csv"
+    assert export.file_name(export.ExportFilter(companies=("A",), roles=("مدیران ارشد",)))=="A_responses_filtered.csv"
+
+
+def test_openpyxl_not_imported_eagerly():
+    code = "import sys, export; print('openpyxl' in sys.modules, export.EXCEL_OK)"
+    out = subprocess.run([sys.executable, "-c", code], cwd=Path(export.__file__).parent, capture_output=True, text=True)
+    assert out.stdout.split()==["False", "True"]
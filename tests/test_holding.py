@@ -0,0 +1,26 @@
+# tests/test_holding.py
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+
+import aggregates
+import holding
+import scoring
+from conftest import TOPIC_IDS
+
+
+def test_target_does_not_recompute(company, monkeypatch):
+    company, _ = company
+    low = holding.score_company(company, TOPIC_IDS, 20)
+    monkeypatch.setattr(aggregates, "get", lambda *a, **k: pytest.fail("recomputed for a new target"))
+    high = holding.score_company(company, TOPIC_IDS, 60)
+    assert high["org_series"] is low["org_series"] and high["version"]==low["version"] and high["weighted"] is False
+    assert high["pass_rate"]==scoring.pass_rate(low["org_series"], 60)
+    assert low["pass_rate"]==scoring.pass_rate(low["org_series"], 20)>high["pass_rate"]
+
+
+def test_weighted_is_part_of_the_key(company):
+    company, _ = company
+    plain = holding.score_company(company, TOPIC_IDS, 45)
+    weighted = holding.score_company(company, TOPIC_IDS, 45, weighted=True)
+    assert weighted["weighted"] is True and not np.allclose(plain["org_series"], weighted["org_series"])
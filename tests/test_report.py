@@ -0,0 +1,24 @@
+# tests/test_report.py
+# -*- coding: utf-8 -*-
+import report
+
+
+class _Fig:
+    def to_html(self, **kw): return "<div></div>"
+    def write_image(self, path, **kw): path.write_bytes(b"img")
+
+
+def test_rerun_with_fewer_formats_removes_dropped_outputs(tmp_path, monkeypatch):
+    monkeypatch.setattr(report, "KALEIDO_OK", True)
+    out = tmp_path/"A"; figs = {"a": _Fig(), "b": _Fig()}
+    assert sorted(report._write(out, "A", figs, ("html", "png"), ""))==["01.png", "02.png", "index.html"]
+    (out/"notes.txt").write_text("x")
+    assert report._write(out, "A", figs, ("html",), "")==["index.html"]
+    assert sorted(p.name for p in out.iterdir())==["index.html", "notes.txt"]
+
+
+def test_target_is_an_integer(monkeypatch):
+    got = {}
+    monkeypatch.setattr(report, "run", lambda *a: got.update(target=a[2]) or {})
+    report.main(["--target", "50"])
+    assert got["target"]==50 and isinstance(got["target"], int)
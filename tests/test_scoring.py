@@ -0,0 +1,66 @@
+# tests/test_scoring.py
+# -*- coding: utf-8 -*-
+import numpy as np
+import pandas as pd
+import pytest
+
+import scoring
+from survey_config import NORM_WEIGHTS, ROLE_MAP_EN2FA, ROLES
+
+TOPIC_IDS = list(range(1, 41))
+
+
+@pytest.fixture
+def frame():
+    """Raw responses: one role absent, scattered blank answers, a topic nobody answered."""
+    rng = np.random.default_rng(7); rows = []
+    for i in range(60):
+        r = {"role": ROLES[i%4]}   # ROLES[4] has no responses
+        for t in TOPIC_IDS:
+            adj = float(rng.choice([0, 1, 3, 5, 7, 10])*rng.integers(0, 5))
+            r[f"t{t}_adj"] = np.nan if t==40 or rng.random()<0.1 else adj
+        rows.append(r)
+    return pd.DataFrame(rows)
+
+
+def _baseline(df, target):
+    """The dashboard's original per-topic loops (org_weighted_topic / simple means)."""
+    df = df.copy()
+    for t in TOPIC_IDS:
+        c = f"t{t}_adj"; df[c] = df[c].apply(lambda x: (x/40)*100 if pd.notna(x) else np.nan)
+    role_means = {}
+    for r in ROLES:
+        sub = df[df["role"]==r]
+        role_means[r] = [sub[f"t{t}_adj"].mean() if not sub.empty else np.nan for t in TOPIC_IDS]
+    def org_weighted_topic(topic_id):
+        num = 0.; den = 0.
+        for en_key, weight in NORM_WEIGHTS.get(topic_id, {}).items():
+            v = role_means.get(ROLE_MAP_EN2FA[en_key], [])[topic_id-1]
+            if pd.notna(v): num += weight*v; den += weight
+        return np.nan if den==0 else num/den
+    org = [org_weighted_topic(t) for t in TOPIC_IDS]
+    simple = []
+    for i in range(len(TOPIC_IDS)):
+        vals = [role_means[r][i] for r in ROLES if pd.notna(role_means[r][i])]
+        simple.append(np.nanmean(vals) if vals else np.nan)
+    return {"org_series": org, "org_avg": float(np.nanmean(org)),
+            "pass_rate": np.mean([1 if v>=target else 0 for v in org if pd.notna(v)])*100,
+            "simple_means": simple, "best_idx": int(np.nanargmax(simple)), "worst_idx": int(np.nanargmin(simple))}
+
+
+@pytest.mark.parametrize("target", [30, 45])
+def test_summarize_matches_baseline(frame, target):
+    means = scoring.role_means_from_df(frame, TOPIC_IDS)
+    got = scoring.summarize(means, scoring.weight_matrix(TOPIC_IDS), target)
+    want = _baseline(frame, target)
+    assert np.allclose(got["org_series"], want["org_series"], equal_nan=True)
+    assert np.allclose(got["simple_means"], want["simple_means"], equal_nan=True)
+    assert np.isnan(got["org_series"][-1])
+    assert got["org_avg"]==pytest.approx(want["org_avg"])
+    assert got["pass_rate"]==pytest.approx(want["pass_rate"])
+    assert (got["best_idx"], got["worst_idx"])==(want["best_idx"], want["worst_idx"])
+
+
+def test_summarize_empty():
+    got = scoring.summarize(np.full((len(ROLES), 3), np.nan), scoring.weight_matrix([1, 2, 3]), 45)
+    assert got["org_avg"]==0.0 and got["pass_rate"]==0 and got["best_idx"] is None
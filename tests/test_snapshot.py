@@ -0,0 +1,104 @@
+# tests/test_snapshot.py
+# -*- coding: utf-8 -*-
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pandas as pd
+import pytest
+
+import snapshot
+import storage
+from conftest import make_records
+from survey_config import DEFAULT_SURVEY
+
+TOPICS = [1, 2]
+
+
+def _registry(company):
+    conn = storage.connect(company)
+    try:
+        snapshot._ensure_tables(conn)
+        return snapshot._parts(conn), [r[0] for r in conn.execute("SELECT name FROM snapshot_retired ORDER BY name")]
+    finally:
+        conn.close()
+
+
+def _append(n, seed, **kw):
+    storage.append_records("A", make_records(n, seed, topics=TOPICS, **kw))
+
+
+def test_parts_cover_consecutive_ids(data_dir):
+    for k, n in enumerate((3, 2, 4)):
+        _append(n, k); assert snapshot.refresh("A")
+    assert not snapshot.refresh("A")   # nothing new
+    parts, _ = _registry("A")
+    assert [(a, b) for _, a, b in parts]==[(1, 3), (4, 5), (6, 9)]
+    assert all((snapshot.snapshot_dir("A")/name).exists() for name, _, _ in parts)
+    assert snapshot.read("A", ["respondent", "t1_adj"])["t1_adj"].tolist()==storage.read_responses("A")["t1_adj"].astype(int).tolist()
+
+
+def test_compaction_swaps_and_retires_parts(data_dir, monkeypatch):
+    monkeypatch.setattr(snapshot, "MAX_PARTS", 2)
+    for k in range(3): _append(2, k); snapshot.refresh("A")   # third part triggers compaction
+    parts, retired = _registry("A")
+    assert [(a, b) for _, a, b in parts]==[(1, 6)] and len(retired)==3
+    folder = snapshot.snapshot_dir("A")
+    assert all((folder/n).exists() for n in retired)   # kept for readers during the grace period
+    assert not list(folder.glob("*.tmp"))
+    assert len(snapshot.read("A", ["role"]))==6
+
+    monkeypatch.setattr(snapshot, "RETIRE_SECONDS", -1)   # grace period over: the next compaction deletes them
+    for k in range(3, 5): _append(1, k); snapshot.refresh("A")
+    parts, retired = _registry("A")
+    assert [(a, b) for _, a, b in parts]==[(1, 8)] and retired==[]
+    assert [p.name for p in folder.glob("part-*.parquet")]==[parts[0][0]]
+
+
+def test_compaction_backs_off_when_parts_change(data_dir, monkeypatch):
+    for k in range(2): _append(2, k); snapshot.refresh("A")
+    write_tmp = snapshot._write_tmp
+    def racing(folder, table):   # another writer adds a part while the merged file is being written
+        monkeypatch.setattr(snapshot, "_write_tmp", write_tmp)
+        tmp = write_tmp(folder, table); _append(1, 9); snapshot.refresh("A"); return tmp
+    monkeypatch.setattr(snapshot, "_write_tmp", racing)
+    assert not snapshot.compact("A")
+    parts, retired = _registry("A")
+    assert [(a, b) for _, a, b in parts]==[(1, 2), (3, 4), (5, 5)] and retired==[]
+    assert not list(snapshot.snapshot_dir("A").glob("*.tmp"))
+    assert len(snapshot.read("A", ["role"]))==5
+
+
+def test_rebuilt_store_starts_over(data_dir):
+    _append(5, 1); snapshot.refresh("A")
+    storage.db_path("A").unlink()
+    _append(2, 2); snapshot.refresh("A")
+    parts, _ = _registry("A")
+    assert [(a, b) for _, a, b in parts]==[(1, 2)] and len(list(snapshot.snapshot_dir("A").glob("part-*")))==1
+
+
+def test_compact_dtypes(data_dir):
+    _append(4, 1)
+    assert snapshot.refresh("A")
+    (f,) = snapshot.part_files("A")
+    schema = pq.read_schema(f)
+    assert schema.field("t1_maturity").type==pa.int8() and schema.field("t2_rel").type==pa.int8()
+    assert schema.field("t1_adj").type==pa.int16() and pa.types.is_dictionary(schema.field("role").type)
+    df = snapshot.read("A", ["role", "t1_maturity", "t1_adj", "missing_col"])
+    assert df["t1_maturity"].dtype==np.int8 and df["t1_adj"].dtype==np.int16 and df["role"].dtype=="category"
+    assert df["missing_col"].isna().all()
+    frame = snapshot.compact_dtypes(storage.read_responses("A").assign(t1_adj=[1, None, 3, 4]))
+    assert frame["t1_adj"].dtype==np.float32 and frame["t2_adj"].dtype==np.int16
+
+
+@pytest.mark.parametrize("batch", [None, 2])
+def test_survey_filter(data_dir, batch):
+    _append(3, 1)                                  # untagged (legacy) rows belong to the default survey
+    _append(2, 2, survey=DEFAULT_SURVEY)
+    _append(4, 3, survey="safety@2")
+    def rows(survey, columns):
+        if batch is None: return snapshot.read("A", columns, survey=survey)
+        return pd.concat(list(snapshot.iter_batches("A", columns, batch, survey=survey)))
+    assert len(rows(DEFAULT_SURVEY, ["role"]))==5 and len(rows("safety@2", ["role"]))==4
+    assert list(rows("safety@2", ["role"]).columns)==["role"]   # the filter column is not returned unless asked
+    assert set(rows("safety@2", ["role", "survey"])["survey"].astype(str))=={"safety@2"}
+    assert len(rows(None, ["role"]))==9
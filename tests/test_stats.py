@@ -0,0 +1,76 @@
+# tests/test_stats.py
+# -*- coding: utf-8 -*-
+from collections import OrderedDict
+
+import numpy as np
+import pytest
+
+import aggregates
+import scoring
+import stats
+import storage
+from conftest import TOPIC_IDS, make_records
+from survey_config import ROLES, get_survey
+
+
+@pytest.fixture(autouse=True)
+def cold_cache(monkeypatch):
+    monkeypatch.setattr(stats, "_CACHE", OrderedDict())
+
+
+def _point(name, weighted=False):
+    agg = aggregates.get(name)
+    means = scoring.role_means_from_aggregates(agg, TOPIC_IDS, ROLES)
+    W = scoring.weight_matrix(TOPIC_IDS)
+    if weighted: W = scoring.count_weighted(W, aggregates.role_topic_counts(agg, ROLES, TOPIC_IDS))
+    return means, scoring.summarize(means, W, 45)
+
+
+def test_intervals_contain_point_estimate(company):
+    name, _ = company
+    boot = stats.resample(name, TOPIC_IDS, ROLES, n_boot=200)
+    iv = stats.intervals(boot, scoring.weight_matrix(TOPIC_IDS), 45)
+    means, kp = _point(name)
+    lo, hi = iv["role"]; ok = np.isfinite(means)
+    assert ((lo[ok]<=means[ok]+1e-9) & (means[ok]<=hi[ok]+1e-9)).mean()>0.95
+    assert iv["org_avg"][0]<=kp["org_avg"]<=iv["org_avg"][1]
+    assert boot["n"].sum()==90 and iv["low_sample"].tolist()==(boot["n"]<stats.MIN_N).tolist()
+
+
+def test_weighted_intervals_follow_count_weighting(company):
+    name, _ = company
+    boot = stats.resample(name, TOPIC_IDS, ROLES, n_boot=200)
+    W = scoring.weight_matrix(TOPIC_IDS)
+    plain, weighted = stats.intervals(boot, W, 45), stats.intervals(boot, W, 45, weighted=True)
+    _, kp = _point(name, weighted=True)
+    assert weighted["org_avg"][0]<=kp["org_avg"]<=weighted["org_avg"][1]
+    assert not np.allclose(plain["org"][0], weighted["org"][0])
+
+
+def test_same_seed_same_samples(company):
+    name, _ = company
+    a = stats.resample(name, TOPIC_IDS[:5], ROLES, n_boot=120)
+    stats.clear_cache()
+    b = stats.resample(name, TOPIC_IDS[:5], ROLES, n_boot=120, max_workers=1)
+    assert a is not b and np.array_equal(a["means"], b["means"], equal_nan=True)
+
+
+def test_cache_invalidated_by_append(company):
+    name, _ = company
+    a = stats.resample(name, TOPIC_IDS[:5], ROLES, n_boot=50)
+    assert stats.resample(name, TOPIC_IDS[:5], ROLES, n_boot=50) is a
+    storage.append_records(name, make_records(1, seed=9, roles=ROLES[1:2]))
+    b = stats.resample(name, TOPIC_IDS[:5], ROLES, n_boot=50)
+    assert b is not a and b["n"][1]==a["n"][1]+1
+
+
+def test_max_n_cap_rescales_counts(data_dir, monkeypatch):
+    monkeypatch.setattr(stats, "MAX_N", 20)
+    storage.append_records("A", make_records(60, seed=1, roles=ROLES[:1], levels=(1, 2, 3, 4))
+                           +make_records(10, seed=2, roles=ROLES[1:2]))
+    mats, n = stats._role_matrices("A", TOPIC_IDS[:3], ROLES[:2], get_survey())
+    assert [len(X) for X in mats]==[20, 10] and n.tolist()==[60, 10]
+    boot = stats.resample("A", TOPIC_IDS[:3], ROLES[:2], n_boot=400)
+    assert boot["n"].tolist()==[60, 10]
+    avg = boot["counts"].mean(axis=0)   # Poisson(1) weights: expected count = respondents answering
+    assert avg[0]==pytest.approx(np.full(3, 60), rel=0.1) and avg[1]==pytest.approx(np.full(3, 10), rel=0.15)
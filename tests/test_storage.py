@@ -0,0 +1,83 @@
+# tests/test_storage.py
+# -*- coding: utf-8 -*-
+import contextlib
+
+import numpy as np
+import pandas as pd
+
+import aggregates
+import scoring
+import storage
+import trends
+from conftest import TOPIC_IDS, make_records
+
+
+def test_aggregates_match_full_recompute(data_dir):
+    batches = [make_records(25, 1), make_records(1, 2), make_records(40, 3, topics=range(1, 21)), make_records(7, 4)]
+    for k, recs in enumerate(batches):
+        if k%2: storage.append_response("A", recs[0]) if len(recs)==1 else storage.append_records("A", recs)
+        else: storage.append_frame("A", pd.DataFrame(recs))
+        agg = aggregates.get("A")   # folded incrementally after each append
+        df = storage.read_responses("A")
+        assert agg["total"]==len(df)
+        assert agg["n"]=={r: int(v) for r, v in df["role"].value_counts().items()}
+        want = scoring.role_means_from_df(df, TOPIC_IDS)
+        assert np.allclose(scoring.role_means_from_aggregates(agg, TOPIC_IDS), want, equal_nan=True)
+
+
+def test_aggregates_cached_until_append(data_dir):
+    storage.append_records("A", make_records(5, 1))
+    agg = aggregates.get("A")
+    assert aggregates.get("A") is agg
+    storage.append_records("A", make_records(1, 2))
+    assert aggregates.get("A")["total"]==6
+
+
+def _write_csv(data_dir, recs):
+    folder = data_dir/"data"/"A"; folder.mkdir(parents=True, exist_ok=True)
+    pd.DataFrame(recs).to_csv(folder/storage.CSV_NAME, index=False)
+    return folder
+
+
+def test_migrate_csv_into_new_db(data_dir):
+    folder = _write_csv(data_dir, make_records(3, 1))
+    assert storage.data_version("A")[1]==3
+    assert not (folder/storage.CSV_NAME).exists() and (folder/(storage.CSV_NAME+".migrated")).exists()
+    df = storage.read_responses("A")
+    assert len(df)==3 and pd.to_numeric(df["t1_adj"]).notna().all()
+
+
+def test_migrate_csv_into_non_empty_db(data_dir):
+    storage.append_records("A", make_records(2, 1))
+    _write_csv(data_dir, make_records(3, 2))
+    assert storage.count_responses("A")==5
+
+
+def test_migrate_csv_same_file_once(data_dir):
+    recs = make_records(3, 1)
+    folder = _write_csv(data_dir, recs)
+    storage.connect("A").close()
+    # e.g. a crash between COMMIT and the rename: the file is back, but already imported
+    (folder/(storage.CSV_NAME+".migrated")).rename(folder/storage.CSV_NAME)
+    assert storage.count_responses("A")==3
+    assert not (folder/storage.CSV_NAME).exists()
+
+
+def test_submit_stores_and_folds(data_dir):
+    spans = []
+    storage.submit("A", make_records(1, 1)[0], stage=lambda name: spans.append(name) or contextlib.nullcontext())
+    storage.submit("A", make_records(1, 2)[0])
+    assert spans==["submit_store", "submit_aggregates"]
+    conn = storage.connect("A")
+    try: assert conn.execute("SELECT last_id FROM agg_state WHERE name=?", (aggregates.WATERMARK,)).fetchone()[0]==2
+    finally: conn.close()
+    assert aggregates.get("A")["total"]==2
+
+
+def test_data_version_ignores_derived_tables(data_dir):
+    storage.append_records("A", make_records(3, 1))
+    v = storage.data_version("A")
+    aggregates.get("A"); trends.months("A")
+    assert storage.data_version("A")==v
+    storage.append_records("A", make_records(1, 2))
+    assert storage.data_version("A")==(v[0], v[1]+1)
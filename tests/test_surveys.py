@@ -0,0 +1,58 @@
+# tests/test_surveys.py
+# -*- coding: utf-8 -*-
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import aggregates, holding, scoring, storage, trends
+from conftest import make_records
+from survey_config import DEFAULT_SURVEY, ROLE_COLORS, get_survey
+
+TOPICS = 12
+ROLES_X = ["مدیر", "کارشناس", "اپراتور"]
+
+
+@pytest.fixture
+def safety(data_dir):
+    spec = {"title": "ایمنی", "topics": [{"id": i, "name": f"موضوع {i}", "desc": ""} for i in range(1, TOPICS+1)],
+            "roles": [{"name": "مدیر", "en": "Manager", "color": "#ff0000"}, {"name": "کارشناس", "color": "#00ff00"}, "اپراتور"],
+            "level_options": [["کم", 1], ["متوسط", 2], ["زیاد", 3]], "rel_options": [["کم", 1], ["زیاد", 2]],
+            "weights": {str(i): {"Manager": 0.5, "کارشناس": 0.3, "اپراتور": 0.2} for i in range(1, TOPICS+1)}}
+    (data_dir/"surveys"/"safety@2.json").write_text(json.dumps(spec, ensure_ascii=False), encoding="utf-8")
+    return get_survey("safety@2")
+
+
+def test_compile_non_default_survey(safety):
+    assert safety.topic_ids==tuple(range(1, TOPICS+1)) and safety.roles==tuple(ROLES_X)
+    assert safety.weights.shape==(TOPICS, 3) and safety.max_adj==6.0
+    assert np.allclose(safety.weights[0], [0.5, 0.3, 0.2])   # "Manager" resolved through the English alias
+    assert safety.role_colors=={"مدیر": "#ff0000", "کارشناس": "#00ff00"}
+    assert not set(ROLES_X) & set(ROLE_COLORS)   # compiling does not touch the shared default palette
+
+
+def test_pipeline_keeps_surveys_apart(safety):
+    default = make_records(20, seed=1)
+    safety_recs = lambda n, month, seed: make_records(n, seed, ROLES_X, range(1, TOPICS+1), (1, 2, 3), (1, 2), month, "safety@2")
+    rows = safety_recs(15, 1, 2)+safety_recs(10, 3, 3)
+    storage.append_records("A", default+rows)
+    assert aggregates.surveys("A")==[DEFAULT_SURVEY, "safety@2"]
+
+    agg = aggregates.get("A", safety)
+    assert agg["total"]==25 and agg["topics"]==list(range(1, TOPICS+1)) and set(agg["roles"])<=set(ROLES_X)
+    assert aggregates.get("A")["total"]==20
+
+    df = pd.DataFrame(rows); W = scoring.weight_matrix(safety.topic_ids, ROLES_X, safety)
+    expected = scoring.summarize(scoring.role_means_from_df(df, safety.topic_ids, ROLES_X, safety), W, 45)
+    res = holding.score_company("A", safety.topic_ids, 45, survey=safety)
+    assert res["n"]==25
+    assert np.allclose(res["org_series"], expected["org_series"], equal_nan=True)
+    assert res["org_avg"]==pytest.approx(expected["org_avg"])
+
+    assert trends.months("A", safety)==["2025-01", "2025-03"]
+    tr = trends.trend("A", safety.topic_ids, ROLES_X, 45, survey=safety)
+    assert tr["تعداد پاسخ"].tolist()==[15, 10]
+    jan = df.iloc[:15]
+    first = scoring.summarize(scoring.role_means_from_df(jan, safety.topic_ids, ROLES_X, safety), W, 45)
+    assert tr["میانگین سازمان"].iloc[0]==pytest.approx(first["org_avg"])
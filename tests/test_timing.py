@@ -0,0 +1,55 @@
+# tests/test_timing.py
+# -*- coding: utf-8 -*-
+import json
+from collections import OrderedDict, deque
+
+import pytest
+
+import timing
+
+
+@pytest.fixture
+def sinks(tmp_path, monkeypatch):
+    """Fresh process-wide metrics state writing to a JSONL log and a Prometheus textfile under ``tmp_path``."""
+    monkeypatch.setattr(timing, "HISTORY", deque(maxlen=timing.HISTORY_SIZE))
+    monkeypatch.setattr(timing, "_TOTALS", {})
+    monkeypatch.setattr(timing, "_SESSIONS", OrderedDict())
+    monkeypatch.setattr(timing, "_RUNS", [0])
+    monkeypatch.setattr(timing, "METRICS_LOG", str(tmp_path/"runs.jsonl"))
+    monkeypatch.setattr(timing, "PROM_FILE", str(tmp_path/"survey.prom"))
+    return tmp_path
+
+
+def _run(session, spans=("load", "load", "charts")):
+    t = timing.RunTimer(enabled=True, measure_payload=True); t.session = session
+    for name in spans:
+        with t.stage(name): pass
+    t.payload("radar", 1200); t.mark("render")
+    return t
+
+
+def test_spans_reach_jsonl_and_prometheus(sinks):
+    t = _run("s1")
+    assert t.spans["load"][0]==2 and t.spans["charts"][0]==1
+    assert timing.record(t) is not None and timing.record(t) is None   # once per run
+    timing.record(_run("s2", spans=("load",)))
+    rows = [json.loads(line) for line in (sinks/"runs.jsonl").read_text(encoding="utf-8").splitlines()]
+    assert [r["session"] for r in rows]==["s1", "s2"]
+    assert set(rows[0]["spans"])=={"load", "charts"} and set(rows[0]["stages"])=={"render"}
+    assert rows[0]["payload_bytes"]=={"radar": 1200}
+    prom = dict(line.rsplit(" ", 1) for line in (sinks/"survey.prom").read_text(encoding="utf-8").splitlines()
+                if not line.startswith("#"))
+    assert prom["survey_runs_total"]=="2" and prom["survey_sessions"]=="2"
+    assert prom['survey_span_ms_count{span="load"}']=="3" and prom['survey_span_ms_count{span="charts"}']=="1"
+    assert float(prom['survey_payload_bytes_sum{name="radar"}'])==2400 and prom['survey_stage_ms_count{stage="render"}']=="2"
+    assert float(prom['survey_span_ms_sum{span="load"}'])>=0
+    assert {r["name"] for r in timing.summary() if r["kind"]=="span"}=={"load", "charts"}
+
+
+def test_history_and_sessions_are_capped(sinks, monkeypatch):
+    monkeypatch.setattr(timing, "HISTORY", deque(maxlen=3))
+    monkeypatch.setattr(timing, "SESSIONS_SIZE", 4)
+    for i in range(10): timing.record(_run(f"s{i}"))
+    timing.record(_run("s6"))
+    assert len(timing.HISTORY)==3 and list(timing._SESSIONS)==["s7", "s8", "s9", "s6"]
+    assert "survey_sessions 4" in (sinks/"survey.prom").read_text(encoding="utf-8").splitlines()
@@ -0,0 +1,40 @@
+# tests/test_trends.py
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+
+import aggregates
+import scoring
+import trends
+from conftest import TOPIC_IDS
+from survey_config import ROLES
+
+
+def test_org_average_ignores_role_filter(company):
+    name, df = company
+    full = trends.trend(name, TOPIC_IDS, ROLES, 45)
+    part = trends.trend(name, TOPIC_IDS, ROLES[:2], 45)
+    assert np.allclose(full["میانگین سازمان"], part["میانگین سازمان"])
+    assert np.allclose(full["نرخ عبور از هدف"], part["نرخ عبور از هدف"])
+    assert [c for c in part.columns if c in ROLES]==ROLES[:2]
+    jan = df[df["timestamp"].str.startswith("2025-01")]
+    want = scoring.summarize(scoring.role_means_from_df(jan, TOPIC_IDS), scoring.weight_matrix(TOPIC_IDS), 45)
+    assert full["میانگین سازمان"].iloc[0]==pytest.approx(want["org_avg"])
+
+
+def test_window_means_exact_months(company):
+    name, df = company
+    got, n = trends.window_means(name, TOPIC_IDS, ROLES, month_set=["2025-01", "2025-03"])
+    sub = df[~df["timestamp"].str.startswith("2025-02")]
+    assert np.allclose(got, scoring.role_means_from_df(sub, TOPIC_IDS), equal_nan=True)
+    assert sum(n.values())==60
+    ranged, _ = trends.window_means(name, TOPIC_IDS, ROLES, "2025-01", "2025-03")
+    assert not np.allclose(got, ranged, equal_nan=True)
+
+
+def test_window_counts_match_aggregates(company):
+    name, df = company
+    got = trends.window_counts(name, TOPIC_IDS, ROLES, month_set=["2025-02"])
+    assert got[ROLES.index(ROLES[0])].sum()==(df["timestamp"].str.startswith("2025-02")&(df["role"]==ROLES[0])).sum()*len(TOPIC_IDS)
+    full = trends.window_counts(name, TOPIC_IDS, ROLES)
+    assert np.array_equal(full, aggregates.role_topic_counts(aggregates.get(name), ROLES, TOPIC_IDS))
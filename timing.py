@@ -0,0 +1,187 @@
+# timing.py
+# -*- coding: utf-8 -*-
+"""Startup / rerun timing, hot-path profiling and lazy imports (no Streamlit import).
+
+The module is imported once per server process, so ``PROCESS_T0`` and the first
+registered run describe the cold start; every later script run is a warm rerun.
+
+Profiling (``RunTimer.stage`` spans, per-run history) is on unless ``SURVEY_PROFILE=0``;
+when off, ``stage`` returns a shared null context and the other hooks return immediately.
+Figure payload sizes cost an extra ``fig.to_json()`` per chart, so they are measured only
+with ``SURVEY_PROFILE_PAYLOAD=1`` or when switched on per run (``RunTimer.measure_payload``). Finished runs can also be appended to a JSONL log
+(``SURVEY_METRICS_LOG=path``) and/or summarized in a Prometheus textfile
+(``SURVEY_METRICS_PROM=path``, for node_exporter's textfile collector).
+"""
+import contextlib
+import importlib
+import importlib.util
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+
+PROCESS_T0 = time.perf_counter()
+IMPORT_MS:dict = {}
+_first_run = None
+
+ENABLED = os.environ.get("SURVEY_PROFILE", "1").strip().lower() not in ("0", "off", "false", "no")
+PAYLOAD = os.environ.get("SURVEY_PROFILE_PAYLOAD", "0").strip().lower() in ("1", "on", "true", "yes")
+METRICS_LOG = os.environ.get("SURVEY_METRICS_LOG") or None
+PROM_FILE = os.environ.get("SURVEY_METRICS_PROM") or None
+HISTORY_SIZE = 500
+SESSIONS_SIZE = 10_000   # distinct session ids remembered for the sessions gauge
+
+HISTORY:deque = deque(maxlen=HISTORY_SIZE)   # recent finished runs of this process
+_TOTALS:dict = {}                             # ("stage"|"span"|"payload", name) -> [count, sum]
+_SESSIONS:OrderedDict = OrderedDict()        # session id -> None, least recently seen first
+_RUNS = [0]
+_METRICS_LOCK = threading.Lock()
+_NULL = contextlib.nullcontext()
+
+
+def lazy_import(name:str):
+    """Import ``name`` on first use and remember how long that took."""
+    mod = sys.modules.get(name)
+    if mod is not None: return mod
+    t0 = time.perf_counter()
+    mod = importlib.import_module(name)
+    IMPORT_MS[name] = (time.perf_counter()-t0)*1000
+    return mod
+
+
+def module_available(name:str)->bool:
+    """True if ``name`` can be imported, without importing it."""
+    if name in sys.modules: return True
+    try: return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError): return False
+
+
+class _Span:
+    __slots__ = ("timer", "name", "t0")
+
+    def __init__(self, timer, name:str):
+        self.timer = timer; self.name = name
+
+    def __enter__(self):
+        self.t0 = time.perf_counter(); return self
+
+    def __exit__(self, *exc):
+        acc = self.timer.spans.setdefault(self.name, [0, 0.0])
+        acc[0] += 1; acc[1] += (time.perf_counter()-self.t0)*1000
+        return False
+
+
+def payload_bytes(fig)->int:
+    """Size of the JSON sent to the browser for a plotly figure (memoized on the figure object)."""
+    n = getattr(fig, "_payload_bytes", None)
+    if n is None:
+        n = len(fig.to_json().encode("utf-8")); fig._payload_bytes = n
+    return n
+
+
+class RunTimer:
+    """Named checkpoints (ms since the start of one script run) plus optional profiling spans."""
+    def __init__(self, t0:float|None=None, enabled:bool|None=None, measure_payload:bool|None=None):
+        self.t0 = time.perf_counter() if t0 is None else t0
+        self.marks:list = []
+        self.enabled = ENABLED if enabled is None else enabled
+        self.measure_payload = PAYLOAD if measure_payload is None else measure_payload
+        self.spans:dict = {}      # name -> [calls, ms]
+        self.payloads:dict = {}   # name -> [items, bytes]
+        self.session = None; self.rerun = 0; self.recorded = False
+
+    def mark(self, name:str)->None:
+        self.marks.append((name, (time.perf_counter()-self.t0)*1000))
+
+    def stage(self, name:str):
+        """Context manager adding the block's wall time to span ``name`` (spans may repeat and nest)."""
+        return _Span(self, name) if self.enabled else _NULL
+
+    def payload(self, name:str, fig)->None:
+        """Count the serialized size of ``fig`` (or an int of bytes) under ``name`` (only with ``measure_payload``)."""
+        if not (self.enabled and self.measure_payload): return
+        acc = self.payloads.setdefault(name, [0, 0])
+        acc[0] += 1; acc[1] += fig if isinstance(fig, int) else payload_bytes(fig)
+
+    @property
+    def total_ms(self)->float:
+        return self.marks[-1][1] if self.marks else 0.0
+
+    def stages(self)->list:
+        """(name, ms spent since the previous checkpoint)."""
+        out = []; prev = 0.0
+        for name, at in self.marks:
+            out.append((name, at-prev)); prev = at
+        return out
+
+
+def register_run(timer:RunTimer)->bool:
+    """Record a script run; returns True for the first (cold) run of this process."""
+    global _first_run
+    if _first_run is None:
+        _first_run = timer; return True
+    return False
+
+
+def cold_start()->RunTimer|None:
+    return _first_run
+
+
+# ---------- run history / metrics sinks ----------
+def record(timer:RunTimer)->dict|None:
+    """Add a finished run to the history and the optional JSONL / Prometheus sinks (once per run)."""
+    if not timer.enabled or timer.recorded: return None
+    timer.recorded = True
+    row = {"ts": round(time.time(), 3), "session": timer.session, "rerun": timer.rerun, "total_ms": round(timer.total_ms, 2),
+           "stages": {n: round(ms, 2) for n, ms in timer.stages()},
+           "spans": {n: round(v[1], 2) for n, v in timer.spans.items()},
+           "payload_bytes": {n: v[1] for n, v in timer.payloads.items()}}
+    with _METRICS_LOCK:
+        HISTORY.append(row); _RUNS[0] += 1
+        _SESSIONS[timer.session] = None; _SESSIONS.move_to_end(timer.session)
+        while len(_SESSIONS)>SESSIONS_SIZE: _SESSIONS.popitem(last=False)
+        for kind, items in (("stage", [(n, 1, ms) for n, ms in timer.stages()]),
+                            ("span", [(n, c, ms) for n, (c, ms) in timer.spans.items()]),
+                            ("payload", [(n, c, b) for n, (c, b) in timer.payloads.items()])):
+            for n, c, v in items:
+                acc = _TOTALS.setdefault((kind, n), [0, 0.0]); acc[0] += c; acc[1] += v
+        if METRICS_LOG:
+            with open(METRICS_LOG, "a", encoding="utf-8") as fh: fh.write(json.dumps(row, ensure_ascii=False)+"\n")
+        if PROM_FILE: _write_prom(PROM_FILE)
+    return row
+
+
+def _prom_label(v:str)->str:
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+
+def _write_prom(path:str)->None:
+    names = {"stage": ("survey_stage_ms", "stage"), "span": ("survey_span_ms", "span"), "payload": ("survey_payload_bytes", "name")}
+    lines = ["# TYPE survey_runs_total counter", f"survey_runs_total {_RUNS[0]}",
+             "# TYPE survey_sessions gauge", f"survey_sessions {len(_SESSIONS)}"]
+    for kind, (metric, label) in names.items():
+        rows = sorted((n, v) for (k, n), v in _TOTALS.items() if k==kind)
+        if not rows: continue
+        lines.append(f"# TYPE {metric} summary")
+        for n, (c, total) in rows:
+            lines += [f'{metric}_sum{{{label}="{_prom_label(n)}"}} {round(total, 3)}', f'{metric}_count{{{label}="{_prom_label(n)}"}} {c}']
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as fh: fh.write("\n".join(lines)+"\n")
+    os.replace(tmp, path)
+
+
+def summary()->list[dict]:
+    """Per stage/span: runs, mean, p50 and p95 ms over the recent history."""
+    with _METRICS_LOCK:
+        rows = list(HISTORY)
+    vals:dict = {}
+    for r in rows:
+        for kind in ("stages", "spans"):
+            for n, ms in r[kind].items(): vals.setdefault((kind[:-1], n), []).append(ms)
+    out = []
+    for (kind, n), v in vals.items():
+        v = sorted(v); q = lambda p: v[min(len(v)-1, int(p*len(v)))]
+        out.append({"kind": kind, "name": n, "runs": len(v), "mean_ms": sum(v)/len(v), "p50_ms": q(0.5), "p95_ms": q(0.95)})
+    return out
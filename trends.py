@@ -0,0 +1,203 @@
+# trends.py
+# -*- coding: utf-8 -*-
+"""Time-windowed maturity history from monthly pre-aggregated buckets.
+
+Each response is folded once (same watermark scheme as :mod:`aggregates`) into
+``trend_cells(survey, period, role, topic)`` running sums/counts, where ``period`` is the
+``YYYY-MM`` month of its ``timestamp``. Quarters, years and named survey waves are
+roll-ups of months, so trend lines and before/after comparisons never rescan raw
+rows and a range query only touches ``months × roles × topics`` bucket rows.
+"""
+import json
+import re
+import threading
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import aggregates
+import scoring
+import storage
+from survey_config import get_survey, survey_key
+
+WAVES_PATH = Path("waves.json")
+WATERMARK = "trend_cells"
+_MONTH = re.compile(r"^\d{4}-(0[1-9]|1[0-2])$")
+
+_CACHE:dict = {}
+_LOCK = threading.Lock()
+
+
+def _ensure_tables(conn)->None:
+    aggregates._ensure_tables(conn)
+    conn.execute("CREATE TABLE IF NOT EXISTS trend_cells (survey TEXT, period TEXT, role TEXT, topic INTEGER, sum REAL, "
+                 "cnt INTEGER, PRIMARY KEY(survey, period, role, topic))")
+    conn.execute("CREATE TABLE IF NOT EXISTS trend_respondents (survey TEXT, period TEXT, role TEXT, n INTEGER, "
+                 "PRIMARY KEY(survey, period, role))")
+
+
+def _fold(conn, chunk:pd.DataFrame, adj:list[str])->None:
+    period = chunk["timestamp"].astype("string").str.slice(0, 7)
+    ok = period.str.match(_MONTH.pattern).fillna(False).to_numpy(dtype=bool)   # rows without a usable date are skipped
+    if not ok.any(): return
+    chunk = chunk[ok]; period = period[ok]
+    vals = chunk[adj].apply(pd.to_numeric, errors="coerce")
+    keys = [aggregates.survey_of(chunk), period.rename("period"), chunk["role"].fillna("").rename("role")]
+    g = vals.groupby(keys, sort=False)
+    sums, cnts, sizes = g.sum(), g.count(), g.size()
+    topic_of = {c:int(aggregates.ADJ_COL.match(c).group(1)) for c in adj}
+    s_long = sums.stack(); c_long = cnts.stack()
+    keep = c_long>0
+    rows = [(sv, p, r, topic_of[c], float(s), int(n))
+            for (sv, p, r, c), s, n in zip(s_long[keep].index, s_long[keep].to_numpy(), c_long[keep].to_numpy())]
+    conn.executemany("INSERT INTO trend_cells(survey,period,role,topic,sum,cnt) VALUES(?,?,?,?,?,?) "
+                     "ON CONFLICT(survey,period,role,topic) DO UPDATE SET sum=sum+excluded.sum, cnt=cnt+excluded.cnt", rows)
+    conn.executemany("INSERT INTO trend_respondents(survey,period,role,n) VALUES(?,?,?,?) "
+                     "ON CONFLICT(survey,period,role) DO UPDATE SET n=n+excluded.n",
+                     [(sv, p, r, int(n)) for (sv, p, r), n in sizes.items()])
+
+
+def refresh(company:str)->None:
+    """Fold rows appended since the last refresh into the monthly buckets."""
+    conn = storage.connect(company)
+    try:
+        _ensure_tables(conn)
+        last_id = conn.execute("SELECT COALESCE(MAX(id),0) FROM responses").fetchone()[0]
+        if aggregates._watermark(conn, WATERMARK)==last_id: return
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            aggregates.drop_legacy(conn, ("trend_buckets", "trend_roles"), "trends")   # untagged predecessors
+            last_id = conn.execute("SELECT COALESCE(MAX(id),0) FROM responses").fetchone()[0]
+            mark = aggregates._watermark(conn, WATERMARK)
+            if mark>last_id:
+                conn.execute("DELETE FROM trend_cells"); conn.execute("DELETE FROM trend_respondents"); mark = 0
+            adj = aggregates.adj_columns(conn)
+            for chunk in aggregates.iter_new_rows(conn, mark, ["timestamp", "survey", "role"]+adj):
+                if chunk.empty: continue
+                _fold(conn, chunk, adj); mark = int(chunk["id"].iloc[-1])
+            aggregates._set_watermark(conn, WATERMARK, mark)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK"); raise
+    finally:
+        conn.close()
+
+
+# ---------- periods ----------
+def load_waves(path=WAVES_PATH)->list[dict]:
+    """Optional survey waves: ``[{"name": "...", "from": "YYYY-MM", "to": "YYYY-MM"}, ...]``."""
+    path = Path(path)
+    if not path.exists(): return []
+    waves = json.loads(path.read_text(encoding="utf-8"))
+    return [w for w in waves if _MONTH.match(str(w.get("from", ""))) and _MONTH.match(str(w.get("to", "")))]
+
+
+def period_of(months:pd.Series, freq:str, waves:list[dict]|None=None)->pd.Series:
+    """Map ``YYYY-MM`` months to month / quarter / year / wave labels (NaN when outside every wave)."""
+    if freq=="month": return months
+    if freq=="year": return months.str.slice(0, 4)
+    if freq=="quarter":
+        q = (months.str.slice(5, 7).astype(int)-1)//3+1
+        return months.str.slice(0, 4)+"-Q"+q.astype(str)
+    if freq=="wave":
+        out = pd.Series(np.nan, index=months.index, dtype=object)
+        for w in waves or []:
+            out[(months>=w["from"]) & (months<=w["to"]) & out.isna()] = w["name"]
+        return out
+    raise ValueError(f"unknown frequency: {freq}")
+
+
+# ---------- queries ----------
+def _buckets(company:str, survey=None)->tuple[pd.DataFrame, pd.DataFrame]:
+    version = storage.data_version(company); key = survey_key(survey)
+    with _LOCK:
+        hit = _CACHE.get((company, key))
+    if hit is not None and hit[0]==version: return hit[1], hit[2]
+    refresh(company)
+    conn = storage.connect(company)
+    try:
+        _ensure_tables(conn)
+        b = pd.read_sql_query("SELECT period, role, topic, sum, cnt FROM trend_cells WHERE survey=?", conn, params=(key,))
+        n = pd.read_sql_query("SELECT period, role, n FROM trend_respondents WHERE survey=?", conn, params=(key,))
+    finally:
+        conn.close()
+    with _LOCK:
+        _CACHE[(company, key)] = (version, b, n)
+    return b, n
+
+
+def months(company:str, survey=None)->list[str]:
+    return sorted(_buckets(company, survey)[0]["period"].unique().tolist())
+
+
+def _window(company:str, topic_ids, roles, start, end, survey, month_set):
+    """Role × topic ``(sum, cnt)`` frames of ``_adj`` over a window, plus respondents per role."""
+    b, n = _buckets(company, survey)
+    sel = pd.Series(True, index=b.index); seln = pd.Series(True, index=n.index)
+    if start: sel &= b["period"]>=start; seln &= n["period"]>=start
+    if end: sel &= b["period"]<=end; seln &= n["period"]<=end
+    if month_set is not None:
+        month_set = list(month_set); sel &= b["period"].isin(month_set); seln &= n["period"].isin(month_set)
+    tot = b[sel].groupby(["role", "topic"])[["sum", "cnt"]].sum()
+    s = tot["sum"].unstack().reindex(index=list(roles), columns=list(topic_ids))
+    c = tot["cnt"].unstack().reindex(index=list(roles), columns=list(topic_ids))
+    return s, c, n[seln].groupby("role")["n"].sum().to_dict()
+
+
+def window_means(company:str, topic_ids, roles, start:str|None=None, end:str|None=None,
+                 survey=None, month_set=None)->tuple[np.ndarray, dict]:
+    """Role × topic means (0..100) over the months ``start..end`` (inclusive), plus respondents per role.
+
+    ``month_set`` limits the window to exactly those ``YYYY-MM`` months (e.g. one period of
+    :func:`period_of`, whose months need not be contiguous when survey waves overlap).
+    """
+    s, c, n = _window(company, topic_ids, roles, start, end, survey, month_set)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = np.where(c.fillna(0).to_numpy()>0, s.to_numpy(dtype=float)/c.to_numpy(dtype=float), np.nan)
+    return scoring.normalize_adj(means, get_survey(survey).max_adj), n
+
+
+def window_counts(company:str, topic_ids, roles, start:str|None=None, end:str|None=None,
+                  survey=None, month_set=None)->np.ndarray:
+    """Role × topic answer counts over the same window as :func:`window_means` (for ``scoring.count_weighted``)."""
+    return _window(company, topic_ids, roles, start, end, survey, month_set)[1].fillna(0).to_numpy(dtype=float)
+
+
+def trend(company:str, topic_ids, roles, target:float, freq:str="month", waves:list[dict]|None=None,
+          start:str|None=None, end:str|None=None, survey=None, org_roles=None)->pd.DataFrame:
+    """One row per period: fuzzy org average, pass rate, respondents and each role's mean (0..100).
+
+    ``roles`` only picks the per-role columns; the org average and pass rate are weighted over
+    ``org_roles`` (default: every role of the survey), so they do not move with a role filter.
+    """
+    b, n = _buckets(company, survey); survey = get_survey(survey)
+    topic_ids = list(topic_ids); org_roles = list(survey.roles if org_roles is None else org_roles)
+    cols = list(roles); roles = list(dict.fromkeys(org_roles+cols))
+    b = b[b["topic"].isin(topic_ids)]
+    if start: b = b[b["period"]>=start]; n = n[n["period"]>=start]
+    if end: b = b[b["period"]<=end]; n = n[n["period"]<=end]
+    if b.empty: return pd.DataFrame()
+    b = b.assign(bucket=period_of(b["period"], freq, waves)).dropna(subset=["bucket"])
+    n = n.assign(bucket=period_of(n["period"], freq, waves)).dropna(subset=["bucket"])
+    tot = b.groupby(["bucket", "role", "topic"])[["sum", "cnt"]].sum()
+    order = sorted(tot.index.get_level_values(0).unique()) if freq!="wave" else \
+        [w["name"] for w in waves or [] if w["name"] in set(tot.index.get_level_values(0))]
+    full = pd.MultiIndex.from_product([order, roles, topic_ids], names=["bucket", "role", "topic"])
+    tot = tot.reindex(full)
+    S = tot["sum"].to_numpy(dtype=float).reshape(len(order), len(roles), len(topic_ids))
+    C = tot["cnt"].fillna(0).to_numpy(dtype=float).reshape(len(order), len(roles), len(topic_ids))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        M = scoring.normalize_adj(np.where(C>0, S/np.where(C>0, C, 1), np.nan), survey.max_adj)   # periods × roles × topics
+    W = scoring.weight_matrix(topic_ids, org_roles, survey)
+    resp = n.groupby("bucket")["n"].sum()
+    rows = []
+    for k, label in enumerate(order):
+        kp = scoring.summarize(M[k, :len(org_roles)], W, target)
+        row = {"دوره": label, "میانگین سازمان": kp["org_avg"], "نرخ عبور از هدف": kp["pass_rate"],
+               "تعداد پاسخ": int(resp.get(label, 0))}
+        with np.errstate(invalid="ignore"):
+            row.update({r: float(np.nanmean(M[k, i])) if np.isfinite(M[k, i]).any() else np.nan
+                        for i,r in enumerate(roles) if r in cols})
+        rows.append(row)
+    return pd.DataFrame(rows)